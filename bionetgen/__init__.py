@@ -1,4 +1,35 @@
-from .core.defaults import defaults
-from .modelapi import bngmodel
-from .modelapi.runner import run
-from .simulator import sim_getter
+import importlib
+
+# The library API is loaded on first use, importing the
+# model API, the runner or the simulators pulls in numpy,
+# pyparsing, xmltodict and the cement app which makes
+# importing bionetgen slow for short lived processes
+_lazy_attrs = {
+    "defaults": ".core.defaults",
+    "bngmodel": ".modelapi",
+    "run": ".modelapi.runner",
+    "run_batch": ".modelapi.runner",
+    "arun": ".modelapi.runner",
+    "astream": ".modelapi.runner",
+    "scan": ".modelapi.scanner",
+    "sensitivity": ".modelapi.sensitivity",
+    "sim_getter": ".simulator",
+    "start_workers": ".core.utils.workers",
+    "stop_workers": ".core.utils.workers",
+}
+
+
+def __getattr__(name):
+    if name in _lazy_attrs:
+        module = importlib.import_module(_lazy_attrs[name], __name__)
+        value = getattr(module, name)
+        # cache it so we only go through here once
+        globals()[name] = value
+        return value
+    if name in ["core", "modelapi", "network", "simulator", "atomizer", "main"]:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + list(_lazy_attrs.keys()))
@@ -0,0 +1,93 @@
+#!/usr/bin/perl
+# Long running BNG2.pl worker used by bionetgen.core.utils.workers.
+#
+# Usage: perl bngworker.pl /path/to/BNG2.pl
+#
+# The worker loads the Perl modules BNG2.pl uses once and then reads
+# requests from STDIN, one per line, of the form
+#     working_directory <TAB> log_file <TAB> environment <TAB> arg1 <TAB> ...
+# where environment is the hex encoded, NUL separated list of NAME=VALUE
+# pairs BNG2.pl runs with, or empty to keep the one of the worker.
+# For each request it forks, the child gets its own process group (so
+# it can be killed without the worker), changes to the working directory,
+# sends its output to the log file and runs BNG2.pl with the given
+# arguments. Since the modules are already compiled in the parent,
+# the child doesn't pay the startup cost. The worker writes
+#     STARTED <TAB> pid
+# to STDOUT once the child is running and
+#     DONE <TAB> exit_status
+# once it exits. An empty line or QUIT stops the worker.
+use strict;
+use warnings;
+
+my $BNG2;
+
+BEGIN {
+    $BNG2 = shift @ARGV;
+    die "Usage: perl bngworker.pl /path/to/BNG2.pl\n" unless defined $BNG2;
+    # FindBin looks at $0, BNG2.pl uses it to find its modules
+    $0 = $BNG2;
+}
+
+use FindBin;
+use lib "$FindBin::RealBin/Perl2";
+use File::Spec;
+use IO::Handle;
+use POSIX ();
+
+# preload every module BNG2.pl uses, pragmas are skipped
+# and failures are left for BNG2.pl itself to report
+if ( open( my $src, '<', $BNG2 ) ) {
+    while ( my $line = <$src> ) {
+        if ( $line =~ /^\s*use\s+([A-Z][\w:]*)/ ) {
+            eval "require $1; 1";
+        }
+    }
+    close($src);
+}
+
+STDOUT->autoflush(1);
+print "READY\n";
+
+while ( my $request = <STDIN> ) {
+    chomp($request);
+    last if $request eq '' or $request eq 'QUIT';
+    my ( $cwd, $log_file, $env, @args ) = split( /\t/, $request, -1 );
+    my $pid = fork();
+    if ( !defined $pid ) {
+        print "DONE\t255\n";
+        next;
+    }
+    if ( $pid == 0 ) {
+        # child, set up the environment BNG2.pl expects
+        POSIX::setpgid( 0, 0 );
+        if ( length($env) ) {
+            %ENV = ();
+            for my $pair ( split( /\0/, pack( 'H*', $env ) ) ) {
+                my ( $name, $value ) = split( /=/, $pair, 2 );
+                $ENV{$name} = $value;
+            }
+        }
+        chdir($cwd) or POSIX::_exit(255);
+        open( STDIN,  '<',  File::Spec->devnull() ) or POSIX::_exit(255);
+        open( STDOUT, '>',  $log_file )             or POSIX::_exit(255);
+        open( STDERR, '>&', \*STDOUT )              or POSIX::_exit(255);
+        STDOUT->autoflush(1);
+        @ARGV = @args;
+        $0    = $BNG2;
+        do $BNG2;
+        if ($@) {
+            print STDERR $@;
+            exit(255);
+        }
+        exit(0);
+    }
+    # set here too, so the group exists before we report the pid
+    POSIX::setpgid( $pid, $pid );
+    print "STARTED\t$pid\n";
+    waitpid( $pid, 0 );
+    my $status = ( $? & 127 ) ? 255 : ( $? >> 8 );
+    print "DONE\t$status\n";
+}
+
+exit(0);
@@ -0,0 +1,39 @@
+import threading
+
+# configuration of the CLI app, set up on first use
+_conf = None
+_conf_lock = threading.Lock()
+
+
+def get_conf():
+    """
+    Returns the "bionetgen" section of the CLIs config setup, this
+    includes the defaults from core/defaults as well as the options
+    set in config files. The cement app is only set up the first time
+    this is called, every later call returns the same configuration.
+
+    Usage: get_conf()
+           get_conf()["bngpath"]
+    """
+    global _conf
+    if _conf is None:
+        with _conf_lock:
+            if _conf is None:
+                from bionetgen.main import BioNetGen
+
+                app = BioNetGen()
+                app.setup()
+                _conf = app.config["bionetgen"]
+    return _conf
+
+
+def conf_flag(value) -> bool:
+    """
+    Turns a true/false option into a bool, options set in
+    config files come in as strings like "false" or "0"
+
+    Usage: conf_flag(get_conf().get("xml_cache", True))
+    """
+    if isinstance(value, str):
+        return value.strip().lower() not in ["", "0", "false", "no", "off", "none"]
+    return bool(value)
@@ -73,6 +73,17 @@ class BNGDefaults:
         # cvode paths
         CONFIG["bionetgen"]["cvode_lib"] = None
         CONFIG["bionetgen"]["cvode_include"] = None
+        # on-disk caches, xml cache size is in MB
+        CONFIG["bionetgen"]["cache_dir"] = os.path.join(
+            os.path.expanduser("~"), ".cache", "bionetgen"
+        )
+        CONFIG["bionetgen"]["xml_cache"] = True
+        CONFIG["bionetgen"]["xml_cache_size"] = 256
+        # compiled C simulator libraries, size is in MB
+        CONFIG["bionetgen"]["cpy_cache"] = True
+        CONFIG["bionetgen"]["cpy_cache_size"] = 256
+        # binary copies of gdat/cdat/scan files next to them
+        CONFIG["bionetgen"]["dat_sidecar"] = False
         # set attributes
         self.bng_path = os.path.join(lib_path, bng_name)
         self.lib_path = lib_path
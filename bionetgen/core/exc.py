@@ -72,6 +72,7 @@ class BNGRunError(BNGError):
         self.command = command
         self.stdout = stdout
         self.stderr = stderr
+        self.run_message = message
         full_msg = f"Tried to run command: {command}\n"
         full_msg += message + "\n"
         if stdout is not None:
@@ -81,6 +82,13 @@ class BNGRunError(BNGError):
         self.message = full_msg
         super().__init__(self.message)
 
+    def __reduce__(self):
+        # needed to send the error between processes intact
+        return (
+            self.__class__,
+            (self.command, self.run_message, self.stdout, self.stderr),
+        )
+
 
 class BNGCompileError(BNGError):
     """Error related to compiling C/Py file of BNG model."""
@@ -1,9 +1,4 @@
 import subprocess, os, sys
-from bionetgen.core.tools import BNGInfo
-from bionetgen.core.tools import BNGVisualize
-from bionetgen.core.tools import BNGCLI
-from bionetgen.core.tools import BNGGdiff
-from bionetgen.core.notebook import BNGNotebook
 from bionetgen.core.utils.utils import run_command
 
 
@@ -31,10 +26,10 @@ def runCLI(app):
     app.log.debug("Pulling BNG path from config", f"{__file__} : runCLI()")
     config_bngpath = config.get("bionetgen", "bngpath")
     # and instantiates the CLI object
+    from bionetgen.core.tools import BNGCLI
+
     app.log.debug("Instantiating BNGCLI object", f"{__file__} : runCLI()")
     cli = BNGCLI(inp_file, output, config_bngpath, log_file=log_file, app=app)
-    cli.stdout = config.get("bionetgen", "stdout")
-    cli.stderr = config.get("bionetgen", "stderr")
     app.log.debug("Running", f"{__file__} : runCLI()")
     cli.run()
 
@@ -135,6 +130,8 @@ def printInfo(app):
     arguments and config from Cement framework.
     """
     config = app.config
+    from bionetgen.core.tools import BNGInfo
+
     app.log.debug("Instantiating BNGInfo object", f"{__file__} : printInfo()")
     info = BNGInfo(config=config, app=app)
     app.log.debug("Gathering and printing info", f"{__file__} : printInfo()")
@@ -159,6 +156,8 @@ def visualizeModel(app):
     # if you set args.bngpath it should take precedence
     config_bngpath = config.get("bionetgen", "bngpath")
     # run visualize tool
+    from bionetgen.core.tools import BNGVisualize
+
     app.log.debug("Instantiating BNGVisualize object", f"{__file__} : visualizeModel()")
     viz = BNGVisualize(inp, output=out, vtype=vtype, bngpath=config_bngpath, app=app)
     app.log.debug("Visualizing", f"{__file__} : visualizeModel()")
@@ -173,6 +172,8 @@ def graphDiff(app):
     # pull args and config for the tool
     args = app.pargs
     # if you set args.bngpath it should take precedence
+    from bionetgen.core.tools import BNGGdiff
+
     app.log.debug("Instantiating BNGGdiff object", f"{__file__} : graphDiff()")
     gdiff = BNGGdiff(
         args.input,
@@ -187,11 +188,36 @@ def graphDiff(app):
     gdiff.run()
 
 
+def manageCache(app):
+    """
+    Uses BNGCache class to print information about or clear the
+    BNG-XML cache using arguments and config from Cement framework.
+    """
+    from bionetgen.core.utils.cache import BNGCache
+
+    args = app.pargs
+    config = app.config["bionetgen"]
+    cache_dir = os.path.join(config["cache_dir"], "xml")
+    app.log.debug("Instantiating BNGCache object", f"{__file__} : manageCache()")
+    cache = BNGCache(cache_dir, max_size=config["xml_cache_size"], app=app)
+    if args.action == "stats":
+        stats = cache.stats()
+        print(f"BNG-XML cache location: {stats['path']}")
+        print(f"Number of entries: {stats['entries']}")
+        print(f"Size: {stats['size']:.2f} MB (limit: {stats['max_size']:.2f} MB)")
+    elif args.action == "clear":
+        app.log.debug("Clearing cache", f"{__file__} : manageCache()")
+        cache.clear()
+        print(f"Cleared BNG-XML cache at {cache.cache_dir}")
+
+
 def generate_notebook(app):
     """
     Uses BNGNotebook class to write a Jupyter notebook from a
     given set of command line arguments
     """
+    from bionetgen.core.notebook import BNGNotebook
+
     args = app.pargs
     if args.input is not None:
         # we want to use the template to write a custom notebok
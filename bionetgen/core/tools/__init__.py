@@ -1,9 +1,31 @@
+import importlib
+
 # NOTE Anything that needs to go into the library
 # side needs to not be in the core section, it
 # leads to circular imports
-from .result import BNGResult
-from .plot import BNGPlotter
-from .info import BNGInfo
-from .cli import BNGCLI
-from .visualize import BNGVisualize
-from .gdiff import BNGGdiff
+
+# tools are loaded on first use, some of them
+# pull in numpy, matplotlib and networkx
+_lazy_attrs = {
+    "BNGResult": ".result",
+    "BNGResultStore": ".store",
+    "BNGResultStoreWriter": ".store",
+    "BNGPlotter": ".plot",
+    "BNGInfo": ".info",
+    "BNGCLI": ".cli",
+    "BNGVisualize": ".visualize",
+    "BNGGdiff": ".gdiff",
+}
+
+
+def __getattr__(name):
+    if name in _lazy_attrs:
+        module = importlib.import_module(_lazy_attrs[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + list(_lazy_attrs.keys()))
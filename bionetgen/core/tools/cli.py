@@ -1,4 +1,4 @@
-import os, subprocess
+import os, subprocess, collections
 from bionetgen.core.exc import BNGRunError
 from bionetgen.core.utils.logging import BNGLogger
 
@@ -18,11 +18,26 @@ class BNGCLI:
         path to the output folder to run the model in
     bngpath : str
         path to BioNetGen folder where BNG2.pl lives
+    suppress : bool
+        (optional) don't print the output of BNG2.pl, its stdout
+        and stderr are always read together as one stream
+    log_file : str
+        (optional) file or folder to write BNG2.pl output to, as it comes in
+    timeout : float
+        (optional) time in seconds after which BNG2.pl is killed
+    max_lines : int
+        (optional) number of output lines to keep in memory, the last
+        lines are kept in result.output and in errors
 
     Methods
     -------
     run()
         runs the model in the given output folder
+    arun()
+        coroutine that runs the model in the given output folder
+    astream()
+        asynchronous generator that runs the model and yields
+        each line of BNG2.pl output as it comes in
     """
 
     def __init__(
@@ -33,6 +48,7 @@ class BNGCLI:
         suppress=False,
         log_file=None,
         timeout=None,
+        max_lines=1000,
         app=None,
     ):
         self.app = app
@@ -57,119 +73,216 @@ class BNGCLI:
         self.bng_exec = os.path.join(self.bngpath, "BNG2.pl")
         # TODO: Transition to BNGErrors and logging
         assert os.path.exists(self.bng_exec), "BNG2.pl is not found!"
-        if "BNGPATH" in os.environ:
-            self.old_bngpath = os.environ["BNGPATH"]
-        else:
-            self.old_bngpath = None
-        os.environ["BNGPATH"] = self.bngpath
+        # BNG2.pl gets its own environment, we don't
+        # want to touch the one of the current process
+        self.env = os.environ.copy()
+        self.env["BNGPATH"] = self.bngpath
         self.result = None
-        self.stdout = "PIPE"
-        self.stderr = "STDOUT"
         self.suppress = suppress
         self.log_file = log_file
         self.timeout = timeout
+        # number of output lines to keep in memory
+        self.max_lines = max_lines
 
     def _set_output(self, output):
         self.logger.debug(
             "Setting up output path", loc=f"{__file__} : BNGCLI._set_output()"
         )
-        # setting up output area
-        self.output = output
-        if os.path.isdir(output):
-            # path exists, let's go there
-            os.chdir(output)
-        else:
-            os.mkdir(output)
-            os.chdir(output)
+        # setting up output area, BNG2.pl will be ran
+        # in this folder
+        self.output = os.path.abspath(output)
+        os.makedirs(self.output, exist_ok=True)
 
     def run(self):
         self.logger.debug("Running", loc=f"{__file__} : BNGCLI.run()")
         from bionetgen.core.utils.utils import run_command
 
+        # run BNG2.pl
+        command = self._get_command()
+        self.logger.debug("Running command", loc=f"{__file__} : BNGCLI.run()")
+        # output is written to the log file as it comes in
+        rc, out = run_command(
+            command,
+            suppress=self.suppress,
+            timeout=self.timeout,
+            cwd=self.output,
+            env=self.env,
+            log_file=self._get_log_path(),
+            max_lines=self.max_lines,
+        )
+        self._finish(command, rc, out)
+
+    async def arun(self):
+        """
+        Same as run but runs BNG2.pl as an asyncio subprocess,
+        returns the result once BNG2.pl is done.
+        """
+        self.logger.debug("Running", loc=f"{__file__} : BNGCLI.arun()")
+        async for line in self.astream():
+            if not self.suppress:
+                print(line)
+        return self.result
+
+    async def astream(self):
+        """
+        Runs BNG2.pl as an asyncio subprocess and yields each line of
+        its output as it comes in. Once BNG2.pl is done the result is
+        loaded into the result attribute. If the timeout runs out or the
+        task is cancelled BNG2.pl is killed along with its children.
+        """
+        import asyncio
+
+        command = self._get_command()
+        self.logger.debug("Running command", loc=f"{__file__} : BNGCLI.astream()")
+        # BNG2.pl gets its own process group so that killing
+        # it also kills the simulators it started
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            cwd=self.output,
+            env=self.env,
+            start_new_session=(os.name != "nt"),
+        )
+        loop = asyncio.get_running_loop()
+        if self.timeout is not None:
+            deadline = loop.time() + self.timeout
+        out = collections.deque(maxlen=self.max_lines)
+        log_path = self._get_log_path()
+        log = None
+        if log_path is not None:
+            log = open(log_path, "w")
         try:
-            stdout_loc = getattr(subprocess, self.stdout)
-        except:
-            stdout_loc = subprocess.PIPE
+            while True:
+                if self.timeout is None:
+                    line = await process.stdout.readline()
+                else:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError
+                    line = await asyncio.wait_for(process.stdout.readline(), remaining)
+                if not line:
+                    break
+                line = line.decode("utf8", errors="replace").strip()
+                out.append(line)
+                if log is not None:
+                    log.write(line + "\n")
+                    log.flush()
+                yield line
+            rc = await process.wait()
+        except asyncio.TimeoutError:
+            self.logger.error("Command timed out", loc=f"{__file__} : BNGCLI.astream()")
+            raise subprocess.TimeoutExpired(command, self.timeout)
+        finally:
+            # timed out, cancelled or the caller stopped reading
+            if process.returncode is None:
+                self._kill(process)
+                await process.wait()
+            if log is not None:
+                log.close()
+        self._finish(command, rc, list(out))
+
+    def _kill(self, process):
+        self.logger.debug("Killing BNG2.pl", loc=f"{__file__} : BNGCLI._kill()")
         try:
-            stderr_loc = getattr(subprocess, self.stderr)
-        except:
-            stderr_loc = subprocess.STDOUT
-        # run BNG2.pl
+            if os.name == "nt":
+                process.kill()
+            else:
+                import signal
+
+                os.killpg(process.pid, signal.SIGKILL)
+        except (OSError, ProcessLookupError):
+            # already gone
+            pass
+
+    def _get_command(self):
+        """
+        Writes out the model if needed and returns
+        the command that runs BNG2.pl on it
+        """
         if self.is_bngmodel:
             self.logger.debug(
-                "The given model is a bngmodel object", loc=f"{__file__} : BNGCLI.run()"
+                "The given model is a bngmodel object",
+                loc=f"{__file__} : BNGCLI._get_command()",
             )
             self.logger.debug(
-                "Writing the model to a file", loc=f"{__file__} : BNGCLI.run()"
+                "Writing the model to a file", loc=f"{__file__} : BNGCLI._get_command()"
             )
             write_to = self.inp_file.model_name + ".bngl"
-            write_to = os.path.abspath(write_to)
+            write_to = os.path.join(self.output, write_to)
             if os.path.isfile(write_to):
                 self.logger.warning(
-                    f"Overwriting file {write_to}", loc=f"{__file__} : BNGCLI.run()"
+                    f"Overwriting file {write_to}",
+                    loc=f"{__file__} : BNGCLI._get_command()",
                 )
             with open(write_to, "w") as tfile:
                 tfile.write(str(self.inp_file))
             command = ["perl", self.bng_exec, write_to]
         else:
             self.logger.debug(
-                "The given model is a file", loc=f"{__file__} : BNGCLI.run()"
+                "The given model is a file", loc=f"{__file__} : BNGCLI._get_command()"
             )
-            fname = os.path.basename(self.inp_path)
-            fname = fname.replace(".bngl", "")
             command = ["perl", self.bng_exec, self.inp_path]
-        self.logger.debug("Running command", loc=f"{__file__} : BNGCLI.run()")
-        rc, out = run_command(command, suppress=self.suppress, timeout=self.timeout)
-        if self.log_file is not None:
-            self.logger.debug("Setting up log file", loc=f"{__file__} : BNGCLI.run()")
-            # test if we were given a path
-            # TODO: This is a simple hack, might need to adjust it
-            # trying to check if given file is an absolute/relative
-            # path and if so, use that one. Otherwise, divine the
-            # current path.
-            if os.path.exists(self.log_file):
-                # file or folder exists, check if folder
-                if os.path.isdir(self.log_file):
+        return command
+
+    def _get_log_path(self):
+        """
+        Returns the full path of the log file BNG2.pl output is
+        written to, None if there is no log file
+        """
+        if self.log_file is None:
+            return None
+        self.logger.debug(
+            "Setting up log file", loc=f"{__file__} : BNGCLI._get_log_path()"
+        )
+        # test if we were given a path
+        # TODO: This is a simple hack, might need to adjust it
+        # trying to check if given file is an absolute/relative
+        # path and if so, use that one. Otherwise, divine the
+        # current path. Relative paths are relative to the
+        # output folder, that's where BNG2.pl is ran.
+        log_path = os.path.join(self.output, self.log_file)
+        if os.path.exists(log_path):
+            # file or folder exists, check if folder
+            if os.path.isdir(log_path):
+                if self.is_bngmodel:
+                    fname = self.inp_file.model_name
+                else:
                     fname = os.path.basename(self.inp_path)
                     fname = fname.replace(".bngl", "")
-                    full_log_path = os.path.join(self.log_file, fname + ".log")
-                else:
-                    # it's intended to be file, so we keep it as is
-                    full_log_path = self.log_file
+                full_log_path = os.path.join(log_path, fname + ".log")
             else:
-                # doesn't exist, so we assume it's a file
-                # and we keep it as is
-                full_log_path = self.log_file
-            self.logger.debug("Writing log file", loc=f"{__file__} : BNGCLI.run()")
-            with open(full_log_path, "w") as f:
-                f.write("\n".join(out))
+                # it's intended to be file, so we keep it as is
+                full_log_path = log_path
+        else:
+            # doesn't exist, so we assume it's a file
+            # and we keep it as is
+            full_log_path = log_path
+        return full_log_path
+
+    def _finish(self, command, rc, out):
+        """
+        Loads the results if BNG2.pl ran successfully,
+        raises BNGRunError with the last lines of output otherwise
+        """
         if rc == 0:
             self.logger.debug(
-                "Command ran successfully", loc=f"{__file__} : BNGCLI.run()"
+                "Command ran successfully", loc=f"{__file__} : BNGCLI._finish()"
             )
             from bionetgen.core.tools import BNGResult
 
             # load in the result
-            self.result = BNGResult(os.getcwd())
+            self.result = BNGResult(self.output)
             self.result.process_return = rc
             self.result.output = out
-            # set BNGPATH back
-            if self.old_bngpath is not None:
-                os.environ["BNGPATH"] = self.old_bngpath
         else:
-            self.logger.error("Command failed to run", loc=f"{__file__} : BNGCLI.run()")
+            self.logger.error(
+                "Command failed to run", loc=f"{__file__} : BNGCLI._finish()"
+            )
             self.result = None
-            # set BNGPATH back
-            if self.old_bngpath is not None:
-                os.environ["BNGPATH"] = self.old_bngpath
-            if hasattr(out, "stdout"):
-                if out.stdout is not None:
-                    stdout_str = out.stdout.decode("utf-8")
-            else:
-                stdout_str = None
-            if hasattr(out, "stderr"):
-                if out.stderr is not None:
-                    stderr_str = out.stderr.decode("utf-8")
-            else:
-                stderr_str = None
-            raise BNGRunError(command, stdout=stdout_str, stderr=stderr_str)
+            # out only has the last lines of the output,
+            # that's where BNG2.pl reports what went wrong
+            stdout_str = None
+            if len(out) > 0:
+                stdout_str = "\n".join(out)
+            raise BNGRunError(command, stdout=stdout_str)
@@ -1,7 +1,15 @@
 import os
 import numpy as np
+from collections.abc import MutableMapping
 
 from bionetgen.core.utils.logging import BNGLogger
+from bionetgen.core.utils.datreader import (
+    read_dat,
+    read_dat_selection,
+    iter_chunks,
+    as_recarray,
+    BNGDatFollower,
+)
 
 
 class BNGResult:
@@ -18,28 +26,57 @@ class BNGResult:
         loaded by the class
     direct_path : str
         path that directly points to a file to load
+    sidecar : bool
+        (optional) if True, a binary copy of each loaded file is kept
+        next to it and memory mapped on later loads instead of parsing
+        the text again. Defaults to the dat_sidecar config option
+    max_loaded : int
+        (optional) files are only parsed the first time they are
+        accessed, this sets how many parsed files are kept around for
+        each of gdats/cdats/scans. By default every parsed file is kept
 
     Methods
     -------
-    load(fpath)
+    load(fpath, columns=None, t_range=None, stride=None)
         loads in the direct path to the file and returns
-        numpy.recarray
+        numpy.recarray. If columns, t_range (start, end) or stride
+        are given only that part of the file is parsed
+    load_array(fpath)
+        loads in the direct path to the file and returns a 2-D
+        float64 array and a dictionary of column name to index
+    iter_chunks(fpath, rows=10000, columns=None)
+        iterates over the file in (times, block) chunks of at
+        most the given number of rows, see datreader.iter_chunks
+    follow(fpath, interval=0.5)
+        returns a BNGDatFollower that reads the rows added to
+        a file while a simulation is still writing it
+    load_results()
+        parses every file found in the folder right away instead
+        of waiting for them to be accessed
     """
 
-    def __init__(self, path=None, direct_path=None, app=None):
+    def __init__(
+        self, path=None, direct_path=None, app=None, sidecar=None, max_loaded=None
+    ):
         self.app = app
         self.logger = BNGLogger(app=self.app)
         self.logger.debug(
             "Setting up BNGResult object", loc=f"{__file__} : BNGResult.__init__()"
         )
+        if sidecar is None:
+            from bionetgen.core.config import get_conf, conf_flag
+
+            sidecar = conf_flag(get_conf().get("dat_sidecar", False))
+        self.sidecar = sidecar
         # defaults
         self.process_return = None
         self.output = None
         # TODO Make it so that with path you can supply an
         # extension or a list of extensions to load in
-        self.gdats = {}
-        self.cdats = {}
-        self.scans = {}
+        self.max_loaded = max_loaded
+        self.gdats = BNGResultFiles(self.load, max_loaded=max_loaded)
+        self.cdats = BNGResultFiles(self.load, max_loaded=max_loaded)
+        self.scans = BNGResultFiles(self.load, max_loaded=max_loaded)
         self.cnames = {}
         self.snames = {}
         self.gnames = {}
@@ -50,13 +87,14 @@ class BNGResult:
             self.file_name = fnoext
             self.file_extension = fext
             self.gnames[fnoext] = direct_path
-            self.gdats[fnoext] = self.load(direct_path)
+            self.gdats.add_file(fnoext, direct_path)
         elif path is not None:
             # TODO change this pattern so that each method
             # is stand alone and usable.
             self.path = path
+            # files are found right away but only
+            # parsed once they are accessed
             self.find_dat_files()
-            self.load_results()
         else:
             self.logger.info(
                 "BNGResult needs either a path or a direct path kwarg to load gdat/cdat/scan files from",
@@ -88,10 +126,13 @@ class BNGResult:
     def __iter__(self):
         return self.gdats.__iter__()
 
-    def load(self, fpath):
+    def load(self, fpath, columns=None, t_range=None, stride=None):
         self.logger.debug(f"Loading file {fpath}", loc=f"{__file__} : BNGResult.load()")
         path, fname = os.path.split(fpath)
         fnoext, fext = os.path.splitext(fname)
+        if columns is not None or t_range is not None or stride is not None:
+            if fext in [".gdat", ".cdat", ".scan"]:
+                return self._load_selection(fpath, columns, t_range, stride)
         if fext == ".gdat" or fext == ".cdat":
             return self._load_dat(fpath)
         elif fext == ".scan":
@@ -129,50 +170,182 @@ class BNGResult:
         for dat_file in scan_files:
             name = dat_file.replace(f".{ext}", "")
             self.snames[name] = dat_file
+        # register the files with the lazy mappings
+        for name in self.gnames:
+            self.gdats.add_file(name, os.path.join(self.path, self.gnames[name]))
+        for name in self.cnames:
+            self.cdats.add_file(name, os.path.join(self.path, self.cnames[name]))
+        for name in self.snames:
+            self.scans.add_file(name, os.path.join(self.path, self.snames[name]))
 
     def load_results(self):
+        """
+        Parses every gdat/cdat/scan file that was found, e.g. before
+        the folder they are in is removed.
+        """
         self.logger.debug(
             f"Loading results from {self.path}",
             loc=f"{__file__} : BNGResult.load_results()",
         )
-        # load gdat files
-        for name in self.gnames:
-            gdat_path = os.path.join(self.path, self.gnames[name])
-            self.gdats[name] = self.load(gdat_path)
-        # load gdat files
-        for name in self.cnames:
-            cdat_path = os.path.join(self.path, self.cnames[name])
-            self.cdats[name] = self.load(cdat_path)
-        # load scan files
-        for name in self.snames:
-            scan_path = os.path.join(self.path, self.snames[name])
-            self.scans[name] = self.load(scan_path)
+        for files in [self.gdats, self.cdats, self.scans]:
+            files.load_all()
+
+    def load_array(self, fpath):
+        """
+        Loads the given gdat/cdat/scan file into a plain 2-D float64
+        array and returns it along with a dictionary that maps column
+        names to column indices.
+        """
+        self.logger.debug(
+            f"Loading file {fpath}", loc=f"{__file__} : BNGResult.load_array()"
+        )
+        return read_dat(fpath, sidecar=self.sidecar)
+
+    def iter_chunks(self, fpath, rows=10000, columns=None):
+        """
+        Iterates over a gdat/cdat/scan file in chunks of at most the
+        given number of rows, yielding (times, block) arrays. Use this
+        for files that are too large to load at once.
+        """
+        self.logger.debug(
+            f"Iterating over file {fpath}", loc=f"{__file__} : BNGResult.iter_chunks()"
+        )
+        return iter_chunks(fpath, rows=rows, columns=columns)
+
+    def follow(self, fpath, interval=0.5):
+        """
+        Returns a BNGDatFollower for the given gdat/cdat/scan file, which
+        reads only the new rows each time it polls the file. Useful to
+        watch the output of a simulation that is still running.
+        """
+        self.logger.debug(
+            f"Following file {fpath}", loc=f"{__file__} : BNGResult.follow()"
+        )
+        return BNGDatFollower(fpath, interval=interval)
+
+    def _load_selection(self, fpath, columns=None, t_range=None, stride=None):
+        """
+        Loads the given columns and rows of a gdat/cdat/scan file into
+        a record array, only the selected part of the file is kept in
+        memory while parsing.
+        """
+        data, columns = read_dat_selection(
+            fpath,
+            columns=columns,
+            t_range=t_range,
+            stride=stride,
+            sidecar=self.sidecar,
+        )
+        return as_recarray(data, columns.keys())
 
     def _load_dat(self, path, dformat="f8"):
         """
         This function takes a path to a gdat/cdat file as a string and loads that
-        file into a numpy structured array, including the correct header info.
-        TODO: Add link
+        file into a numpy record array, including the correct header info.
+        The record array is a view of the 2-D array returned by load_array.
 
         Optional argument allows you to set the data type for every column. See
         numpy dtype/data type strings for what's allowed. TODO: Add link
         """
-        # First step is to read the header,
-        # we gotta open the file and pull that line in
-        with open(path, "r") as f:
-            header = f.readline()
-        # Ensure the header info is actually there
-        # TODO: Transition to BNGErrors and logging
-        assert header.startswith("#"), "No header line that starts with #"
-        # Now turn it into a list of names for our struct array
-        header = header.replace("#", "")
-        headers = header.split()
-        # For a magical reason this is how numpy.loadtxt wants it,
-        # in tuples passed as a dictionary with names/formats as keys
-        names = tuple(headers)
-        formats = tuple([dformat for i in range(len(headers))])
-        # return the loadtxt result as a record array
-        # which is similar to pandas data format without the helper functions
-        return np.rec.array(
-            np.loadtxt(path, dtype={"names": names, "formats": formats})
-        )
+        data, columns = read_dat(path, sidecar=self.sidecar)
+        if np.dtype(dformat) != np.float64:
+            names = tuple(columns.keys())
+            formats = tuple([dformat for i in range(len(names))])
+            return np.rec.fromarrays(data.T, names=names, formats=formats)
+        # return the record array, which is similar to
+        # pandas data format without the helper functions
+        return as_recarray(data, columns.keys())
+
+
+class BNGResultFiles(MutableMapping):
+    """
+    Dictionary like container of loaded gdat/cdat/scan files used
+    by BNGResult. Files are registered with their path and only parsed
+    the first time they are accessed. If max_loaded is given, only that
+    many parsed files are kept and the least recently used one is
+    dropped, it will be parsed again if it's accessed again.
+
+    Usage: files = BNGResultFiles(loader)
+           files.add_file("model", "/path/to/model.gdat")
+           files["model"]
+
+    Arguments
+    ---------
+    loader : callable
+        function that takes a file path and returns the loaded data
+    max_loaded : int
+        (optional) maximum number of parsed files to keep
+
+    Methods
+    -------
+    add_file(name, fpath) : None
+        registers a file to be loaded on access under the given name
+    is_loaded(name) : bool
+        whether the file is currently parsed and kept in memory
+    load_all() : None
+        parses every registered file, the files are kept regardless
+        of max_loaded
+    """
+
+    def __init__(self, loader, max_loaded=None) -> None:
+        self.loader = loader
+        self.max_loaded = max_loaded
+        self.paths = {}
+        # values that were set directly or loaded with load_all,
+        # these are never dropped
+        self._kept = {}
+        if max_loaded is None:
+            self._loaded = {}
+        else:
+            import pylru
+
+            self._loaded = pylru.lrucache(max_loaded)
+
+    def add_file(self, name, fpath) -> None:
+        self.paths[name] = fpath
+        self._kept.pop(name, None)
+        if name in self._loaded:
+            del self._loaded[name]
+
+    def is_loaded(self, name) -> bool:
+        return name in self._kept or name in self._loaded
+
+    def load_all(self) -> None:
+        for name in self.paths:
+            if name not in self._kept:
+                self._kept[name] = self[name]
+        self._loaded.clear()
+
+    def __getitem__(self, name):
+        if name in self._kept:
+            return self._kept[name]
+        if name in self._loaded:
+            return self._loaded[name]
+        if name not in self.paths:
+            raise KeyError(name)
+        data = self.loader(self.paths[name])
+        self._loaded[name] = data
+        return data
+
+    def __setitem__(self, name, value) -> None:
+        self.paths.setdefault(name, None)
+        self._kept[name] = value
+
+    def __delitem__(self, name) -> None:
+        del self.paths[name]
+        self._kept.pop(name, None)
+        if name in self._loaded:
+            del self._loaded[name]
+
+    def __contains__(self, name) -> bool:
+        # don't load the file just to check for it
+        return name in self.paths
+
+    def __iter__(self):
+        return iter(self.paths)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __repr__(self) -> str:
+        return f"BNGResultFiles({list(self.paths.keys())})"
@@ -0,0 +1,375 @@
+import os
+import numpy as np
+
+from bionetgen.core.utils.logging import BNGLogger
+
+# kinds of result files a store keeps, same as
+# the gdats/cdats/scans of BNGResult
+_kinds = {"gdat": "gdats", "cdat": "cdats", "scan": "scans"}
+
+
+def _import_h5py():
+    try:
+        import h5py
+    except ImportError:
+        raise ImportError(
+            "BNGResultStore needs h5py, it can be installed with "
+            + 'pip install "bionetgen[hdf5]" or pip install h5py'
+        )
+    return h5py
+
+
+def pack_result(result):
+    """
+    Turns the gdat/cdat/scan files of a BNGResult into plain arrays,
+    {"gdat": {name: (column_names, 2-D array)}, "cdat": ..., "scan": ...}.
+    The packed result is cheap to pickle and send to a writer process.
+
+    Usage: pack_result(result)
+    """
+    from numpy.lib.recfunctions import structured_to_unstructured
+
+    packed = {}
+    for kind, attr in _kinds.items():
+        packed[kind] = {}
+        files = getattr(result, attr)
+        for name in files:
+            rec = files[name]
+            packed[kind][name] = (
+                list(rec.dtype.names),
+                structured_to_unstructured(rec, dtype=np.float64),
+            )
+    return packed
+
+
+class BNGResultStore:
+    """
+    Single HDF5 file that collects the results of many runs, e.g.
+    a parameter scan, an ensemble or a run_batch call. Every column of
+    every gdat/cdat/scan file is kept as a compressed, chunked
+    (runs, time points) dataset, so reading one observable across all
+    runs only reads that observable. Runs are numbered in the order they
+    are added and can have a label and parameter values. Requires h5py.
+
+    HDF5 files can only have one writer, to add runs from many processes
+    use a BNGResultStoreWriter.
+
+    Usage: store = BNGResultStore("results.h5")
+           store.append(result, params={"kf": 0.1}, label="run_0")
+           store.get("A", t=10.0)
+           store.find_runs(kf=0.1)
+
+    Arguments
+    ---------
+    path : str
+        path to the HDF5 file, created if it doesn't exist
+    mode : str
+        (optional) "a" to read and add runs (default) or "r" to only read
+    compression : str
+        (optional) compression used for the datasets, "gzip" by default
+
+    Methods
+    -------
+    append(result, params=None, label=None) : int
+        adds the files of a BNGResult as a new run, returns the run number
+    get(column, name=None, kind="gdat", runs=None, t=None) : numpy.ndarray
+        returns the column for the given runs as a (runs, time points)
+        array, padded with NaN. If t is given only the value at the time
+        point closest to t is returned for each run
+    find_runs(**params) : numpy.ndarray
+        returns the numbers of the runs with the given parameter values
+    names(kind="gdat") : list
+        names of the files of the given kind in the store
+    columns(name, kind="gdat") : list
+        column names of the given file
+    close() : None
+        closes the HDF5 file
+    """
+
+    def __init__(self, path, mode="a", compression="gzip", app=None) -> None:
+        self.app = app
+        self.logger = BNGLogger(app=self.app)
+        h5py = _import_h5py()
+        self.path = path
+        self.compression = compression
+        self.logger.debug(
+            f"Opening result store {path}",
+            loc=f"{__file__} : BNGResultStore.__init__()",
+        )
+        self.file = h5py.File(path, mode)
+        if mode != "r" and "runs" not in self.file:
+            self.file.create_dataset(
+                "runs/label",
+                shape=(0,),
+                maxshape=(None,),
+                dtype=h5py.string_dtype(),
+                chunks=(1024,),
+            )
+            self.file.create_group("params")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.n_runs
+
+    def __repr__(self) -> str:
+        s = f"BNGResultStore {self.path} with {self.n_runs} runs"
+        for kind in _kinds:
+            if len(self.names(kind)) > 0:
+                s += f"\n{kind}s: " + " ".join(self.names(kind))
+        return s
+
+    @property
+    def n_runs(self) -> int:
+        if "runs" not in self.file:
+            return 0
+        return self.file["runs/label"].shape[0]
+
+    @property
+    def labels(self) -> list:
+        if "runs" not in self.file:
+            return []
+        return [
+            l.decode() if isinstance(l, bytes) else l
+            for l in self.file["runs/label"][:]
+        ]
+
+    @property
+    def params(self) -> dict:
+        """
+        Parameter values of every run, NaN for runs that didn't set it
+        """
+        if "params" not in self.file:
+            return {}
+        return {name: ds[:] for name, ds in self.file["params"].items()}
+
+    def names(self, kind="gdat") -> list:
+        if kind not in self.file:
+            return []
+        return list(self.file[kind].keys())
+
+    def columns(self, name, kind="gdat") -> list:
+        return list(self.file[f"{kind}/{name}"].attrs["columns"])
+
+    def append(self, result, params=None, label=None) -> int:
+        if isinstance(result, dict):
+            packed = result
+        else:
+            packed = pack_result(result)
+        return self._append_packed(packed, params=params, label=label)
+
+    def _append_packed(self, packed, params=None, label=None) -> int:
+        run = self.n_runs
+        if label is None:
+            label = f"run_{run}"
+        self.logger.debug(
+            f"Adding run {run} ({label})",
+            loc=f"{__file__} : BNGResultStore.append()",
+        )
+        labels = self.file["runs/label"]
+        labels.resize((run + 1,))
+        labels[run] = label
+        # every parameter dataset has one entry per run
+        params = params or {}
+        for name, ds in self.file["params"].items():
+            ds.resize((run + 1,))
+            ds[run] = params.get(name, np.nan)
+        for name, value in params.items():
+            if name not in self.file["params"]:
+                ds = self.file["params"].create_dataset(
+                    name,
+                    shape=(run + 1,),
+                    maxshape=(None,),
+                    dtype=np.float64,
+                    fillvalue=np.nan,
+                    chunks=(1024,),
+                )
+                ds[run] = value
+        for kind, files in packed.items():
+            for name, (columns, data) in files.items():
+                self._append_file(run, kind, name, columns, data)
+        self.file.flush()
+        return run
+
+    def _append_file(self, run, kind, name, columns, data) -> None:
+        group_path = f"{kind}/{name}"
+        if group_path not in self.file:
+            group = self.file.create_group(group_path)
+            group.attrs["columns"] = list(columns)
+            group.create_dataset(
+                "_rows",
+                shape=(0,),
+                maxshape=(None,),
+                dtype=np.int64,
+                fillvalue=0,
+                chunks=(1024,),
+            )
+        group = self.file[group_path]
+        stored_columns = list(group.attrs["columns"])
+        # TODO: Transition to BNGErrors and logging
+        assert stored_columns == list(
+            columns
+        ), f"Columns of {kind} {name} don't match the ones in the store"
+        nrows = data.shape[0]
+        group["_rows"].resize((run + 1,))
+        group["_rows"][run] = nrows
+        for icol, column in enumerate(columns):
+            if column not in group:
+                group.create_dataset(
+                    column,
+                    shape=(0, max(nrows, 1)),
+                    maxshape=(None, None),
+                    dtype=np.float64,
+                    fillvalue=np.nan,
+                    # a block of runs by a block of time points so both
+                    # time courses and values across runs read few chunks
+                    chunks=(16, min(max(nrows, 1), 1024)),
+                    compression=self.compression,
+                    shuffle=self.compression is not None,
+                )
+            ds = group[column]
+            ds.resize((run + 1, max(ds.shape[1], nrows)))
+            if nrows > 0:
+                ds[run, :nrows] = data[:, icol]
+
+    def _run_index(self, runs):
+        if runs is None:
+            return slice(None), None
+        if isinstance(runs, slice):
+            return runs, None
+        runs = np.atleast_1d(np.asarray(runs, dtype=np.int64))
+        # h5py needs increasing indices
+        order = np.argsort(runs)
+        uniq, inverse = np.unique(runs[order], return_inverse=True)
+        undo = np.empty_like(order)
+        undo[order] = np.arange(order.shape[0])
+        return uniq, inverse[undo]
+
+    def get(self, column, name=None, kind="gdat", runs=None, t=None):
+        if name is None:
+            names = self.names(kind)
+            # TODO: Transition to BNGErrors and logging
+            assert (
+                len(names) == 1
+            ), f"The store has {len(names)} {kind} files, pick one with name"
+            name = names[0]
+        group = self.file[f"{kind}/{name}"]
+        index, reorder = self._run_index(runs)
+        if t is None:
+            data = group[column][index, :]
+        else:
+            # first column is time, or the parameter for scans
+            tcol = group.attrs["columns"][0]
+            times = group[tcol][index, :]
+            with np.errstate(invalid="ignore"):
+                cols = np.nanargmin(np.abs(times - t), axis=1)
+            # only read the range of time points we need
+            start, end = cols.min(), cols.max() + 1
+            block = group[column][index, start:end]
+            data = block[np.arange(block.shape[0]), cols - start]
+        if reorder is not None:
+            data = data[reorder]
+        return data
+
+    def find_runs(self, **params):
+        mask = np.ones(self.n_runs, dtype=bool)
+        stored = self.params
+        for name, value in params.items():
+            if name not in stored:
+                return np.array([], dtype=np.int64)
+            mask &= np.isclose(stored[name], value)
+        return np.nonzero(mask)[0]
+
+    def close(self) -> None:
+        if self.file:
+            self.file.close()
+
+
+def _writer_loop(path, queue, compression):
+    with BNGResultStore(path, mode="a", compression=compression) as store:
+        while True:
+            item = queue.get()
+            if item is None:
+                break
+            packed, params, label = item
+            store.append(packed, params=params, label=label)
+
+
+class BNGResultStoreWriter:
+    """
+    Starts a process that owns a BNGResultStore and adds every result
+    sent to it, so many processes (e.g. run_batch or a process pool)
+    can add runs to the same store. The writer can be passed to worker
+    processes, submit only sends the packed arrays through a queue.
+
+    Usage: with BNGResultStoreWriter("results.h5") as writer:
+               writer.submit(result, params={"kf": 0.1})
+
+    Arguments
+    ---------
+    path : str
+        path to the HDF5 file of the store
+    compression : str
+        (optional) compression used for the datasets, "gzip" by default
+
+    Methods
+    -------
+    submit(result, params=None, label=None) : None
+        sends a BNGResult to the writer process to be added as a run
+    close() : None
+        waits for every submitted result to be written and stops
+        the writer process
+    """
+
+    def __init__(self, path, compression="gzip") -> None:
+        import multiprocessing as mp
+
+        _import_h5py()
+        self.path = os.path.abspath(path)
+        # a manager queue can be sent to pool workers
+        self._manager = mp.Manager()
+        self.queue = self._manager.Queue()
+        self._process = mp.Process(
+            target=_writer_loop,
+            args=(self.path, self.queue, compression),
+            daemon=True,
+        )
+        self._process.start()
+
+    def __getstate__(self):
+        # only the queue goes to other processes
+        return {"path": self.path, "queue": self.queue}
+
+    def __setstate__(self, state):
+        self.path = state["path"]
+        self.queue = state["queue"]
+        self._manager = None
+        self._process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def submit(self, result, params=None, label=None) -> None:
+        if not isinstance(result, dict):
+            result = pack_result(result)
+        self.queue.put((result, params, label))
+
+    def close(self) -> None:
+        if self._process is None:
+            return
+        self.queue.put(None)
+        self._process.join()
+        self._manager.shutdown()
+        exitcode = self._process.exitcode
+        self._process = None
+        if exitcode != 0:
+            raise RuntimeError(
+                f"Result store writer for {self.path} failed with exit code {exitcode}"
+            )
@@ -34,8 +34,8 @@ class VisResult:
         # we need to assume some sort of GML output
         # at least for now
         # use the name, if given, search for GMLs if not
-        gmls = glob.glob("*.gml")
-        graphmls = glob.glob("*.graphml")
+        gmls = glob.glob(os.path.join(self.input_folder, "*.gml"))
+        graphmls = glob.glob(os.path.join(self.input_folder, "*.graphml"))
         graphfiles = gmls + graphmls
         for gfile in graphfiles:
             if self.name is None:
@@ -57,10 +57,9 @@ class VisResult:
         self.logger.debug(
             "Writing graphml/gml files", loc=f"{__file__} : VisResult._dump_files()"
         )
-        os.chdir(folder)
         for gfile in self.files:
             g_name = os.path.split(gfile)[-1]
-            with open(g_name, "w") as f:
+            with open(os.path.join(folder, g_name), "w") as f:
                 f.write(self.file_strs[gfile])
 
 
@@ -169,8 +168,6 @@ class BNGVisualize:
                 )
             else:
                 model.add_action("visualize", action_args={"type": f"'{self.vtype}'"})
-        # TODO: Work in temp folder
-        cur_dir = os.getcwd()
         from bionetgen.core.main import BNGCLI
 
         self.logger.debug(
@@ -186,17 +183,14 @@ class BNGVisualize:
                     cli.run()
                     # load vis
                     vis_res = VisResult(
-                        os.path.abspath(os.getcwd()),
+                        cli.output,
                         name=model.model_name,
                         vtype=self.vtype,
                     )
-                    # go back
-                    os.chdir(cur_dir)
                     # dump files
-                    vis_res._dump_files(cur_dir)
+                    vis_res._dump_files(os.getcwd())
                     return vis_res
                 except Exception as e:
-                    os.chdir(cur_dir)
                     print("Couldn't run the simulation, see error.")
                     raise e
         else:
@@ -206,18 +200,15 @@ class BNGVisualize:
                 cli.run()
                 # load vis
                 vis_res = VisResult(
-                    os.path.abspath(os.getcwd()),
+                    cli.output,
                     name=model.model_name,
                     vtype=self.vtype,
                 )
-                # go back
-                os.chdir(cur_dir)
                 return vis_res
             except Exception as e:
                 self.logger.error(
                     "Failed to run file",
                     loc=f"{__file__} : BNGVisualize._normal_mode()",
                 )
-                os.chdir(cur_dir)
                 print("Couldn't run the simulation, see error.")
                 raise e
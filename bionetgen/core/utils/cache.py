@@ -0,0 +1,185 @@
+import os, shutil, hashlib, tempfile
+
+from bionetgen.core.utils.logging import BNGLogger
+
+
+class BNGCache:
+    """
+    Content addressed on-disk cache for text files generated by BNG2.pl
+    (e.g. BNG-XML). Entries are stored under a folder and are named after
+    the hash of everything that went into generating them. The cache is
+    bounded in size and evicts least recently used entries first. Entries
+    can also be folders of files (e.g. compiled libraries) that are added
+    by the caller, their size is the size of the files in them.
+
+    Usage: BNGCache(cache_dir)
+           BNGCache(cache_dir, max_size=256, suffix=".xml")
+
+    Arguments
+    ---------
+    cache_dir : str
+        path to the folder the cache entries are stored in
+    max_size : float
+        maximum size of the cache in megabytes
+    suffix : str
+        file extension used for the cache entries
+
+    Methods
+    -------
+    make_key(*parts) : str
+        hashes the given strings into a cache key
+    get(key) : str
+        returns the cached content for the key, None if not found
+    put(key, content) : None
+        stores the content under the given key, evicting old entries if needed
+    evict(keep=None) : None
+        removes least recently used entries until the cache fits in
+        max_size, except for the entry with the key keep
+    stats() : dict
+        returns a dictionary with the location, entry count and size of the cache
+    clear() : None
+        removes every entry in the cache
+    """
+
+    def __init__(self, cache_dir, max_size=256, suffix=".xml", app=None) -> None:
+        self.app = app
+        self.logger = BNGLogger(app=self.app)
+        self.cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+        self.max_size = float(max_size)
+        self.suffix = suffix
+
+    def __repr__(self) -> str:
+        return f"BNGCache({self.cache_dir})"
+
+    def make_key(self, *parts) -> str:
+        hasher = hashlib.sha256()
+        for part in parts:
+            hasher.update(str(part).encode("utf-8"))
+            # separator so ("ab", "c") and ("a", "bc") differ
+            hasher.update(b"\0")
+        return hasher.hexdigest()
+
+    def _entry_path(self, key) -> str:
+        return os.path.join(self.cache_dir, key + self.suffix)
+
+    def _entries(self) -> list:
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for fname in os.listdir(self.cache_dir):
+            if not fname.endswith(self.suffix):
+                continue
+            fpath = os.path.join(self.cache_dir, fname)
+            try:
+                st = os.stat(fpath)
+                size = st.st_size
+                if os.path.isdir(fpath):
+                    size = self._folder_size(fpath)
+            except FileNotFoundError:
+                # removed by another process in the meantime
+                continue
+            entries.append((st.st_mtime, size, fpath))
+        return entries
+
+    @staticmethod
+    def _folder_size(path) -> int:
+        size = 0
+        for root, _, fnames in os.walk(path):
+            for fname in fnames:
+                try:
+                    size += os.stat(os.path.join(root, fname)).st_size
+                except FileNotFoundError:
+                    pass
+        return size
+
+    @staticmethod
+    def _remove(fpath) -> None:
+        if os.path.isdir(fpath):
+            shutil.rmtree(fpath, ignore_errors=True)
+        else:
+            try:
+                os.remove(fpath)
+            except FileNotFoundError:
+                pass
+
+    def get(self, key):
+        fpath = self._entry_path(key)
+        try:
+            with open(fpath, "r", encoding="UTF-8") as f:
+                content = f.read()
+        except FileNotFoundError:
+            self.logger.debug(
+                f"Cache miss for key {key}", loc=f"{__file__} : BNGCache.get()"
+            )
+            return None
+        # mark the entry as recently used
+        try:
+            os.utime(fpath)
+        except OSError:
+            pass
+        self.logger.debug(
+            f"Cache hit for key {key}", loc=f"{__file__} : BNGCache.get()"
+        )
+        return content
+
+    def put(self, key, content) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # write to a temporary file first and move it in place
+        # so other processes never see a partially written entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="UTF-8") as f:
+                f.write(content)
+            os.replace(tmp_path, self._entry_path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self, keep=None) -> None:
+        entries = self._entries()
+        max_bytes = self.max_size * 1024 * 1024
+        total = sum([e[1] for e in entries])
+        if total <= max_bytes:
+            return
+        keep_path = None if keep is None else self._entry_path(keep)
+        # oldest first
+        for _, size, fpath in sorted(entries):
+            if total <= max_bytes:
+                break
+            if fpath == keep_path:
+                continue
+            self._remove(fpath)
+            total -= size
+            self.logger.debug(
+                f"Evicted cache entry {fpath}", loc=f"{__file__} : BNGCache.evict()"
+            )
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        return {
+            "path": self.cache_dir,
+            "entries": len(entries),
+            "size": sum([e[1] for e in entries]) / (1024 * 1024),
+            "max_size": self.max_size,
+        }
+
+    def clear(self) -> None:
+        for _, _, fpath in self._entries():
+            self._remove(fpath)
+
+
+def get_xml_cache(config):
+    """
+    Returns the BNG-XML cache set up using the given configuration
+    dictionary, None if the cache is turned off.
+
+    Usage: get_xml_cache(app.config["bionetgen"])
+    """
+    from bionetgen.core.config import conf_flag
+
+    if not conf_flag(config.get("xml_cache", True)):
+        return None
+    cache_dir = os.path.join(config.get("cache_dir"), "xml")
+    return BNGCache(cache_dir, max_size=config.get("xml_cache_size", 256))
@@ -0,0 +1,517 @@
+import io, os, json, tempfile, threading, time
+from itertools import islice
+import numpy as np
+
+# numpy.loadtxt has a C parser since numpy 1.23 and is the fastest
+# option there, before that it parses in python and fromstring is used.
+# Parsing text isn't faster than the old structured loadtxt, only the
+# binary sidecar files skip it (see test_result_dat_reader_benchmark)
+_c_loadtxt = tuple(int(v) for v in np.__version__.split(".")[:2]) >= (1, 23)
+
+
+def read_header(fpath):
+    """
+    Reads the header line of a gdat/cdat/scan file and returns
+    the list of column names
+
+    Usage: read_header(path)
+
+    Arguments
+    ---------
+    fpath : str
+        path to the gdat/cdat/scan file
+    """
+    with open(fpath, "r") as f:
+        header = f.readline()
+    return _parse_header(header, fpath)
+
+
+def _parse_header(header, fpath=None):
+    # Ensure the header info is actually there
+    # TODO: Transition to BNGErrors and logging
+    assert header.startswith("#"), f"No header line that starts with # in {fpath}"
+    return header.replace("#", "").split()
+
+
+def parse_rows(text, ncols):
+    """
+    Parses the whitespace separated numbers in the given text (str or
+    bytes) into a 2-D float64 array with ncols columns. Uses numpy.loadtxt,
+    on numpy older than 1.23 numpy.fromstring is tried first since
+    loadtxt parses in python there.
+
+    Usage: parse_rows(text, ncols)
+    """
+    if isinstance(text, str):
+        text = text.encode("utf-8")
+    if len(text.strip()) == 0:
+        return np.empty((0, ncols), dtype=np.float64)
+    if not _c_loadtxt and b"#" not in text:
+        # fromstring stops at the first thing it can't parse
+        # so the size check catches bad input
+        data = np.fromstring(text, dtype=np.float64, sep=" ")
+        if data.size % ncols == 0 and data.size > 0:
+            return data.reshape(-1, ncols)
+    data = np.loadtxt(io.BytesIO(text), dtype=np.float64, comments="#", ndmin=2)
+    # TODO: Transition to BNGErrors and logging
+    assert (
+        data.shape[1] == ncols
+    ), f"Expected {ncols} columns but the data has {data.shape[1]}"
+    return data
+
+
+def read_dat(fpath, sidecar=False):
+    """
+    Reads a gdat/cdat/scan file into a plain 2-D float64 array
+    of shape (time points, columns) and a dictionary that maps
+    each column name to its column index.
+
+    If sidecar is True and there is an up to date binary sidecar
+    next to the file (see write_sidecar) the sidecar is memory mapped
+    instead of parsing the text. If there isn't one, it's written after
+    the text is parsed.
+
+    Usage: data, columns = read_dat(path)
+           data[:, columns["time"]]
+
+    Arguments
+    ---------
+    fpath : str
+        path to the gdat/cdat/scan file
+    sidecar : bool
+        (optional) use and write a binary sidecar file
+    """
+    if sidecar:
+        loaded = read_sidecar(fpath)
+        if loaded is not None:
+            return loaded
+        # stat before parsing, if the file changes
+        # while we read it the sidecar is outdated
+        source_stat = os.stat(fpath)
+    data, columns = _read_text(fpath)
+    if sidecar:
+        try:
+            write_sidecar(fpath, data, columns, source_stat=source_stat)
+        except OSError:
+            # e.g. read only folder, the sidecar is only a shortcut
+            pass
+    return data, columns
+
+
+def _read_text(fpath):
+    if _c_loadtxt:
+        # the C parser reads the file in chunks itself,
+        # no need to hold the text in memory
+        with open(fpath, "r") as f:
+            names = _parse_header(f.readline(), fpath)
+            data = np.loadtxt(f, dtype=np.float64, comments="#", ndmin=2)
+        if data.size == 0:
+            data = data.reshape(0, len(names))
+        # TODO: Transition to BNGErrors and logging
+        assert data.shape[1] == len(
+            names
+        ), f"Expected {len(names)} columns but the data has {data.shape[1]}"
+    else:
+        with open(fpath, "rb") as f:
+            names = _parse_header(f.readline().decode("utf-8"), fpath)
+            data = parse_rows(f.read(), len(names))
+    columns = {name: i for i, name in enumerate(names)}
+    return data, columns
+
+
+def read_dat_selection(
+    fpath, columns=None, t_range=None, stride=None, sidecar=False, chunk_rows=10000
+):
+    """
+    Reads only part of a gdat/cdat/scan file, the given columns and/or
+    the rows within a time window, optionally only every stride-th row of
+    that window. The file is parsed chunk_rows lines at a time and only
+    the columns needed are parsed, so memory use is proportional to the
+    selection and not to the size of the file. Returns a 2-D float64 array
+    and a dictionary of column name to index like read_dat.
+
+    Usage: read_dat_selection(path, columns=["time", "A"])
+           read_dat_selection(path, t_range=(10, 20), stride=5)
+
+    Arguments
+    ---------
+    fpath : str
+        path to the gdat/cdat/scan file
+    columns : list
+        (optional) names of the columns to load, in the order they
+        should be returned. Defaults to all columns
+    t_range : tuple
+        (optional) (start, end) of the time window to load, inclusive.
+        Either end can be None. The first column of the file is used,
+        which is the scanned parameter for scan files
+    stride : int
+        (optional) only load every stride-th row of the time window
+    sidecar : bool
+        (optional) select from an up to date binary sidecar if there is one
+    chunk_rows : int
+        (optional) number of lines parsed at a time
+    """
+    names = read_header(fpath)
+    col_dict = {name: i for i, name in enumerate(names)}
+    if columns is None:
+        columns = names
+    columns = list(columns)
+    missing = [c for c in columns if c not in col_dict]
+    if len(missing) > 0:
+        raise ValueError(f"Columns {missing} are not in {fpath}")
+    if stride is None:
+        stride = 1
+    if stride < 1:
+        raise ValueError(f"stride has to be a positive integer, not {stride}")
+    start, end = (None, None) if t_range is None else t_range
+    sel_idx = [col_dict[c] for c in columns]
+    out_columns = {name: i for i, name in enumerate(columns)}
+
+    def window(times):
+        mask = np.ones(times.shape[0], dtype=bool)
+        if start is not None:
+            mask &= times >= start
+        if end is not None:
+            mask &= times <= end
+        return np.nonzero(mask)[0]
+
+    if sidecar:
+        loaded = read_sidecar(fpath)
+        if loaded is not None:
+            data, _ = loaded
+            rows = window(data[:, 0])[::stride]
+            # fancy indexing the map only copies the selection
+            return data[np.ix_(rows, sel_idx)], out_columns
+
+    # the time column is only parsed if we need it
+    parse_idx = set(sel_idx)
+    if t_range is not None:
+        parse_idx.add(0)
+    parse_idx = sorted(parse_idx)
+    pos = {c: i for i, c in enumerate(parse_idx)}
+    out_idx = [pos[c] for c in sel_idx]
+    pieces = []
+    seen = 0
+    for block in _iter_blocks(fpath, parse_idx, chunk_rows):
+        if t_range is not None:
+            rows = window(block[:, pos[0]])
+        else:
+            rows = np.arange(block.shape[0])
+        # stride counts over the whole window, not per chunk
+        keep = rows[(seen + np.arange(rows.shape[0])) % stride == 0]
+        seen += rows.shape[0]
+        if keep.shape[0] > 0:
+            pieces.append(block[np.ix_(keep, out_idx)])
+    if len(pieces) == 0:
+        return np.empty((0, len(columns)), dtype=np.float64), out_columns
+    return np.concatenate(pieces), out_columns
+
+
+def _iter_blocks(fpath, usecols, chunk_rows):
+    # parses the data lines of the file chunk_rows lines
+    # at a time, only the given columns are parsed
+    with open(fpath, "r") as f:
+        f.readline()
+        while True:
+            raw = list(islice(f, chunk_rows))
+            if len(raw) == 0:
+                break
+            lines = [l for l in raw if l.strip() and not l.lstrip().startswith("#")]
+            if len(lines) == 0:
+                continue
+            yield np.loadtxt(
+                lines, dtype=np.float64, usecols=usecols, comments="#", ndmin=2
+            )
+
+
+def iter_chunks(fpath, rows=10000, columns=None):
+    """
+    Iterates over a gdat/cdat/scan file rows lines at a time without
+    loading the whole file. Yields (times, block) where times is a 1-D
+    array of the first column (the scanned parameter for scan files) and
+    block is a 2-D float64 array of the other columns, or of the given
+    columns. Both have at most rows rows.
+
+    Usage: for times, block in iter_chunks(path):
+               ...
+           iter_chunks(path, rows=1000, columns=["A", "B"])
+
+    Arguments
+    ---------
+    fpath : str
+        path to the gdat/cdat/scan file
+    rows : int
+        (optional) maximum number of rows in each chunk
+    columns : list
+        (optional) names of the columns to put in the blocks,
+        defaults to every column but the first
+    """
+    if rows < 1:
+        raise ValueError(f"rows has to be a positive integer, not {rows}")
+    names = read_header(fpath)
+    col_dict = {name: i for i, name in enumerate(names)}
+    if columns is None:
+        columns = names[1:]
+    missing = [c for c in columns if c not in col_dict]
+    if len(missing) > 0:
+        raise ValueError(f"Columns {missing} are not in {fpath}")
+    sel_idx = [col_dict[c] for c in columns]
+    parse_idx = sorted(set(sel_idx) | {0})
+    pos = {c: i for i, c in enumerate(parse_idx)}
+    out_idx = [pos[c] for c in sel_idx]
+    for block in _iter_blocks(fpath, parse_idx, rows):
+        yield block[:, pos[0]].copy(), block[:, out_idx]
+
+
+def sidecar_paths(fpath):
+    """
+    Returns the paths of the binary array and the JSON header
+    of the sidecar of the given gdat/cdat/scan file
+
+    Usage: npy_path, json_path = sidecar_paths(path)
+    """
+    return fpath + ".npy", fpath + ".json"
+
+
+def write_sidecar(fpath, data, columns, source_stat=None):
+    """
+    Writes the binary sidecar of a gdat/cdat/scan file, the data is
+    saved as an .npy file and the column names along with the size and
+    modification time of the text file go into a .json header. Both are
+    written atomically, the header last.
+
+    Usage: write_sidecar(path, data, columns)
+    """
+    npy_path, json_path = sidecar_paths(fpath)
+    if source_stat is None:
+        source_stat = os.stat(fpath)
+    folder = os.path.dirname(os.path.abspath(fpath))
+    fd, tmp_npy = tempfile.mkstemp(dir=folder, suffix=".npy.tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, np.ascontiguousarray(data, dtype=np.float64))
+        os.replace(tmp_npy, npy_path)
+    except BaseException:
+        if os.path.exists(tmp_npy):
+            os.remove(tmp_npy)
+        raise
+    header = {
+        "names": list(columns),
+        "source_size": source_stat.st_size,
+        "source_mtime_ns": source_stat.st_mtime_ns,
+    }
+    fd, tmp_json = tempfile.mkstemp(dir=folder, suffix=".json.tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(header, f)
+        os.replace(tmp_json, json_path)
+    except BaseException:
+        if os.path.exists(tmp_json):
+            os.remove(tmp_json)
+        raise
+
+
+def read_sidecar(fpath):
+    """
+    Memory maps the binary sidecar of a gdat/cdat/scan file. Returns
+    the data and the column dictionary like read_dat, or None if there
+    is no sidecar or the text file changed since it was written. The
+    mapping is copy-on-write, changes to the array never go to disk and
+    processes that map the same file share the memory.
+
+    Usage: read_sidecar(path)
+    """
+    npy_path, json_path = sidecar_paths(fpath)
+    try:
+        source_stat = os.stat(fpath)
+        with open(json_path, "r") as f:
+            header = json.load(f)
+        if (
+            header["source_size"] != source_stat.st_size
+            or header["source_mtime_ns"] != source_stat.st_mtime_ns
+            or os.stat(npy_path).st_mtime_ns < source_stat.st_mtime_ns
+        ):
+            return None
+        data = np.load(npy_path, mmap_mode="c")
+    except (OSError, ValueError, KeyError):
+        return None
+    columns = {name: i for i, name in enumerate(header["names"])}
+    return data, columns
+
+
+def as_recarray(data, names):
+    """
+    Returns a numpy record array view of a 2-D float64 array from
+    read_dat, with one field per column. The view shares memory with
+    the array, no data is copied.
+
+    Usage: as_recarray(data, columns)
+    """
+    names = list(names)
+    data = np.ascontiguousarray(data, dtype=np.float64)
+    dtype = np.dtype({"names": names, "formats": ["f8"] * len(names)})
+    return data.view(dtype).reshape(data.shape[0]).view(np.recarray)
+
+
+class BNGDatFollower:
+    """
+    Follows a gdat/cdat/scan file while it's being written, e.g. by a
+    BNG2.pl run in another thread or process. The follower remembers how
+    far it has read and each poll only parses the complete lines that
+    were added since, a partially written last line is left for the next
+    poll. If the file is replaced or rewritten (BNG2.pl truncates the file
+    and writes it again for each new simulation) it starts again from the
+    top. A rewrite is noticed by the file getting shorter or by the header,
+    the first row or the last row read so far not being in the file anymore.
+
+    Usage: follower = BNGDatFollower("/path/to/model.gdat")
+           new_rows = follower.poll()
+           for new_rows in follower.follow(timeout=60):
+               ...
+           follower.start(callback)
+
+    Arguments
+    ---------
+    fpath : str
+        path to the gdat/cdat/scan file, it doesn't have to exist yet
+    interval : float
+        (optional) seconds to wait between polls in follow and start
+
+    Methods
+    -------
+    poll() : numpy.ndarray
+        returns the rows added since the last poll as a 2-D float64
+        array, with no rows if nothing new is there
+    follow(timeout=None, stop=None) : generator
+        polls every interval seconds and yields each non empty set of
+        new rows, until the timeout runs out or stop() returns True
+    start(callback) : None
+        polls in a background thread and calls callback(new_rows, follower)
+        for each non empty set of new rows. If the callback returns True
+        the follower stops
+    stop() : None
+        stops the background thread
+    """
+
+    def __init__(self, fpath, interval=0.5) -> None:
+        self.fpath = fpath
+        self.interval = interval
+        self.names = None
+        self.columns = None
+        self.offset = 0
+        self.rows_read = 0
+        self.error = None
+        self._inode = None
+        # bytes at the top of the file (header and first row) and
+        # (position, bytes) of the last row read, to notice rewrites
+        self._head = b""
+        self._last = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _reset(self) -> None:
+        self.names = None
+        self.columns = None
+        self.offset = 0
+        self.rows_read = 0
+        self._inode = None
+        self._head = b""
+        self._last = None
+
+    def _rewritten(self, f) -> bool:
+        # the lines we've read have to still be where we read them
+        f.seek(0)
+        if f.read(len(self._head)) != self._head:
+            return True
+        if self._last is not None:
+            pos, line = self._last
+            f.seek(pos)
+            return f.read(len(line)) != line
+        return False
+
+    def poll(self):
+        try:
+            stat = os.stat(self.fpath)
+        except FileNotFoundError:
+            return self._empty()
+        if self._inode is not None and (
+            stat.st_ino != self._inode or stat.st_size < self.offset
+        ):
+            # the file was replaced or truncated, start over
+            self._reset()
+        if self.offset == 0 and stat.st_size == 0:
+            return self._empty()
+        with open(self.fpath, "rb") as f:
+            if self.offset > 0 and self._rewritten(f):
+                # rewritten in place to at least the same length
+                self._reset()
+            if stat.st_size == self.offset:
+                return self._empty()
+            f.seek(self.offset)
+            text = f.read(stat.st_size - self.offset)
+        start = 0
+        if self.names is None:
+            end = text.find(b"\n")
+            if end < 0:
+                # header isn't fully written yet
+                return self._empty()
+            self.names = _parse_header(text[:end].decode("utf-8"), self.fpath)
+            self.columns = {name: i for i, name in enumerate(self.names)}
+            self._inode = stat.st_ino
+            self._head = text[: end + 1]
+            start = end + 1
+        # only parse up to the last complete line
+        end = text.rfind(b"\n")
+        if end < start:
+            self.offset += start
+            return self._empty()
+        data = parse_rows(text[start : end + 1], len(self.names))
+        if self.rows_read == 0:
+            self._head += text[start : text.find(b"\n", start) + 1]
+        last = max(text.rfind(b"\n", start, end) + 1, start)
+        self._last = (self.offset + last, text[last : end + 1])
+        self.offset += end + 1
+        self.rows_read += data.shape[0]
+        return data
+
+    def _empty(self):
+        ncols = 0 if self.names is None else len(self.names)
+        return np.empty((0, ncols), dtype=np.float64)
+
+    def follow(self, timeout=None, stop=None):
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        while True:
+            data = self.poll()
+            if data.shape[0] > 0:
+                yield data
+            if stop is not None and stop():
+                # pick up whatever was written last
+                data = self.poll()
+                if data.shape[0] > 0:
+                    yield data
+                return
+            if timeout is not None and time.monotonic() >= deadline:
+                return
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self, callback) -> None:
+        self._stop.clear()
+
+        def watch():
+            try:
+                for data in self.follow():
+                    if callback(data, self):
+                        break
+            except Exception as e:
+                self.error = e
+
+        self._thread = threading.Thread(target=watch, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
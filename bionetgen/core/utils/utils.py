@@ -1,8 +1,12 @@
-import os, subprocess
+import os, subprocess, json, tempfile, collections, threading, signal
 from bionetgen.core.exc import BNGPerlError
-from distutils import spawn
 
 from bionetgen.core.utils.logging import BNGLogger
+from bionetgen.core.utils.workers import get_worker_pool
+
+# BNG2.pl files check_bngexec found working in this process,
+# keyed on the path, modification time, size and BNG version
+_bngexec_checks = {}
 
 
 class ActionList:
@@ -567,14 +571,16 @@ def find_BNG_path(BNGPATH=None):
     # if still none, try pulling it from cmd line
     if BNGPATH is None:
         bngexec = "BNG2.pl"
-        if test_bngexec(bngexec):
+        if check_bngexec(bngexec):
             # print("BNG2.pl seems to be working")
             # get the source of BNG2.pl
+            from distutils import spawn
+
             BNGPATH = spawn.find_executable("BNG2.pl")
             BNGPATH, _ = os.path.split(BNGPATH)
     else:
         bngexec = os.path.join(BNGPATH, "BNG2.pl")
-        if not test_bngexec(bngexec):
+        if not check_bngexec(bngexec):
             RuntimeError("BNG2.pl is not working")
     return BNGPATH, bngexec
 
@@ -592,6 +598,8 @@ def test_perl(app=None, perl_path=None):
     logger.debug("Checking if perl is installed.", loc=f"{__file__} : test_perl()")
     # find path to perl binary
     if perl_path is None:
+        from distutils import spawn
+
         perl_path = spawn.find_executable("perl")
     if perl_path is None:
         raise BNGPerlError
@@ -621,49 +629,228 @@ def test_bngexec(bngexec):
         return False
 
 
-def run_command(command, suppress=True, timeout=None):
+def check_bngexec(bngexec, stamp_file=None):
+    """
+    Same as test_bngexec but a BNG2.pl that passes is remembered, so
+    BNG2.pl is only ran once per process for a given BNG2.pl file. It's
+    also recorded in a stamp file on disk along with its modification
+    time, size and BNG version, other processes only need to compare
+    these instead of running BNG2.pl. Any change to the file means it
+    gets tested again. Failures aren't remembered, they might be
+    temporary (e.g. perl missing from PATH) so the next call tries again.
+
+    Usage: check_bngexec(path)
+           check_bngexec(path, stamp_file=path)
+
+    Arguments
+    ---------
+    bngexec : str
+        path to BNG2.pl to test
+    stamp_file : str
+        (optional) path to the stamp file, defaults to bngexec.json
+        in the configured cache folder
+    """
+    bngexec = os.path.abspath(bngexec)
+    # cheap checks first, no need to start perl
+    # for a file that isn't there
+    try:
+        st = os.stat(bngexec)
+    except OSError:
+        return False
+    if not os.path.isfile(bngexec):
+        return False
+    version = None
+    version_file = os.path.join(os.path.dirname(bngexec), "VERSION")
+    if os.path.isfile(version_file):
+        with open(version_file, "r") as f:
+            version = f.read().strip()
+    stamp = [st.st_mtime_ns, st.st_size, version]
+    # checked before in this process
+    key = (bngexec, *stamp)
+    if key in _bngexec_checks:
+        return _bngexec_checks[key]
+    # checked before by another process
+    if stamp_file is None:
+        from bionetgen.core.config import get_conf
+
+        stamp_file = os.path.join(get_conf()["cache_dir"], "bngexec.json")
+    stamps = {}
+    try:
+        with open(stamp_file, "r") as f:
+            stamps = json.load(f)
+    except (OSError, ValueError):
+        pass
+    if stamps.get(bngexec) == stamp:
+        _bngexec_checks[key] = True
+        return True
+    # we need to actually run it
+    works = test_bngexec(bngexec)
+    if works:
+        _bngexec_checks[key] = True
+        stamps[bngexec] = stamp
+        # the stamp file is only a shortcut,
+        # failing to write it is not an error
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(stamp_file)), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(os.path.abspath(stamp_file)), suffix=".tmp"
+            )
+            with os.fdopen(fd, "w") as f:
+                json.dump(stamps, f)
+            os.replace(tmp_path, stamp_file)
+        except OSError:
+            pass
+    return works
+
+
+def run_command(
+    command,
+    suppress=True,
+    timeout=None,
+    cwd=None,
+    env=None,
+    log_file=None,
+    max_lines=1000,
+):
     """
     A convenience function to run a given command. The command should be
     given as a list of values e.g. ['command', 'arg1', 'arg2'] etc.
 
-    Suppress kwarg suppresses all output from the command and timeout kwarg
-    allows you to set a time period in seconds after which the command will
-    be killed.
+    Suppress kwarg suppresses printing the output of the command and timeout
+    kwarg allows you to set a time period in seconds after which the command
+    will be killed, along with any process it started. The cwd and env kwargs
+    set the working directory and the environment of the command without
+    touching the ones of the current process, which makes it safe to call
+    from multiple threads.
+
+    Output (stdout and stderr) is read line by line as it comes in. Only the
+    last max_lines lines are kept in memory and returned, if log_file is given
+    every line is also written to that file as it arrives.
+
+    If a BNG2.pl worker pool is running (see start_workers) BNG2.pl
+    commands are sent to the pool instead of starting a new perl process.
+
+    Returns the return code and the list of the last max_lines lines of output.
+    Raises subprocess.TimeoutExpired if the timeout runs out, the last lines
+    of output are in its output attribute.
     """
-    if timeout is not None:
-        if suppress:
-            # I am unsure how to do both timeout and the live polling of stdo
-            rc = subprocess.run(
-                command,
-                timeout=timeout,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
-            return rc.returncode, rc
-        else:
-            # I am unsure how to do both timeout and the live polling of stdo
-            rc = subprocess.run(command, timeout=timeout, capture_output=True)
-            return rc.returncode, rc
-    else:
-        if suppress:
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                bufsize=-1,
-            )
-            rc = process.wait()
-            return rc, process
+    pool = get_worker_pool(command)
+    if pool is not None:
+        return _run_in_pool(
+            pool,
+            command,
+            suppress=suppress,
+            timeout=timeout,
+            cwd=cwd,
+            env=env,
+            log_file=log_file,
+            max_lines=max_lines,
+        )
+    # the command gets its own process group so that
+    # we can kill it along with everything it started
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        encoding="utf8",
+        errors="replace",
+        cwd=cwd,
+        env=env,
+        start_new_session=(os.name != "nt"),
+    )
+    out = collections.deque(maxlen=max_lines)
+    log = None
+    if log_file is not None:
+        log = open(log_file, "w")
+    # output is read in a separate thread so
+    # we can wait on the timeout at the same time
+    reader = threading.Thread(
+        target=_read_output, args=(process.stdout, out, suppress, log), daemon=True
+    )
+    reader.start()
+    try:
+        rc = process.wait(timeout=timeout)
+    except BaseException as e:
+        # timeout or KeyboardInterrupt, we don't want to leave BNG2.pl
+        # and the simulators it started running
+        _kill_process(process)
+        reader.join()
+        if log is not None:
+            log.close()
+        if isinstance(e, subprocess.TimeoutExpired):
+            raise subprocess.TimeoutExpired(command, timeout, output="\n".join(out))
+        raise
+    reader.join()
+    if log is not None:
+        log.close()
+    return rc, list(out)
+
+
+def _read_output(stream, out, suppress, log):
+    """
+    Reads the given stream line by line until it's closed,
+    used by run_command
+    """
+    for line in stream:
+        o = line.strip()
+        out.append(o)
+        if not suppress:
+            print(o)
+        if log is not None:
+            log.write(o + "\n")
+            log.flush()
+    stream.close()
+
+
+def _kill_process(process):
+    """
+    Kills a process started by run_command with its process group
+    """
+    try:
+        if os.name == "nt":
+            process.kill()
         else:
-            process = subprocess.Popen(command, stdout=subprocess.PIPE, encoding="utf8")
-            out = []
-            while True:
-                output = process.stdout.readline()
-                if output == "" and process.poll() is not None:
-                    break
-                if output:
-                    o = output.strip()
-                    out.append(o)
-                    print(o)
-            rc = process.wait()
-            return rc, out
+            os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        # already gone
+        pass
+    process.wait()
+
+
+def _run_in_pool(
+    pool,
+    command,
+    suppress=True,
+    timeout=None,
+    cwd=None,
+    env=None,
+    log_file=None,
+    max_lines=1000,
+):
+    """
+    Runs a BNG2.pl command on a worker pool and returns the results in the
+    same form run_command would. The output is handled as it comes in, and
+    on a timeout only the BNG2.pl run is killed, not the worker.
+    """
+    out = collections.deque(maxlen=max_lines)
+    log = None
+    if log_file is not None:
+        log = open(log_file, "w")
+
+    def output(line):
+        o = line.decode("utf8", errors="replace").strip()
+        out.append(o)
+        if not suppress:
+            print(o)
+        if log is not None:
+            log.write(o + "\n")
+            log.flush()
+
+    try:
+        rc, _ = pool.run(command[2:], cwd=cwd, timeout=timeout, env=env, output=output)
+    except subprocess.TimeoutExpired:
+        raise subprocess.TimeoutExpired(command, timeout, output="\n".join(out))
+    finally:
+        if log is not None:
+            log.close()
+    return rc, list(out)
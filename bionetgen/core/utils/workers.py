@@ -0,0 +1,387 @@
+import os, subprocess, threading, tempfile, atexit, signal, select, time
+
+from bionetgen.core.utils.logging import BNGLogger
+
+# pools that are currently running, keyed on
+# the absolute path of the BNG2.pl they run
+_pools = {}
+_pools_lock = threading.Lock()
+
+worker_script = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    "assets",
+    "bngworker.pl",
+)
+
+
+class BNGWorker:
+    """
+    A single long running perl process that has the modules BNG2.pl
+    uses already loaded. Each request is ran in a fork of this process
+    so the perl interpreter startup and module compilation is only
+    paid once. See bionetgen/assets/bngworker.pl for the protocol.
+    If a request times out only its fork is killed, the worker is
+    kept for the next request.
+
+    Usage: BNGWorker(bngexec)
+           BNGWorker(bngexec, env=env)
+
+    Arguments
+    ---------
+    bngexec : str
+        path to BNG2.pl
+    env : dict
+        environment of the worker process, BNGPATH is set by default
+
+    Methods
+    -------
+    run(args, cwd=None, timeout=None, env=None, output=None) : (int, bytes)
+        runs BNG2.pl with the given arguments in the given folder and
+        environment (the one of the worker by default) and returns the
+        exit status and the output. If output is given it's called with
+        each line of output as it comes in instead and the returned
+        output is empty
+    close() : None
+        stops the worker
+    """
+
+    # seconds between checks for new output while a request runs
+    poll_interval = 0.1
+
+    def __init__(self, bngexec, env=None, app=None) -> None:
+        self.app = app
+        self.logger = BNGLogger(app=self.app)
+        self.bngexec = os.path.abspath(bngexec)
+        if env is None:
+            env = os.environ.copy()
+            env["BNGPATH"] = os.path.dirname(self.bngexec)
+        self.env = env
+        self.logger.debug(
+            f"Starting worker for {self.bngexec}",
+            loc=f"{__file__} : BNGWorker.__init__()",
+        )
+        # the worker gets its own process group so that
+        # on a timeout we can kill it with its children
+        self.process = subprocess.Popen(
+            ["perl", worker_script, self.bngexec],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=self.env,
+            start_new_session=True,
+        )
+        self._buffer = b""
+        self._child = None
+        self.alive = True
+        if self._readline(timeout=None) != b"READY":
+            self.kill()
+            raise RuntimeError(f"BNG2.pl worker for {self.bngexec} failed to start")
+
+    def _readline(self, timeout=None) -> bytes:
+        fd = self.process.stdout.fileno()
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        while b"\n" not in self._buffer:
+            wait = None
+            if timeout is not None:
+                wait = max(deadline - time.monotonic(), 0)
+            ready, _, _ = select.select([fd], [], [], wait)
+            if not ready:
+                raise subprocess.TimeoutExpired(self.process.args, timeout)
+            chunk = os.read(fd, 4096)
+            if not chunk:
+                # worker died, what we have is all we'll get
+                line, self._buffer = self._buffer, b""
+                return line
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return line
+
+    def run(self, args, cwd=None, timeout=None, env=None, output=None):
+        if cwd is None:
+            cwd = os.getcwd()
+        request = [os.path.abspath(cwd), ""] + [str(a) for a in args]
+        if any(["\t" in r or "\n" in r for r in request]):
+            raise ValueError("Worker requests can't contain tabs or newlines")
+        if env is not None:
+            pairs = "\0".join([f"{name}={value}" for name, value in env.items()])
+            request.insert(2, pairs.encode("utf-8").hex())
+        else:
+            request.insert(2, "")
+        lines = []
+        if output is None:
+            output = lines.append
+        fd, log_file = tempfile.mkstemp(suffix=".log")
+        os.close(fd)
+        request[1] = log_file
+        deadline = None
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        try:
+            self.logger.debug(
+                f"Sending request {args}", loc=f"{__file__} : BNGWorker.run()"
+            )
+            with _LogTail(log_file, output) as log:
+                try:
+                    self.process.stdin.write(
+                        ("\t".join(request) + "\n").encode("utf-8")
+                    )
+                    self.process.stdin.flush()
+                    response = self._readline(timeout=timeout)
+                    if response.startswith(b"STARTED\t"):
+                        self._child = int(response.split(b"\t")[1])
+                        response = self._wait_done(log, deadline, timeout)
+                except subprocess.TimeoutExpired:
+                    self._stop_child()
+                    log.read(final=True)
+                    raise subprocess.TimeoutExpired(
+                        ["perl", self.bngexec] + args, timeout
+                    )
+                except OSError:
+                    self.kill()
+                    raise RuntimeError(f"BNG2.pl worker for {self.bngexec} died")
+                except BaseException:
+                    # e.g. KeyboardInterrupt, don't leave BNG2.pl running
+                    self.kill()
+                    raise
+                self._child = None
+                if not response.startswith(b"DONE\t"):
+                    self.kill()
+                    raise RuntimeError(f"BNG2.pl worker for {self.bngexec} died")
+                rc = int(response.split(b"\t")[1])
+                log.read(final=True)
+        finally:
+            os.remove(log_file)
+        return rc, b"".join(lines)
+
+    def _wait_done(self, log, deadline, timeout) -> bytes:
+        # passes the output on as it comes in while BNG2.pl runs
+        while True:
+            wait = self.poll_interval
+            if timeout is not None:
+                wait = min(wait, max(deadline - time.monotonic(), 0))
+            try:
+                return self._readline(timeout=wait)
+            except subprocess.TimeoutExpired:
+                log.read()
+                if timeout is not None and time.monotonic() >= deadline:
+                    raise
+
+    def _stop_child(self) -> None:
+        # kills the running BNG2.pl with what it started, the
+        # worker itself stays around for the next request
+        if self._child is None:
+            self.kill()
+            return
+        try:
+            os.killpg(self._child, signal.SIGKILL)
+        except OSError:
+            pass
+        self._child = None
+        try:
+            response = self._readline(timeout=5)
+        except subprocess.TimeoutExpired:
+            response = b""
+        if not response.startswith(b"DONE\t"):
+            self.kill()
+
+    def kill(self) -> None:
+        self.alive = False
+        # the running BNG2.pl is in its own process group
+        for pgid in [self._child, self.process.pid]:
+            if pgid is None:
+                continue
+            try:
+                os.killpg(pgid, signal.SIGKILL)
+            except OSError:
+                pass
+        self._child = None
+        self.process.wait()
+
+    def close(self) -> None:
+        if not self.alive:
+            return
+        self.alive = False
+        try:
+            self.process.stdin.write(b"QUIT\n")
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.kill()
+
+
+class _LogTail:
+    """
+    Reads the log file of a worker request while it's being written
+    and passes each complete line to output
+    """
+
+    def __init__(self, log_file, output) -> None:
+        self.output = output
+        self.partial = b""
+        self.f = open(log_file, "rb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.f.close()
+
+    def read(self, final=False) -> None:
+        lines = (self.partial + self.f.read()).splitlines(keepends=True)
+        self.partial = b""
+        # a partially written last line waits for the next read
+        if not final and len(lines) > 0 and not lines[-1].endswith(b"\n"):
+            self.partial = lines.pop()
+        for line in lines:
+            self.output(line)
+
+
+class BNGWorkerPool:
+    """
+    A pool of BNGWorker objects for a given BNG2.pl. While the pool is
+    running, run_command sends every "perl BNG2.pl ..." command for that
+    BNG2.pl to a free worker instead of starting a new perl process. Workers
+    are started as they are needed, up to the given number of workers.
+
+    Usage: BNGWorkerPool(bngexec)
+           BNGWorkerPool(bngexec, workers=4)
+
+    Arguments
+    ---------
+    bngexec : str
+        path to BNG2.pl
+    workers : int
+        maximum number of worker processes, defaults to the number of CPUs
+
+    Methods
+    -------
+    run(args, cwd=None, timeout=None, env=None, output=None) : (int, bytes)
+        runs BNG2.pl with the given arguments on a free worker,
+        see BNGWorker.run
+    close() : None
+        stops all workers in the pool
+    """
+
+    def __init__(self, bngexec, workers=None, app=None) -> None:
+        self.app = app
+        self.logger = BNGLogger(app=self.app)
+        self.bngexec = os.path.abspath(bngexec)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = workers
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(workers)
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _get_worker(self) -> BNGWorker:
+        with self._lock:
+            if len(self._idle) > 0:
+                return self._idle.pop()
+        return BNGWorker(self.bngexec, app=self.app)
+
+    def run(self, args, cwd=None, timeout=None, env=None, output=None):
+        if self.closed:
+            raise RuntimeError("Worker pool is closed")
+        with self._slots:
+            worker = self._get_worker()
+            try:
+                return worker.run(
+                    args, cwd=cwd, timeout=timeout, env=env, output=output
+                )
+            finally:
+                with self._lock:
+                    if worker.alive and not self.closed:
+                        self._idle.append(worker)
+                    else:
+                        worker.close()
+
+    def close(self) -> None:
+        self.logger.debug(
+            f"Stopping workers for {self.bngexec}",
+            loc=f"{__file__} : BNGWorkerPool.close()",
+        )
+        with self._lock:
+            self.closed = True
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.close()
+        with _pools_lock:
+            if _pools.get(self.bngexec) is self:
+                del _pools[self.bngexec]
+
+
+def start_workers(workers=None, BNGPATH=None, app=None):
+    """
+    Starts a pool of long running BNG2.pl workers. Until stop_workers
+    is called every library call that runs BNG2.pl (running and loading
+    models, writing SBML, visualization) uses the pool, which avoids
+    starting a new perl process for each call. Not available on Windows,
+    returns None there.
+
+    Usage: start_workers()
+           start_workers(workers=4, BNGPATH=path)
+
+    Arguments
+    ---------
+    workers : int
+        (optional) maximum number of worker processes, defaults to
+        the number of CPUs
+    BNGPATH : str
+        (optional) path to the folder that contains BNG2.pl, defaults
+        to the one in the configuration
+    """
+    logger = BNGLogger(app=app)
+    if os.name == "nt":
+        logger.warning(
+            "BNG2.pl workers are not supported on Windows",
+            loc=f"{__file__} : start_workers()",
+        )
+        return None
+    if BNGPATH is None:
+        from bionetgen.core.config import get_conf
+
+        BNGPATH = get_conf()["bngpath"]
+    bngexec = os.path.abspath(os.path.join(BNGPATH, "BNG2.pl"))
+    with _pools_lock:
+        old_pool = _pools.get(bngexec)
+        pool = BNGWorkerPool(bngexec, workers=workers, app=app)
+        _pools[bngexec] = pool
+    if old_pool is not None:
+        old_pool.close()
+    return pool
+
+
+def stop_workers() -> None:
+    """
+    Stops every BNG2.pl worker pool started with start_workers.
+
+    Usage: stop_workers()
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
+
+
+def get_worker_pool(command):
+    """
+    Returns the worker pool that can run the given command,
+    None if the command isn't a BNG2.pl call or there is no
+    pool running for that BNG2.pl.
+
+    Usage: get_worker_pool(["perl", bngexec, "model.bngl"])
+    """
+    if len(command) < 2 or command[0] != "perl":
+        return None
+    with _pools_lock:
+        return _pools.get(os.path.abspath(command[1]))
+
+
+atexit.register(stop_workers)
@@ -10,6 +10,7 @@ from .core.main import printInfo
 from .core.main import visualizeModel
 from .core.main import graphDiff
 from .core.main import generate_notebook
+from .core.main import manageCache
 from .core.utils.utils import test_perl
 
 # pull defaults defined in core/defaults
@@ -18,7 +19,6 @@ VERSION_BANNER = bng.defaults.banner
 
 # require version argparse action
 import argparse, sys
-from pkg_resources import packaging
 
 
 class requireAction(argparse.Action):
@@ -30,6 +30,8 @@ class requireAction(argparse.Action):
     def __call__(self, parser, namespace, values, option_string=None):
         setattr(namespace, self.dest, values)
         if values is not None:
+            from pkg_resources import packaging
+
             req_version = packaging.version.parse(values)
             cver = bng.core.version.get_version()
             cur_version = packaging.version.parse(cver)
@@ -60,6 +62,8 @@ class BNGBase(cement.Controller):
         provides version and path information about the BNG installation and dependencies
     visualize
         provides various visualization options for BNG models
+    cache
+        prints information about or clears the on-disk BNG-XML cache
     """
 
     class Meta:
@@ -554,6 +558,28 @@ class BNGBase(cement.Controller):
     def atomize(self):
         runAtomizeTool(self.app)
 
+    @cement.ex(
+        help="Manages the on-disk cache of BNG-XML files generated when loading models",
+        arguments=[
+            (
+                ["action"],
+                {
+                    "help": 'Action to take, "stats" prints the location and size '
+                    + 'of the cache and "clear" removes every cached file',
+                    "choices": ["stats", "clear"],
+                    "type": str,
+                },
+            ),
+        ],
+    )
+    def cache(self):
+        """
+        Subcommand to inspect or clear the BNG-XML cache. The location
+        and the size limit of the cache are set with the cache_dir and
+        xml_cache_size configuration options.
+        """
+        manageCache(self.app)
+
 
 class BioNetGen(cement.App):
     """
@@ -1,16 +1,11 @@
 import os, re
 
-from bionetgen.main import BioNetGen
+from bionetgen.core.config import get_conf
 from bionetgen.core.exc import BNGFileError
 from bionetgen.core.utils.utils import find_BNG_path, run_command, ActionList
+from bionetgen.core.utils.cache import get_xml_cache
 from tempfile import TemporaryDirectory
 
-# This allows access to the CLIs config setup
-app = BioNetGen()
-app.setup()
-conf = app.config["bionetgen"]
-def_bng_path = conf["bngpath"]
-
 
 class BNGFile:
     """
@@ -29,29 +24,37 @@ class BNGFile:
         optional path to bng folder that contains BNG2.pl
     bngexec : str
         path to BNG2.pl
+    xml_cache : BNGCache
+        on-disk cache of generated BNG-XML files, None if turned off
 
     Methods
     -------
     generate_xml(xml_file, model_file=None) : bool
         takes the given BNGL file and generates a BNG-XML from it
+    xml_cache_key(model_file=None) : str
+        returns the key of the BNG-XML of the given BNGL file in the cache
     strip_actions(model_path, folder) : str
         deletes actions from a given BNGL file
     write_xml(open_file, xml_type="bngxml", bngl_str=None) : bool
-        given a bngl file or a string, writes an SBML or BNG-XML from it
+        given a bngl file or a string, writes an SBML or BNG-XML from it,
+        using the XML cache if it's turned on
     """
 
     def __init__(
-        self, path, BNGPATH=def_bng_path, generate_network=False, suppress=True
+        self, path, BNGPATH=None, generate_network=False, suppress=True
     ) -> None:
         self.path = path
         self.generate_network = generate_network
         self.suppress = suppress
         AList = ActionList()
         self._action_list = [i + "(" for i in AList.possible_types]
+        if BNGPATH is None:
+            BNGPATH = get_conf()["bngpath"]
         BNGPATH, bngexec = find_BNG_path(BNGPATH)
         self.BNGPATH = BNGPATH
         self.bngexec = bngexec
         self.parsed_actions = []
+        self.xml_cache = get_xml_cache(get_conf())
 
     def generate_xml(self, xml_file, model_file=None) -> bool:
         """
@@ -60,16 +63,16 @@ class BNGFile:
         """
         if model_file is None:
             model_file = self.path
-        cur_dir = os.getcwd()
         # temporary folder to work in
         with TemporaryDirectory() as temp_folder:
             # make a stripped copy without actions in the folder
             stripped_bngl = self.strip_actions(model_file, temp_folder)
-            # run with --xml
-            os.chdir(temp_folder)
+            # run with --xml in the temporary folder
             # TODO: take stdout option from app instead
             rc, _ = run_command(
-                ["perl", self.bngexec, "--xml", stripped_bngl], suppress=self.suppress
+                ["perl", self.bngexec, "--xml", stripped_bngl],
+                suppress=self.suppress,
+                cwd=temp_folder,
             )
             if rc == 1:
                 # if we fail, print out what we have to
@@ -78,25 +81,41 @@ class BNGFile:
                 #     print(rc.stdout.decode('utf-8'))
                 # if rc.stderr is not None:
                 #     print(rc.stderr.decode('utf-8'))
-                # go back to our original location
-                os.chdir(cur_dir)
-                # shutil.rmtree(temp_folder)
                 return False
             else:
                 # we should now have the XML file
                 path, model_name = os.path.split(stripped_bngl)
                 model_name = model_name.replace(".bngl", "")
-                written_xml_file = model_name + ".xml"
+                written_xml_file = os.path.join(temp_folder, model_name + ".xml")
                 with open(written_xml_file, "r", encoding="UTF-8") as f:
                     content = f.read()
                     xml_file.write(content)
                 # since this is an open file, to read it later
                 # we need to go back to the beginning
                 xml_file.seek(0)
-                # go back to our original location
-                os.chdir(cur_dir)
                 return True
 
+    def xml_cache_key(self, model_file=None) -> str:
+        """
+        Returns the key the BNG-XML of a given model file is stored
+        under in the XML cache. The key depends on the model without
+        its actions, the file name (BNG2.pl names the model after it),
+        the BNG version and the generate_network option.
+        Defaults to self.path if model_file is not given
+        """
+        from bionetgen.core.defaults import get_latest_bng_version
+
+        if model_file is None:
+            model_file = self.path
+        stripped_lines = self._strip_action_lines(model_file)
+        return self.xml_cache.make_key(
+            "".join(stripped_lines),
+            os.path.basename(model_file),
+            get_latest_bng_version(),
+            self.bngexec,
+            self.generate_network,
+        )
+
     def strip_actions(self, model_path, folder) -> str:
         """
         Strips actions from a BNGL file and makes a copy
@@ -104,6 +123,18 @@ class BNGFile:
         """
         # Get model name and setup path stuff
         path, model_file = os.path.split(model_path)
+        stripped_lines = self._strip_action_lines(model_path)
+        # open new file and write just the model
+        stripped_model = os.path.join(folder, model_file)
+        with open(stripped_model, "w", encoding="UTF-8") as sf:
+            sf.writelines(stripped_lines)
+        return stripped_model
+
+    def _strip_action_lines(self, model_path) -> list:
+        """
+        Reads a BNGL file and returns the lines of the model
+        without the actions
+        """
         # open model and strip actions
         with open(model_path, "r", encoding="UTF-8") as mf:
             # read and strip actions
@@ -140,14 +171,9 @@ class BNGFile:
                     msg = f'There is an "end actions" statement at line {remove_to} without a matching "begin actions" statement'
                     raise BNGFileError(model_path, message=msg)
         # TODO: read stripped lines and store the actions
-        # open new file and write just the model
-        stripped_model = os.path.join(folder, model_file)
         if self.generate_network:
             stripped_lines += ["generate_network({overwrite=>1})"]
-        stripped_lines = [x + "\n" for x in stripped_lines]
-        with open(stripped_model, "w", encoding="UTF-8") as sf:
-            sf.writelines(stripped_lines)
-        return stripped_model
+        return [x + "\n" for x in stripped_lines]
 
     def _not_action(self, line) -> bool:
         for action in self._action_list:
@@ -158,56 +184,72 @@ class BNGFile:
     def write_xml(self, open_file, xml_type="bngxml", bngl_str=None) -> bool:
         """
         write new BNG-XML or SBML of file by calling BNG2.pl again
-        or can take BNGL string in as well.
+        or can take BNGL string in as well. Generated files are kept
+        in the XML cache under the hash of the BNGL string.
         """
         # TODO: Implement the route where this function uses the file itself
         # for this generation
         if bngl_str is None:
             # should load in the right str here
             raise NotImplementedError
+        # the same model string always gives the same file
+        # so we can skip BNG2.pl if we made it before
+        cache_key = None
+        if self.xml_cache is not None and xml_type in ["bngxml", "sbml"]:
+            from bionetgen.core.defaults import get_latest_bng_version
+
+            cache_key = self.xml_cache.make_key(
+                bngl_str, xml_type, get_latest_bng_version(), self.bngexec
+            )
+            content = self.xml_cache.get(cache_key)
+            if content is not None:
+                open_file.write(content)
+                open_file.seek(0)
+                return True
 
-        cur_dir = os.getcwd()
         # temporary folder to work in
         with TemporaryDirectory() as temp_folder:
             # write the current model to temp folder
-            os.chdir(temp_folder)
-            with open("temp.bngl", "w", encoding="UTF-8") as f:
+            temp_bngl = os.path.join(temp_folder, "temp.bngl")
+            with open(temp_bngl, "w", encoding="UTF-8") as f:
                 f.write(bngl_str)
             # run with --xml
             # TODO: Make output supression an option somewhere
             if xml_type == "bngxml":
                 rc, _ = run_command(
-                    ["perl", self.bngexec, "--xml", "temp.bngl"], suppress=self.suppress
+                    ["perl", self.bngexec, "--xml", temp_bngl],
+                    suppress=self.suppress,
+                    cwd=temp_folder,
                 )
                 if rc == 1:
                     print("XML generation failed")
-                    # go back to our original location
-                    os.chdir(cur_dir)
                     return False
                 else:
                     # we should now have the XML file
-                    with open("temp.xml", "r", encoding="UTF-8") as f:
+                    temp_xml = os.path.join(temp_folder, "temp.xml")
+                    with open(temp_xml, "r", encoding="UTF-8") as f:
                         content = f.read()
                         open_file.write(content)
+                    if cache_key is not None:
+                        self.xml_cache.put(cache_key, content)
                     # go back to beginning
                     open_file.seek(0)
-                    os.chdir(cur_dir)
                     return True
             elif xml_type == "sbml":
-                command = ["perl", self.bngexec, "temp.bngl"]
-                rc, _ = run_command(command, suppress=self.suppress)
+                command = ["perl", self.bngexec, temp_bngl]
+                rc, _ = run_command(command, suppress=self.suppress, cwd=temp_folder)
                 if rc == 1:
                     print("SBML generation failed")
-                    # go back to our original location
-                    os.chdir(cur_dir)
                     return False
                 else:
                     # we should now have the SBML file
-                    with open("temp_sbml.xml", "r", encoding="UTF-8") as f:
+                    temp_sbml = os.path.join(temp_folder, "temp_sbml.xml")
+                    with open(temp_sbml, "r", encoding="UTF-8") as f:
                         content = f.read()
                         open_file.write(content)
+                    if cache_key is not None:
+                        self.xml_cache.put(cache_key, content)
                     open_file.seek(0)
-                    os.chdir(cur_dir)
                     return True
             else:
                 print("XML type {} not recognized".format(xml_type))
@@ -1,6 +1,5 @@
-import xmltodict, re
+import re
 
-from bionetgen.main import BioNetGen
 from bionetgen.core.exc import BNGParseError, BNGModelError
 from tempfile import TemporaryFile
 
@@ -11,12 +10,6 @@ from .xmlparsers import RuleBlockXML, EnergyPatternBlockXML, PopulationMapBlockX
 from .blocks import ActionBlock
 from bionetgen.core.utils.utils import ActionList
 
-# This allows access to the CLIs config setup
-app = BioNetGen()
-app.setup()
-conf = app.config["bionetgen"]
-def_bng_path = conf["bngpath"]
-
 
 class BNGParser:
     """
@@ -46,7 +39,7 @@ class BNGParser:
     def __init__(
         self,
         path,
-        BNGPATH=def_bng_path,
+        BNGPATH=None,
         parse_actions=True,
         generate_network=False,
         suppress=True,
@@ -76,20 +69,30 @@ class BNGParser:
         # this route runs BNG2.pl on the bngl and parses
         # the XML instead
         if model_file.endswith(".bngl"):
-            # TODO: Add verbosity option to the library
-            # print("Attempting to generate XML")
-            with TemporaryFile("w+") as xml_file:
-                if self.bngfile.generate_xml(xml_file):
-                    # TODO: Add verbosity option to the library
-                    xmlstr = xml_file.read()
-                    # < is not a valid XML character, we need to replace it
-                    xmlstr = xmlstr.replace('relation="<', 'relation="&lt;')
-                    self.parse_xml(xmlstr, model_obj)
-                    model_obj.reset_compilation_tags()
-                else:
-                    raise BNGModelError(
-                        self.bngfile.path, message="XML file couldn't be generated"
-                    )
+            # if we generated the XML of this exact model
+            # before, we don't need to run BNG2.pl again
+            xmlstr = None
+            xml_cache = self.bngfile.xml_cache
+            if xml_cache is not None:
+                cache_key = self.bngfile.xml_cache_key()
+                xmlstr = xml_cache.get(cache_key)
+            if xmlstr is None:
+                # TODO: Add verbosity option to the library
+                # print("Attempting to generate XML")
+                with TemporaryFile("w+") as xml_file:
+                    if self.bngfile.generate_xml(xml_file):
+                        # TODO: Add verbosity option to the library
+                        xmlstr = xml_file.read()
+                    else:
+                        raise BNGModelError(
+                            self.bngfile.path, message="XML file couldn't be generated"
+                        )
+                if xml_cache is not None:
+                    xml_cache.put(cache_key, xmlstr)
+            # < is not a valid XML character, we need to replace it
+            xmlstr = xmlstr.replace('relation="<', 'relation="&lt;')
+            self.parse_xml(xmlstr, model_obj)
+            model_obj.reset_compilation_tags()
         elif model_file.endswith(".xml"):
             with open(model_file, "r") as f:
                 xml_str = f.read()
@@ -256,6 +259,8 @@ class BNGParser:
         will use XML parser objects to generate each block to attach to the
         model object
         """
+        import xmltodict
+
         xml_dict = xmltodict.parse(xml_str)
         # catch non-BNG XML files
         if "sbml" not in xml_dict:
@@ -1,6 +1,5 @@
-import copy, tempfile, shutil
+import copy, os, tempfile, shutil
 
-from bionetgen.main import BioNetGen
 from bionetgen.core.exc import BNGModelError
 
 from .bngparser import BNGParser
@@ -18,13 +17,6 @@ from .blocks import (
 )
 
 
-# This allows access to the CLIs config setup
-app = BioNetGen()
-app.setup()
-conf = app.config["bionetgen"]
-def_bng_path = conf["bngpath"]
-
-
 ###### CORE OBJECT AND PARSING FRONT-END ######
 class bngmodel:
     """
@@ -73,9 +65,7 @@ class bngmodel:
         "population_maps", "rules", "reaction_rules", "actions".
     """
 
-    def __init__(
-        self, bngl_model, BNGPATH=def_bng_path, generate_network=False, suppress=True
-    ):
+    def __init__(self, bngl_model, BNGPATH=None, generate_network=False, suppress=True):
         self.active_blocks = []
         # We want blocks to be printed in the same order every time
         self._block_order = [
@@ -364,7 +354,9 @@ class bngmodel:
         """
         Sets up a simulator attribute that is a generic front-end
         to all other simulators. At the moment only libroadrunner
-        is supported
+        is supported. The SBML for libroadrunner is kept in the XML
+        cache, so setting up the simulator of the same model again
+        doesn't run BNG2.pl
         """
         if sim_type == "libRR":
             # we need to add writeSBML action for now
@@ -376,7 +368,7 @@ class bngmodel:
             # with windows
             try:
                 tmp_folder = tempfile.mkdtemp()
-                sbml_name = f"{self.model_name}_sbml.xml"
+                sbml_name = os.path.join(tmp_folder, f"{self.model_name}_sbml.xml")
                 # write the sbml
                 with open(sbml_name, "w+") as f:
                     if not (
@@ -406,13 +398,9 @@ class bngmodel:
             self.simulator = bng.sim_getter(model_file=self, sim_type=sim_type)
             return self.simulator
         else:
-            print(
-                'Sim type {} is not recognized, only libroadrunner \
+            print('Sim type {} is not recognized, only libroadrunner \
                    is supported currently by passing "libRR" to \
-                   sim_type keyword argument'.format(
-                    sim_type
-                )
-            )
+                   sim_type keyword argument'.format(sim_type))
             return None
         # for now we return the underlying simulator
         return self.simulator.simulator
@@ -1,12 +1,8 @@
 import os
 from tempfile import TemporaryDirectory
-from bionetgen.main import BioNetGen
-from bionetgen.core.tools import BNGCLI
-
-# This allows access to the CLIs config setup
-app = BioNetGen()
-app.setup()
-conf = app.config["bionetgen"]
+from bionetgen.core.config import get_conf
+from bionetgen.core.tools.cli import BNGCLI
+from bionetgen.core.utils.logging import BNGLogger
 
 
 def run(inp, out=None, suppress=False, timeout=None):
@@ -24,28 +20,195 @@ def run(inp, out=None, suppress=False, timeout=None):
         into. If it doesn't exist, it will be created.
     """
     # if out is None we make a temp directory
-    cur_dir = os.getcwd()
     if out is None:
         with TemporaryDirectory() as out:
             # instantiate a CLI object with the info
-            cli = BNGCLI(inp, out, conf["bngpath"], suppress=suppress, timeout=timeout)
+            cli = BNGCLI(
+                inp, out, get_conf()["bngpath"], suppress=suppress, timeout=timeout
+            )
             try:
                 cli.run()
-                os.chdir(cur_dir)
             except Exception as e:
-                os.chdir(cur_dir)
                 # TODO: Better error reporting
                 print("Couldn't run the simulation, see error")
                 raise e
+            # results are loaded on access, parse
+            # them before the folder is removed
+            cli.result.load_results()
     else:
         # instantiate a CLI object with the info
-        cli = BNGCLI(inp, out, conf["bngpath"], suppress=suppress, timeout=timeout)
+        cli = BNGCLI(
+            inp, out, get_conf()["bngpath"], suppress=suppress, timeout=timeout
+        )
         try:
             cli.run()
-            os.chdir(cur_dir)
         except Exception as e:
-            os.chdir(cur_dir)
             # TODO: Better error reporting
             print("Couldn't run the simulation, see error")
             raise e
     return cli.result
+
+
+async def arun(inp, out=None, suppress=False, timeout=None):
+    """
+    Coroutine version of run, BNG2.pl is ran as an asyncio subprocess
+    so the event loop isn't blocked while the model is running. If the
+    timeout runs out or the task is cancelled BNG2.pl is killed.
+
+    Usage: await arun(path_to_input_file, output_folder)
+
+    Arguments
+    ---------
+    path_to_input_file : str
+        this has to point to a BNGL file
+    output_folder : str
+        (optional) this points to a folder to put the results
+        into. If it doesn't exist, it will be created.
+    """
+    # if out is None we make a temp directory
+    if out is None:
+        with TemporaryDirectory() as out:
+            cli = BNGCLI(
+                inp, out, get_conf()["bngpath"], suppress=suppress, timeout=timeout
+            )
+            try:
+                await cli.arun()
+            except Exception as e:
+                # TODO: Better error reporting
+                print("Couldn't run the simulation, see error")
+                raise e
+            # results are loaded on access, parse
+            # them before the folder is removed
+            cli.result.load_results()
+    else:
+        cli = BNGCLI(
+            inp, out, get_conf()["bngpath"], suppress=suppress, timeout=timeout
+        )
+        try:
+            await cli.arun()
+        except Exception as e:
+            # TODO: Better error reporting
+            print("Couldn't run the simulation, see error")
+            raise e
+    return cli.result
+
+
+async def astream(inp, out=None, timeout=None):
+    """
+    Asynchronous generator that runs BNG2.pl on the given model and
+    yields each line of output as BNG2.pl writes it. Raises BNGRunError
+    once the output ends if BNG2.pl failed. If the timeout runs out, the
+    task is cancelled or the caller stops iterating, BNG2.pl is killed.
+
+    Usage: async for line in astream(path_to_input_file, output_folder)
+
+    Arguments
+    ---------
+    path_to_input_file : str
+        this has to point to a BNGL file
+    output_folder : str
+        (optional) this points to a folder to put the results
+        into. If it doesn't exist, it will be created.
+    """
+    if out is None:
+        with TemporaryDirectory() as out:
+            cli = BNGCLI(
+                inp, out, get_conf()["bngpath"], suppress=True, timeout=timeout
+            )
+            async for line in cli.astream():
+                yield line
+    else:
+        cli = BNGCLI(inp, out, get_conf()["bngpath"], suppress=True, timeout=timeout)
+        async for line in cli.astream():
+            yield line
+
+
+def _run_batch_job(inp, out, bngpath, timeout):
+    """
+    Runs a single job of a batch in a worker process.
+    """
+    cli = BNGCLI(inp, out, bngpath, suppress=True, timeout=timeout)
+    cli.run()
+    return cli.result
+
+
+def run_batch(models, out_root, workers=None, timeout=None, progress=None):
+    """
+    Runs many models with BNG2.pl concurrently using a process pool
+
+    Usage: run_batch([model1, model2], output_root, workers=4)
+
+    Each job is ran in its own sub-folder of out_root, named after
+    the model and its position in the input list, e.g. out_root/mymodel_0.
+
+    Arguments
+    ---------
+    models : list
+        list of paths to BNGL files and/or bngmodel objects
+    out_root : str
+        folder that will contain the output folders of every job.
+        If it doesn't exist, it will be created.
+    workers : int
+        (optional) number of worker processes, defaults to the number
+        of CPUs on the machine
+    timeout : float
+        (optional) time in seconds after which each BNG2.pl call is killed
+    progress : callable
+        (optional) function called as progress(n_done, n_total, index, result)
+        every time a job finishes, result is either a BNGResult or the
+        exception raised by the job
+
+    Returns
+    -------
+    list
+        BNGResult objects in the same order as the input models. Jobs that
+        failed have the exception that was raised in their place.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    import bionetgen.modelapi.model as mdl
+
+    logger = BNGLogger()
+    out_root = os.path.abspath(out_root)
+    if not os.path.isdir(out_root):
+        os.makedirs(out_root)
+    # set up the input file and output folder of each job
+    jobs = []
+    for imodel, model in enumerate(models):
+        if isinstance(model, mdl.bngmodel):
+            name = model.model_name
+            job_folder = os.path.join(out_root, f"{name}_{imodel}")
+            if not os.path.isdir(job_folder):
+                os.mkdir(job_folder)
+            # model objects are written out, files are
+            # much cheaper to send to a worker process
+            inp = os.path.join(job_folder, f"{name}.bngl")
+            model.write_model(inp)
+        else:
+            name = os.path.splitext(os.path.basename(model))[0]
+            job_folder = os.path.join(out_root, f"{name}_{imodel}")
+            inp = os.path.abspath(model)
+        jobs.append((inp, job_folder))
+    logger.debug(
+        f"Running {len(jobs)} jobs in {out_root}", loc=f"{__file__} : run_batch()"
+    )
+    results = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for ijob, (inp, job_folder) in enumerate(jobs):
+            future = executor.submit(
+                _run_batch_job, inp, job_folder, get_conf()["bngpath"], timeout
+            )
+            futures[future] = ijob
+        for n_done, future in enumerate(as_completed(futures), start=1):
+            ijob = futures[future]
+            try:
+                results[ijob] = future.result()
+            except Exception as e:
+                logger.debug(
+                    f"Job {ijob} failed with error: {e}",
+                    loc=f"{__file__} : run_batch()",
+                )
+                results[ijob] = e
+            if progress is not None:
+                progress(n_done, len(jobs), ijob, results[ijob])
+    return results
@@ -0,0 +1,197 @@
+import os, time, tempfile
+import numpy as np
+
+from bionetgen.core.utils.logging import BNGLogger
+
+# seconds between checkpoint writes while a scan is running
+checkpoint_interval = 5.0
+
+
+def _load_checkpoint(checkpoint, parameter, values):
+    """
+    Returns (obs_names, rows, done) saved in the checkpoint of a scan,
+    None if there is no checkpoint to resume from
+    """
+    if checkpoint is None or not os.path.isfile(checkpoint):
+        return None
+    with np.load(checkpoint, allow_pickle=False) as data:
+        if str(data["parameter"]) != parameter or not np.array_equal(
+            data["values"], values
+        ):
+            raise ValueError(
+                f"Checkpoint {checkpoint} is from a different scan, "
+                + "remove it to start the scan over"
+            )
+        return list(data["obs_names"]), data["rows"].copy(), data["done"].copy()
+
+
+def _save_checkpoint(checkpoint, parameter, values, obs_names, rows, done) -> None:
+    # write a new file and move it in place so an
+    # interrupted write never breaks the checkpoint
+    tmp_file = checkpoint + ".tmp"
+    with open(tmp_file, "wb") as f:
+        np.savez(
+            f,
+            parameter=np.array(parameter),
+            values=values,
+            obs_names=np.array(obs_names, dtype=str),
+            rows=rows,
+            done=done,
+        )
+    os.replace(tmp_file, checkpoint)
+
+
+def scan(
+    model,
+    parameter,
+    values,
+    method="ode",
+    backend="bng",
+    t_start=0,
+    t_end=10,
+    n_steps=10,
+    workers=None,
+    checkpoint=None,
+    progress=None,
+):
+    """
+    Parameter scan ran from python, the equivalent of the parameter_scan
+    action of BNG2.pl. The model is simulated once for each value of the
+    parameter and the observables at the end of each simulation are
+    collected, like in a .scan file. The network (or SBML, or C library)
+    is generated once and the scan points are ran in parallel by a process
+    pool, every worker sets up its simulator once. Results are added to
+    the scan as points finish and, if a checkpoint file is given, saved
+    to it regularly so an interrupted scan picks up where it left off
+    when it's ran again with the same arguments.
+
+    Usage: scan("model.bngl", "kf", np.logspace(-3, 3, 61), workers=8)
+           scan(model, "kf", values, backend="scipy", checkpoint="kf.npz")
+
+    Arguments
+    ---------
+    model : str or bngmodel
+        path to a BNGL file or a bngmodel object, .net files
+        also work with the "bng" and python network backends
+    parameter : str
+        name of the parameter to scan
+    values : list
+        values of the parameter, e.g. np.logspace(-3, 3, 61) for a log
+        scale scan. A ValueError is raised if there are none
+    method : str
+        (optional) simulation method of the "bng" backend, "ode" by default
+    backend : str
+        (optional) simulator the points are ran with, "bng" (BNG2.pl
+        run_network, default), "cpy", "libRR", "scipy", "ssa" or "tau_leap"
+    t_start, t_end, n_steps : float, float, int
+        (optional) time span and number of steps of each simulation
+    workers : int
+        (optional) number of worker processes, defaults to the number
+        of CPUs on the machine. With 1 the points are ran in this process
+    checkpoint : str
+        (optional) path to a .npz file the progress of the scan is saved
+        to and resumed from
+    progress : callable
+        (optional) function called as progress(n_done, n_total, index, row)
+        every time a point finishes
+
+    Returns
+    -------
+    numpy.recarray
+        one record per value with the parameter as the first column
+        and the final value of each observable, same as a .scan file
+    """
+    from bionetgen.simulator.backends import (
+        prepare_backend,
+        BackendRunner,
+        init_worker,
+        worker_run,
+    )
+
+    logger = BNGLogger()
+    values = np.asarray(values, dtype=np.float64).ravel()
+    n_points = values.shape[0]
+    if n_points == 0:
+        raise ValueError(f"No values of {parameter} to scan")
+    # rows are allocated once we know the observables
+    state = {"obs_names": None, "rows": None, "done": np.zeros(n_points, dtype=bool)}
+    saved = _load_checkpoint(checkpoint, parameter, values)
+    if saved is not None:
+        state["obs_names"], state["rows"], state["done"] = saved
+        logger.debug(
+            f"Resuming scan of {parameter} from {checkpoint}, "
+            + f"{state['done'].sum()} of {n_points} points are done",
+            loc=f"{__file__} : scan()",
+        )
+    todo = np.nonzero(~state["done"])[0]
+    last_save = [time.monotonic()]
+
+    def save():
+        if checkpoint is not None and state["rows"] is not None:
+            _save_checkpoint(
+                checkpoint,
+                parameter,
+                values,
+                state["obs_names"],
+                state["rows"],
+                state["done"],
+            )
+            last_save[0] = time.monotonic()
+
+    def add_point(ipoint, obs_names, obs):
+        if state["rows"] is None:
+            state["obs_names"] = list(obs_names)
+            state["rows"] = np.full((n_points, len(obs_names)), np.nan)
+        state["rows"][ipoint] = obs[-1]
+        state["done"][ipoint] = True
+        if time.monotonic() - last_save[0] > checkpoint_interval:
+            save()
+        if progress is not None:
+            n_done = int(state["done"].sum())
+            progress(n_done, n_points, ipoint, state["rows"][ipoint])
+
+    try:
+        with tempfile.TemporaryDirectory() as folder:
+            if todo.shape[0] > 0:
+                spec = prepare_backend(model, backend, method=method, folder=folder)
+                logger.debug(
+                    f"Scanning {todo.shape[0]} values of {parameter} with {backend}",
+                    loc=f"{__file__} : scan()",
+                )
+            if todo.shape[0] > 0 and workers == 1:
+                with BackendRunner(spec) as runner:
+                    for ipoint in todo:
+                        _, obs = runner.run(
+                            {parameter: values[ipoint]}, t_start, t_end, n_steps
+                        )
+                        add_point(ipoint, runner.obs_names, obs)
+            elif todo.shape[0] > 0:
+                from concurrent.futures import ProcessPoolExecutor, as_completed
+
+                with ProcessPoolExecutor(
+                    max_workers=workers, initializer=init_worker, initargs=(spec,)
+                ) as executor:
+                    futures = {}
+                    for ipoint in todo:
+                        future = executor.submit(
+                            worker_run,
+                            {parameter: values[ipoint]},
+                            t_start,
+                            t_end,
+                            n_steps,
+                        )
+                        futures[future] = ipoint
+                    try:
+                        for future in as_completed(futures):
+                            obs_names, _, obs = future.result()
+                            add_point(futures[future], obs_names, obs)
+                    except BaseException:
+                        # don't run the rest of the points
+                        for future in futures:
+                            future.cancel()
+                        raise
+    finally:
+        save()
+    columns = [parameter] + state["obs_names"]
+    data = np.column_stack([values, state["rows"]])
+    return np.rec.fromarrays(data.T, names=columns, formats=["f8"] * len(columns))
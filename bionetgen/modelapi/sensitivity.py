@@ -0,0 +1,129 @@
+import tempfile
+import numpy as np
+
+from bionetgen.core.utils.logging import BNGLogger
+
+
+def sensitivity(
+    model,
+    params,
+    observables=None,
+    rel_step=1e-3,
+    method="central",
+    backend="libRR",
+    t_start=0,
+    t_end=10,
+    n_steps=10,
+    normalize=False,
+    workers=None,
+):
+    """
+    Local sensitivities of the observables to the parameters, computed with
+    finite differences. Each parameter p is changed by rel_step*|p| (or by
+    rel_step if p is 0) and the model is simulated again. Central differences
+    need 2P+1 simulations and forward differences P+1, they are ran in
+    parallel by a process pool whose workers set up their simulator once,
+    the model isn't parsed or generated again for each simulation.
+    Parameters that set initial species amounts also change them with
+    the "bng" and "scipy" backends.
+
+    Usage: sens = sensitivity("model.bngl", ["kf", "kr"], ["AB"], t_end=100)
+           sens = sensitivity(model, ["kf"], backend="cpy", method="forward")
+
+    Arguments
+    ---------
+    model : str or bngmodel
+        path to a BNGL file or a bngmodel object, .net files
+        also work with the "bng" and "scipy" backends
+    params : list
+        names of the parameters
+    observables : list
+        (optional) names of the observables, all of them by default
+    rel_step : float
+        (optional) relative change of each parameter, 1e-3 by default
+    method : str
+        (optional) "central" (default) or "forward" differences
+    backend : str
+        (optional) simulator to use, "libRR" (default), "cpy", "scipy"
+        or "bng" (BNG2.pl run_network)
+    t_start, t_end, n_steps : float, float, int
+        (optional) time span and number of steps of the simulations, the
+        time points are numpy.linspace(t_start, t_end, n_steps + 1) with
+        every backend
+    normalize : bool
+        (optional) if True the relative sensitivities d(ln y)/d(ln p)
+        are returned, 0 where the observable is 0
+    workers : int
+        (optional) number of worker processes, defaults to the number
+        of CPUs on the machine. With 1 everything is ran in this process
+
+    Returns
+    -------
+    numpy.ndarray
+        (n_params, n_tpts, n_observables) array of the derivatives
+        of each observable with respect to each parameter
+    """
+    from bionetgen.simulator.backends import (
+        prepare_backend,
+        BackendRunner,
+        init_worker,
+        worker_run,
+    )
+
+    # TODO: Transition to BNGErrors and logging
+    assert method in [
+        "central",
+        "forward",
+    ], f"method has to be central or forward, not {method}"
+    logger = BNGLogger()
+    params = list(params)
+    with tempfile.TemporaryDirectory() as folder:
+        spec = prepare_backend(model, backend, folder=folder)
+        with BackendRunner(spec) as runner:
+            base = runner.get_params(params)
+            steps = np.array(
+                [rel_step * abs(base[p]) if base[p] != 0 else rel_step for p in params]
+            )
+            # the unperturbed run first, then +h (and -h) for each parameter
+            runs = [{}]
+            for pname, step in zip(params, steps):
+                runs.append({pname: base[pname] + step})
+                if method == "central":
+                    runs.append({pname: base[pname] - step})
+            logger.debug(
+                f"Running {len(runs)} simulations with {backend}",
+                loc=f"{__file__} : sensitivity()",
+            )
+            run_args = [(run, t_start, t_end, n_steps) for run in runs]
+            if workers == 1:
+                results = []
+                for args in run_args:
+                    _, obs = runner.run(*args)
+                    results.append((runner.obs_names, obs))
+            else:
+                from concurrent.futures import ProcessPoolExecutor
+
+                with ProcessPoolExecutor(
+                    max_workers=workers, initializer=init_worker, initargs=(spec,)
+                ) as executor:
+                    results = [
+                        (names, obs)
+                        for names, _, obs in executor.map(worker_run, *zip(*run_args))
+                    ]
+    obs_names = results[0][0]
+    if observables is None:
+        observables = obs_names
+    missing = [name for name in observables if name not in obs_names]
+    if len(missing) > 0:
+        raise KeyError(f"{missing} are not observables of the model")
+    cols = [obs_names.index(name) for name in observables]
+    outputs = np.stack([obs[:, cols] for _, obs in results])
+    y0 = outputs[0]
+    if method == "central":
+        diffs = (outputs[1::2] - outputs[2::2]) / (2 * steps[:, None, None])
+    else:
+        diffs = (outputs[1:] - y0) / steps[:, None, None]
+    if normalize:
+        pvals = np.array([base[p] for p in params])[:, None, None]
+        diffs = np.divide(diffs * pvals, y0, out=np.zeros_like(diffs), where=y0 != 0)
+    return diffs
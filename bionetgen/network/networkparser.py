@@ -1,5 +1,4 @@
 import re, os
-from bionetgen.main import BioNetGen
 from bionetgen.network.blocks import (
     NetworkGroupBlock,
     NetworkParameterBlock,
@@ -12,13 +11,6 @@ from bionetgen.network.blocks import (
 )
 
 
-# This allows access to the CLIs config setup
-app = BioNetGen()
-app.setup()
-conf = app.config["bionetgen"]
-def_bng_path = conf["bngpath"]
-
-
 class BNGNetworkParser:
     """
     Parser object that deals with reading in the BNGL file and
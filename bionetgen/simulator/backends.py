@@ -0,0 +1,246 @@
+import os, shutil, tempfile
+import numpy as np
+
+# backends that simulate the reaction network in python
+network_backends = ["scipy", "ssa", "tau_leap"]
+backends = ["bng", "cpy", "libRR"] + network_backends
+
+# simulator of each worker process, set up once by init_worker
+_runner = None
+
+
+def prepare_backend(model, backend="bng", method="ode", folder=None) -> tuple:
+    """
+    Does the work a backend needs once per model in the calling process,
+    so that many simulations of the model can be ran cheaply, and returns
+    a small picklable description of the backend that BackendRunner
+    sets up a simulator from, e.g. in each worker process of a pool.
+
+    The network is generated once for the "bng" backend, which runs
+    run_network through BNG2.pl on the .net file, and the python network
+    backends ("scipy", "ssa", "tau_leap"). The SBML is generated once for
+    "libRR" and the shared library is compiled once for "cpy" (workers
+    load it from the library cache). The results of every backend have
+    the observables of the model as columns, for "libRR" these are the
+    time course selections bngmodel.setup_simulator sets.
+
+    Usage: spec = prepare_backend("model.bngl", "scipy", folder=tmp_folder)
+
+    Arguments
+    ---------
+    model : str or bngmodel
+        path to a BNGL file or a bngmodel object, a .net file also
+        works for the "bng" and python network backends
+    backend : str
+        one of "bng", "cpy", "libRR", "scipy", "ssa" or "tau_leap"
+    method : str
+        (optional) simulation method BNG2.pl uses for the "bng" backend,
+        "ode" by default
+    folder : str
+        folder to write the generated files into, has to stay around
+        while the backend is used
+    """
+    import bionetgen
+
+    # TODO: Transition to BNGErrors and logging
+    assert backend in backends, f"backend {backend} is not one of {backends}"
+    is_net = isinstance(model, str) and model.endswith(".net")
+    if backend == "bng" or backend in network_backends:
+        if is_net:
+            net_file = os.path.abspath(model)
+        else:
+            from .netsimulator import write_network
+
+            net_file = os.path.abspath(write_network(model, folder))
+        return (backend, net_file, method)
+    # TODO: Transition to BNGErrors and logging
+    assert not is_net, f"backend {backend} needs a BNGL model, not a .net file"
+    if backend == "cpy":
+        if isinstance(model, bionetgen.bngmodel):
+            model_file = os.path.join(folder, f"{model.model_name}.bngl")
+            model.write_model(model_file)
+        else:
+            model_file = os.path.abspath(model)
+        # compiling here puts the library in
+        # the cache before the workers need it
+        from .csimulator import CSimulator
+
+        CSimulator(model_file=model_file, generate_network=True)
+        return (backend, model_file, None)
+    # libRR
+    if not isinstance(model, bionetgen.bngmodel):
+        model = bionetgen.bngmodel(model)
+    rr = model.setup_simulator("libRR")
+    return (backend, model.simulator.sbml, list(rr.timeCourseSelections))
+
+
+class BackendRunner:
+    """
+    Simulator set up from a backend description made by prepare_backend,
+    that runs the model with different parameter values. Parameters that
+    are not given to run are at the values of the model.
+
+    Usage: runner = BackendRunner(spec)
+           timepoints, obs = runner.run({"kf": 0.1}, 0, 10, 100)
+
+    Arguments
+    ---------
+    spec : tuple
+        backend description returned by prepare_backend
+
+    Attributes
+    ----------
+    obs_names : list
+        names of the observables, the columns of the results. Some
+        backends only know them after the first run
+
+    Methods
+    -------
+    get_params(names) : dict
+        values of the given parameters in the model
+    run(params, t_start, t_end, n_steps) : (numpy.ndarray, numpy.ndarray)
+        simulates the model with the given parameter values and returns the
+        time points and a (n_tpts, n_observables) array of the observables
+    close() : None
+        removes the temporary files of the runner
+    """
+
+    def __init__(self, spec) -> None:
+        self.backend, self.source, self.extra = spec
+        self.obs_names = None
+        self._folder = None
+        if self.backend == "bng":
+            from bionetgen.core.config import get_conf
+            from bionetgen.core.utils.utils import find_BNG_path
+
+            _, self.bngexec = find_BNG_path(get_conf()["bngpath"])
+            self._folder = tempfile.mkdtemp(prefix="bng_runner_")
+        elif self.backend == "cpy":
+            from .csimulator import CSimulator
+
+            self.sim = CSimulator(model_file=self.source, generate_network=True)
+            self._base_params = self.sim.param_values.copy()
+        elif self.backend == "libRR":
+            import roadrunner
+
+            self.sim = roadrunner.RoadRunner(self.source)
+            self.sim.timeCourseSelections = self.extra
+            self.obs_names = list(self.extra[1:])
+        else:
+            from .simulators import sim_getter
+
+            self.sim = sim_getter(model_file=self.source, sim_type=self.backend)
+            self.obs_names = list(self.sim.simulator.obs_names)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get_params(self, names) -> dict:
+        if self.backend == "bng":
+            from bionetgen.network.network import Network
+            from .networkmodel import eval_expression
+
+            network = Network(self.source)
+            values = {}
+            for pname in network.parameters:
+                param = network.parameters[pname]
+                values[param.name] = eval_expression(param.value, values)
+        elif self.backend == "cpy":
+            values = {
+                name: float(self._base_params[ind])
+                for name, ind in self.sim.param_index.items()
+            }
+        elif self.backend == "libRR":
+            self.sim.resetAll()
+            values = {
+                name: self.sim.getValue(name)
+                for name in self.sim.model.getGlobalParameterIds()
+            }
+        else:
+            self.sim.reset_params()
+            values = dict(self.sim.simulator.param_values)
+        for name in names:
+            if name not in values:
+                raise KeyError(f"{name} is not a parameter of the model")
+        return {name: values[name] for name in names}
+
+    def run(self, params, t_start=0, t_end=10, n_steps=10):
+        if self.backend == "bng":
+            return self._run_bng(params, t_start, t_end, n_steps)
+        if self.backend == "libRR":
+            # resetAll also goes back to the parameters of the model
+            self.sim.resetAll()
+            for name, value in params.items():
+                self.sim.setValue(name, value)
+            self.sim.reset()
+            result = np.array(self.sim.simulate(t_start, t_end, n_steps + 1))
+            return result[:, 0], result[:, 1:]
+        if self.backend == "cpy":
+            self.sim.param_values[:] = self._base_params
+        else:
+            self.sim.reset_params()
+        self.sim.set_params(params)
+        timepoints, obs, _ = self.sim.simulate(t_start, t_end, n_steps, named=False)
+        if self.obs_names is None:
+            # the C library gives the names with the first result
+            self.obs_names = list(self.sim.simulator.obs_names)
+        # the C results use the library memory, take a copy
+        return np.array(timepoints), np.array(obs.T)
+
+    def _run_bng(self, params, t_start, t_end, n_steps):
+        from bionetgen.core.exc import BNGRunError
+        from bionetgen.core.utils.datreader import read_dat
+        from bionetgen.core.utils.utils import run_command
+
+        lines = [f'readFile({{file=>"{self.source}"}})']
+        for name, value in params.items():
+            lines.append(f'setParameter("{name}",{float(value)!r})')
+        lines.append(
+            f'simulate({{method=>"{self.extra}",t_start=>{t_start},'
+            + f't_end=>{t_end},n_steps=>{n_steps},prefix=>"point"}})'
+        )
+        point_file = os.path.join(self._folder, "point.bngl")
+        with open(point_file, "w", encoding="UTF-8") as f:
+            f.write("\n".join(lines) + "\n")
+        command = ["perl", self.bngexec, point_file]
+        rc, out = run_command(command, suppress=True, cwd=self._folder)
+        if rc != 0:
+            # out has the last lines of the output, where
+            # BNG2.pl reports what went wrong
+            raise BNGRunError(command, stdout="\n".join(out) if len(out) > 0 else None)
+        data, columns = read_dat(os.path.join(self._folder, "point.gdat"))
+        names = sorted(columns, key=columns.get)
+        self.obs_names = names[1:]
+        return data[:, 0].copy(), data[:, 1:].copy()
+
+    def close(self) -> None:
+        if self.backend == "cpy":
+            self.sim.close()
+        if self._folder is not None:
+            shutil.rmtree(self._folder, ignore_errors=True)
+            self._folder = None
+
+
+def init_worker(spec) -> None:
+    """
+    Process pool initializer that sets up the BackendRunner
+    of the worker, see worker_run
+    """
+    global _runner
+    from multiprocessing.util import Finalize
+
+    _runner = BackendRunner(spec)
+    # pool workers don't run atexit handlers
+    Finalize(_runner, _runner.close, exitpriority=10)
+
+
+def worker_run(params, t_start=0, t_end=10, n_steps=10):
+    """
+    Runs the model with the BackendRunner of the worker process and
+    returns (obs_names, timepoints, observables)
+    """
+    timepoints, obs = _runner.run(params, t_start, t_end, n_steps)
+    return _runner.obs_names, timepoints, obs
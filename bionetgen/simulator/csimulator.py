@@ -1,17 +1,10 @@
-import ctypes, os, tempfile, bionetgen
+import ctypes, os, sys, shutil, tempfile, bionetgen
 import numpy as np
 
-from distutils import ccompiler
 from .bngsimulator import BNGSimulator
-from bionetgen.main import BioNetGen
+from bionetgen.core.config import get_conf
 from bionetgen.core.exc import BNGCompileError
 
-# This allows access to the CLIs config setup
-app = BioNetGen()
-app.setup()
-conf = app.config["bionetgen"]
-def_bng_path = conf["bngpath"]
-
 
 class RESULT(ctypes.Structure):
     _fields_ = [
@@ -28,6 +21,50 @@ class RESULT(ctypes.Structure):
     ]
 
 
+class CResultOwner:
+    """
+    Owns a result struct returned by the simulate function of the
+    compiled C library and frees it with free_result when it's garbage
+    collected. Arrays made with as_array use the C memory directly and
+    keep the owner alive for as long as they exist.
+
+    Usage: owner = CResultOwner(lib, result)
+           obs = owner.as_array(result.observables, (n_obs, n_tpts))
+
+    Arguments
+    ---------
+    lib : ctypes.CDLL
+        the compiled simulator library
+    result : RESULT
+        the result struct from the simulate function
+    """
+
+    def __init__(self, lib, result):
+        self.lib = lib
+        self.result = result
+
+    def as_array(self, pointer, shape):
+        return np.asarray(_CBuffer(self, pointer, shape))
+
+    def __del__(self):
+        if self.result is not None:
+            self.lib.free_result(ctypes.byref(self.result))
+            self.result = None
+
+
+class _CBuffer:
+    # hands a C double buffer to numpy, the array keeps this
+    # object as its base which keeps the owner alive
+    def __init__(self, owner, pointer, shape):
+        self.owner = owner
+        self.__array_interface__ = {
+            "version": 3,
+            "shape": tuple(shape),
+            "typestr": np.dtype(np.float64).str,
+            "data": (ctypes.cast(pointer, ctypes.c_void_p).value or 0, False),
+        }
+
+
 class CSimWrapper:
     """
     Wrapper class for the compiled C simulator shared library.
@@ -36,6 +73,12 @@ class CSimWrapper:
     pointers to the initial species arrays and parameter arrays
     to the shared library, runs the simulation and returns the
     results as numpy named arrays.
+
+    ctypes releases the GIL while the C simulate function runs, so
+    simulate_batch can integrate many parameter sets at the same time
+    in threads. That needs the compiled library to be re-entrant, which
+    hasn't been verified for the libraries writeCPYfile generates, so
+    the sets are ran one after the other unless workers is set.
     """
 
     def __init__(self, lib_path, num_params=None, num_spec_init=None):
@@ -50,6 +93,11 @@ class CSimWrapper:
         self.num_params = num_params
         # set number of initial species values
         self.num_spec_init = num_spec_init
+        # names are the same for every run, we read them once
+        self.obs_names = None
+        self.spcs_names = None
+        self._tpts = None
+        self._tpts_key = None
 
     def set_species_init(self, arr):
         """
@@ -57,7 +105,11 @@ class CSimWrapper:
         """
         # TODO: Transition to BNGErrors and logging
         assert len(arr) == self.num_spec_init
-        self.species_init = np.array(arr, dtype=np.float64)
+        if getattr(self, "species_init", None) is not None:
+            # update in place, the buffer might be shared
+            self.species_init[:] = arr
+        else:
+            self.species_init = np.array(arr, dtype=np.float64)
 
     def set_parameters(self, arr):
         """
@@ -65,9 +117,135 @@ class CSimWrapper:
         """
         # TODO: Transition to BNGErrors and logging
         assert len(arr) == self.num_params
-        self.parameters = np.array(arr, dtype=np.float64)
+        if getattr(self, "parameters", None) is not None:
+            # update in place, the buffer might be shared
+            self.parameters[:] = arr
+        else:
+            self.parameters = np.array(arr, dtype=np.float64)
+
+    @staticmethod
+    def make_timepoints(t_start=0, t_end=100, n_steps=100):
+        """
+        Time point array simulate uses for the given arguments,
+        n_steps + 1 points from t_start to t_end like the other simulators
+        """
+        return np.linspace(t_start, t_end, n_steps + 1)
+
+    def _run(self, timepoints, species_init, parameters):
+        """
+        Calls the simulate function of the shared library and returns
+        the result struct, which has to be freed with free_result
+        """
+        result = self.return_struct.from_address(
+            self.lib.simulate(
+                len(timepoints),
+                ctypes.c_void_p(timepoints.ctypes.data),
+                self.num_spec_init,
+                ctypes.c_void_p(species_init.ctypes.data),
+                self.num_params,
+                ctypes.c_void_p(parameters.ctypes.data),
+            )
+        )
+        if self.obs_names is None:
+            self.obs_names = self._read_names(result.obs_names, result.obs_name_len)
+            self.spcs_names = self._read_names(result.spcs_names, result.spcs_name_len)
+        return result
+
+    def _read_names(self, names_ptr, names_len):
+        names = ctypes.cast(names_ptr, ctypes.POINTER(ctypes.c_char * names_len))[0]
+        # names are separated and terminated by /
+        return names.value.decode().split("/")[:-1]
 
-    def simulate(self, t_start=0, t_end=100, n_steps=100):
+    def simulate_batch(
+        self, param_matrix=None, species_init_matrix=None, timepoints=None, workers=1
+    ):
+        """
+        Runs one simulation for each row of the given parameter and/or
+        initial species matrices, in parallel threads if workers is more
+        than 1. Rows that aren't given use the values set with
+        set_parameters/set_species_init.
+
+        Usage: simulate_batch(param_matrix, None, timepoints)
+               simulate_batch(param_matrix, None, timepoints, workers=4)
+
+        Arguments
+        ---------
+        param_matrix : numpy.ndarray
+            (optional) array of shape (n_sets, num_params)
+        species_init_matrix : numpy.ndarray
+            (optional) array of shape (n_sets, num_spec_init)
+        timepoints : numpy.ndarray
+            time points to report the results at
+        workers : int
+            (optional) number of threads, 1 by default, None for the
+            number of CPUs. Only use more than 1 with a re-entrant library
+
+        Returns
+        -------
+        (timepoints, observables, species) where observables has shape
+        (n_sets, n_tpts, n_observables) and species has shape
+        (n_sets, n_tpts, n_species). The column names are in the obs_names
+        and spcs_names attributes.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        # TODO: Transition to BNGErrors and logging
+        assert timepoints is not None, "simulate_batch needs the time points"
+        timepoints = np.ascontiguousarray(timepoints, dtype=np.float64)
+        ntpts = len(timepoints)
+        if param_matrix is None:
+            param_matrix = np.atleast_2d(self.parameters)
+        if species_init_matrix is None:
+            species_init_matrix = np.atleast_2d(self.species_init)
+        param_matrix = np.ascontiguousarray(np.atleast_2d(param_matrix), np.float64)
+        species_init_matrix = np.ascontiguousarray(
+            np.atleast_2d(species_init_matrix), np.float64
+        )
+        # TODO: Transition to BNGErrors and logging
+        assert param_matrix.shape[1] == self.num_params
+        assert species_init_matrix.shape[1] == self.num_spec_init
+        n_sets = max(param_matrix.shape[0], species_init_matrix.shape[0])
+        for matrix in [param_matrix, species_init_matrix]:
+            assert matrix.shape[0] in [1, n_sets], "Matrices need the same row count"
+
+        def run_set(i, obs_out=None, spcs_out=None):
+            params = param_matrix[i if param_matrix.shape[0] > 1 else 0]
+            spcs = species_init_matrix[i if species_init_matrix.shape[0] > 1 else 0]
+            result = self._run(timepoints, spcs, params)
+            try:
+                if obs_out is None:
+                    obs_out = np.empty((n_sets, ntpts, result.n_observables))
+                    spcs_out = np.empty((n_sets, ntpts, result.n_species))
+                # C arrays are (columns, time points), copy straight
+                # into the slot of this set in the output
+                obs_out[i] = np.ctypeslib.as_array(
+                    result.observables, shape=(result.n_observables, ntpts)
+                ).T
+                spcs_out[i] = np.ctypeslib.as_array(
+                    result.species, shape=(result.n_species, ntpts)
+                ).T
+            finally:
+                self.lib.free_result(ctypes.byref(result))
+            return obs_out, spcs_out
+
+        # the first set tells us the output sizes
+        obs_out, spcs_out = run_set(0)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if n_sets > 1 and workers == 1:
+            for i in range(1, n_sets):
+                run_set(i, obs_out, spcs_out)
+        elif n_sets > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(run_set, i, obs_out, spcs_out)
+                    for i in range(1, n_sets)
+                ]
+                for future in futures:
+                    future.result()
+        return (timepoints, obs_out, spcs_out)
+
+    def simulate(self, t_start=0, t_end=100, n_steps=100, named=True, out=None):
         """
         Run the simulate command of the shared C library.
 
@@ -77,68 +255,163 @@ class CSimWrapper:
         and convert the pointer back to a result struct and then
         construct named numpy arrays to return observable and species
         values over time.
+
+        With named=False the observables and species are returned as plain
+        (n_observables, n_tpts) and (n_species, n_tpts) float64 arrays that
+        use the memory of the C result directly, without a copy. The C
+        memory is freed once both arrays are garbage collected.
+
+        If out is given as a tuple of two preallocated float64 arrays of
+        those shapes, the results are copied into them and they are
+        returned, so calling simulate in a loop doesn't allocate any
+        new arrays.
         """
-        # generate the time point array
-        del_t = (t_end - t_start) / float(n_steps)
-        timepoints = np.arange(t_start, t_end + 1, del_t)
+        # generate the time point array, reused
+        # while the arguments stay the same
+        tpts_key = (t_start, t_end, n_steps)
+        if self._tpts_key != tpts_key:
+            self._tpts = self.make_timepoints(t_start, t_end, n_steps)
+            self._tpts_key = tpts_key
+        timepoints = self._tpts
         ntpts = len(timepoints)
-        # call the simulate command
-        self.result = self.return_struct.from_address(
-            self.lib.simulate(
-                ntpts,
-                ctypes.c_void_p(timepoints.ctypes.data),
-                self.num_spec_init,
-                ctypes.c_void_p(self.species_init.ctypes.data),
-                self.num_params,
-                ctypes.c_void_p(self.parameters.ctypes.data),
-            )
+        # call the simulate command, the result memory
+        # is freed once the owner is garbage collected
+        owner = CResultOwner(
+            self.lib, self._run(timepoints, self.species_init, self.parameters)
         )
-        # we need to pull the observable names and get a list of them
-        obs_names = ctypes.cast(
-            self.result.obs_names,
-            ctypes.POINTER(ctypes.c_char * self.result.obs_name_len),
-        )[0].value.decode()
-        obs_names = obs_names.split("/")[:-1]
-        # same thing with species names
-        spcs_names = ctypes.cast(
-            self.result.spcs_names,
-            ctypes.POINTER(ctypes.c_char * self.result.spcs_name_len),
-        )[0].value.decode()
-        spcs_names = spcs_names.split("/")[:-1]
-        # cast the observables into a named numpy array
-        buffer_as_ctypes_arr_obs = ctypes.cast(
-            self.result.observables,
-            ctypes.POINTER(ctypes.c_double * ntpts * self.result.n_observables),
-        )[0]
-        observables = np.frombuffer(buffer_as_ctypes_arr_obs, np.float64)
-        fmt = ["f8"] * len(obs_names)
-        obs_all = np.reshape(observables, (self.result.n_observables, ntpts))
-        obs_all = np.core.records.fromarrays(obs_all, names=obs_names, formats=fmt)
-        # cast the species into a named numpy array
-        buffer_as_ctypes_arr_spc = ctypes.cast(
-            self.result.species,
-            ctypes.POINTER(ctypes.c_double * ntpts * self.result.n_species),
-        )[0]
-        species = np.frombuffer(buffer_as_ctypes_arr_spc, np.float64)
-        fmt = ["f8"] * len(spcs_names)
-        spcs_all = np.reshape(species, (self.result.n_species, ntpts))
-        spcs_all = np.core.records.fromarrays(spcs_all, names=spcs_names, formats=fmt)
-        # free the memory used for the results struct
-        self.lib.free_result(ctypes.byref(self.result))
-        del self.result
+        result = owner.result
+        obs_all = owner.as_array(result.observables, (result.n_observables, ntpts))
+        spcs_all = owner.as_array(result.species, (result.n_species, ntpts))
+        if out is not None:
+            obs_out, spcs_out = out
+            np.copyto(obs_out, obs_all)
+            np.copyto(spcs_out, spcs_all)
+            return (timepoints, obs_out, spcs_out)
+        if not named:
+            return (timepoints, obs_all, spcs_all)
+        # construct named numpy arrays, this copies the data
+        fmt = ["f8"] * len(self.obs_names)
+        obs_all = np.rec.fromarrays(obs_all, names=self.obs_names, formats=fmt)
+        fmt = ["f8"] * len(self.spcs_names)
+        spcs_all = np.rec.fromarrays(spcs_all, names=self.spcs_names, formats=fmt)
         # return named numpy arrays
         return (timepoints, obs_all, spcs_all)
 
 
+def _compiler_id(compiler) -> list:
+    # everything about the compiler that changes the library
+    exe = getattr(compiler, "compiler_so", None) or []
+    if len(exe) > 0:
+        path = shutil.which(exe[0])
+        if path is not None:
+            exe = [os.path.realpath(path)] + list(exe[1:])
+    return [
+        sys.platform,
+        compiler.compiler_type,
+        " ".join(exe),
+        "|".join(compiler.include_dirs),
+        "|".join(compiler.library_dirs),
+    ]
+
+
+def build_shared_lib(
+    c_source, lib_name, compiler, cache_dir, libraries=None, max_size=None
+):
+    """
+    Compiles the given C source into a shared library and returns the
+    path to it. Builds are done in a private temporary folder. The
+    library is stored in the cache folder under a hash of the C source,
+    the compiler and its include/library folders (e.g. the CVODE paths)
+    and later calls with the same inputs return the stored library
+    without compiling. If a maximum size is given, least recently used
+    libraries are removed from the cache once it is larger than that.
+
+    Usage: build_shared_lib(c_source, "model_cvode_py", compiler, cache_dir=path)
+           build_shared_lib(c_source, "model_cvode_py", compiler, path, max_size=256)
+
+    Arguments
+    ---------
+    c_source : str
+        the C source code
+    lib_name : str
+        name of the library, the file will be lib<lib_name>.so
+    compiler : distutils.ccompiler.CCompiler
+        the compiler to use
+    cache_dir : str
+        folder to store compiled libraries in
+    libraries : list
+        (optional) libraries to link against
+    max_size : float
+        (optional) maximum size of the cache folder in megabytes,
+        no libraries are removed by default
+    """
+    from bionetgen.core.utils.cache import BNGCache
+
+    if libraries is None:
+        libraries = []
+    # every library is a folder entry of the cache
+    lib_cache = BNGCache(
+        cache_dir, max_size=float("inf") if max_size is None else max_size, suffix=""
+    )
+    key = lib_cache.make_key(c_source, lib_name, *_compiler_id(compiler), *libraries)
+    lib_dir = os.path.join(lib_cache.cache_dir, key)
+    lib_file = os.path.join(lib_dir, compiler.library_filename(lib_name, "shared"))
+    if os.path.isfile(lib_file):
+        # mark the library as recently used
+        try:
+            os.utime(lib_dir)
+        except OSError:
+            pass
+        return lib_file
+    os.makedirs(lib_dir, exist_ok=True)
+    # build in a private folder so simulators
+    # compiling at the same time don't clash
+    with tempfile.TemporaryDirectory(dir=lib_dir) as build_dir:
+        c_file = os.path.join(build_dir, f"{lib_name}.c")
+        with open(c_file, "w") as f:
+            f.write(c_source)
+        # compile objects with fPIC for the shared lib we'll link
+        objects = compiler.compile(
+            [c_file], output_dir=build_dir, extra_preargs=["-fPIC"]
+        )
+        compiler.link_shared_lib(
+            objects, lib_name, output_dir=build_dir, libraries=libraries
+        )
+        # keep the source next to the library for reference
+        os.replace(c_file, os.path.join(lib_dir, f"{lib_name}.c"))
+        # moving the library in place is atomic, another
+        # process either sees the full library or none
+        os.replace(
+            os.path.join(build_dir, compiler.library_filename(lib_name, "shared")),
+            lib_file,
+        )
+    lib_cache.evict(keep=key)
+    return lib_file
+
+
 class CSimulator(BNGSimulator):
     """
     Object that bridges the BNG model object and the CSimWrapper object.
 
     The point of this object is to deal with the compilation of the shared library
     and pass the correct parameter and initial species values to the wrapper object.
+
+    The parameter and initial species vectors are computed once, when the
+    simulator is set up. Use set_param, set_params and set_init to change
+    values between simulations, changes to the model object afterwards are
+    not picked up.
+
+    Compiled libraries are kept in the cpy folder of the cache folder, up
+    to cpy_cache_size megabytes. With the cpy_cache option turned off the
+    library is built in a temporary folder of the simulator, which is
+    removed by close() or when the simulator is garbage collected.
     """
 
+    # temporary library folder when the cache is turned off
+    _lib_tmp = None
+
     def __init__(self, model_file, generate_network=False):
+        conf = get_conf()
         # check cvode library paths
         if (conf.get("cvode_include") is None) or (conf.get("cvode_lib") is None):
             print("CVODE include and library paths are not set, compilation won't work")
@@ -151,19 +424,20 @@ class CSimulator(BNGSimulator):
         elif isinstance(model_file, bionetgen.bngmodel):
             # loaded model
             self.model = model_file
-            cd = os.getcwd()
             with tempfile.TemporaryDirectory() as tmpdirname:
-                os.chdir(tmpdirname)
                 self.model.actions.clear_actions()
-                self.model.write_model(f"{self.model.model_name}_cpy.bngl")
+                cpy_bngl = os.path.join(tmpdirname, f"{self.model.model_name}_cpy.bngl")
+                self.model.write_model(cpy_bngl)
                 self.model = bionetgen.bngmodel(
-                    f"{self.model.model_name}_cpy.bngl",
+                    cpy_bngl,
                     generate_network=generate_network,
                 )
-            os.chdir(cd)
         else:
             print(f"model format not recognized: {model_file}")
-        # set compiler
+        # set compiler, the toolchain is only
+        # loaded when we actually need it
+        from distutils import ccompiler
+
         self.compiler = ccompiler.new_compiler()
         self.compiler.add_include_dir(conf.get("cvode_include"))
         self.compiler.add_library_dir(conf.get("cvode_lib"))
@@ -178,30 +452,80 @@ class CSimulator(BNGSimulator):
     def __repr__(self):
         return str(self)
 
-    def compile_shared_lib(self):
-        # run and get CPY file
+    def get_c_source(self, cache_dir=None) -> str:
+        """
+        Runs BNG2.pl to generate the network and write the C source of
+        the simulator and returns the source. If a cache folder is given
+        the source is stored under a hash of the model and the BNG
+        version, so BNG2.pl is only ran when the model changes.
+        """
+        from bionetgen.core.utils.cache import BNGCache
+        from bionetgen.core.defaults import get_latest_bng_version
+
         # make sure we don't have actions
         self.model.actions.clear_actions()
+        src_cache = key = None
+        if cache_dir is not None:
+            src_cache = BNGCache(os.path.join(cache_dir, "src"), suffix=".c")
+            key = src_cache.make_key(
+                str(self.model),
+                self.model.model_name,
+                get_latest_bng_version(),
+                get_conf()["bngpath"],
+            )
+            c_source = src_cache.get(key)
+            if c_source is not None:
+                return c_source
         self.model.actions.add_action("generate_network", {"overwrite": 1})
         self.model.actions.add_action("writeCPYfile", {})
-        # for now run and write the .c file in the current folder
-        bionetgen.run(self.model, out=os.path.abspath(os.getcwd()))
-        # compile CPY file
-        c_file = f"{self.model.model_name}_cvode_py.c"
-        obj_file = f"{self.model.model_name}_cvode_py.o"
-        lib_file = f"{self.model.model_name}_cvode_py"
-        # compile objects with fPIC for the shared lib we'll link
-        self.compiler.compile([c_file], extra_preargs=["-fPIC"])
-        # now link cvode and nvecserial and make a shared lib
-        self.compiler.link_shared_lib(
-            [obj_file], lib_file, libraries=["sundials_cvode", "sundials_nvecserial"]
+        try:
+            # BNG2.pl writes the network and the .c file in a
+            # private folder instead of the current one
+            with tempfile.TemporaryDirectory() as out:
+                bionetgen.run(self.model, out=out)
+                c_file = os.path.join(out, f"{self.model.model_name}_cvode_py.c")
+                with open(c_file, "r") as f:
+                    c_source = f.read()
+        finally:
+            self.model.actions.clear_actions()
+        if src_cache is not None:
+            src_cache.put(key, c_source)
+        return c_source
+
+    def compile_shared_lib(self):
+        from bionetgen.core.config import conf_flag
+
+        conf = get_conf()
+        cache_dir = lib_dir = max_size = None
+        if conf_flag(conf.get("cpy_cache", True)):
+            cache_dir = os.path.join(conf.get("cache_dir"), "cpy")
+            lib_dir = os.path.join(cache_dir, "lib")
+            max_size = conf.get("cpy_cache_size", 256)
+        else:
+            # removed with the simulator, TemporaryDirectory
+            # cleans up when it's garbage collected
+            self.close()
+            self._lib_tmp = tempfile.TemporaryDirectory(
+                prefix=f"{self.model.model_name}_cvode_py_"
+            )
+            lib_dir = self._lib_tmp.name
+        # get the C source, BNG2.pl is only ran if the model changed
+        c_source = self.get_c_source(cache_dir=cache_dir)
+        # compile or reuse the library, cvode and nvecserial are linked
+        self.lib_file = build_shared_lib(
+            c_source,
+            f"{self.model.model_name}_cvode_py",
+            self.compiler,
+            lib_dir,
+            libraries=["sundials_cvode", "sundials_nvecserial"],
+            max_size=max_size,
+        )
+        # keep a record of what we got, the object
+        # file is removed with the build folder
+        self.cfile = os.path.join(
+            os.path.dirname(self.lib_file), f"{self.model.model_name}_cvode_py.c"
         )
-        # # keep a record of what we got
-        self.cfile = os.path.abspath(c_file)
-        self.obj_file = os.path.abspath(obj_file)
-        # compiler tacks on the lib at the beginning and .so at the end
-        lib_file = f"lib{self.model.model_name}_cvode_py.so"
-        self.lib_file = os.path.abspath(lib_file)
+        self.obj_file = None
 
     @property
     def simulator(self):
@@ -217,37 +541,25 @@ class CSimulator(BNGSimulator):
     def simulator(self, lib_file):
         # use CSimWrapper under the hood
         try:
-            valid_params = []
-            for pname in self.model.parameters:
-                if pname.startswith("_"):
-                    continue
-                val = self.model.parameters[pname]
-                try:
-                    ftry = float(val.expr)
-                    valid_params.append(ftry)
-                except:
-                    pass
-            n_param = len(valid_params)
+            self._setup_values()
             self._simulator = CSimWrapper(
                 os.path.abspath(lib_file),
-                num_params=n_param,
-                num_spec_init=len(self.model.species),
+                num_params=len(self.param_values),
+                num_spec_init=len(self.species_init),
             )
         except:
             raise BNGCompileError(self.model)
+        # the wrapper uses our buffers directly, the
+        # setters below change them in place
+        self._simulator.parameters = self.param_values
+        self._simulator.species_init = self.species_init
 
-    def simulate(self, t_start=0, t_end=10, n_steps=10):
-        # set parameters and initial species values
-        spcs = []
-        for spc_name in self.model.species:
-            try:
-                count = float(self.model.species[spc_name].count)
-                spcs.append(count)
-            except:
-                p_name = self.model.species[spc_name].count
-                count = float(self.model.parameters[p_name].value)
-                spcs.append(count)
-        self.simulator.set_species_init(spcs)
+    def _setup_values(self):
+        """
+        Computes the parameter and initial species vectors the
+        C library takes and the name to index maps for them, once
+        """
+        self.param_names = []
         params = []
         for pname in self.model.parameters:
             if pname.startswith("_"):
@@ -256,13 +568,87 @@ class CSimulator(BNGSimulator):
                 val = self.model.parameters[pname]
                 ftry = float(val.expr)
                 params.append(ftry)
+                self.param_names.append(pname)
             except:
                 pass
+        self.param_index = {name: i for i, name in enumerate(self.param_names)}
+        self.param_values = np.array(params, dtype=np.float64)
+        self.species_names = []
+        spcs = []
+        for spc_name in self.model.species:
+            species = self.model.species[spc_name]
+            try:
+                count = float(species.count)
+            except:
+                count = float(self.model.parameters[species.count].value)
+            spcs.append(count)
+            self.species_names.append(str(species.pattern))
+        self.species_index = {name: i for i, name in enumerate(self.species_names)}
+        self.species_init = np.array(spcs, dtype=np.float64)
 
-        # params = list(filter(lambda x: not x.startswith("_"), self.model.parameters))
-        # params = [float(self.model.parameters[p].value) for p in params]
-        self.simulator.set_parameters(params)
-        # now that we have CSimWrapper setup correctly, run the simulation
-        timepoints, obs_all, spcs_all = self.simulator.simulate(t_start, t_end, n_steps)
+    def set_param(self, name, value) -> None:
+        """
+        Sets the value of a parameter for the following simulations
+        """
+        if name not in self.param_index:
+            raise KeyError(f"{name} is not a numeric parameter of the model")
+        self.param_values[self.param_index[name]] = value
+
+    def set_params(self, values) -> None:
+        """
+        Sets the values of the parameters in the given dictionary
+        """
+        for name, value in values.items():
+            self.set_param(name, value)
+
+    def set_init(self, name, value) -> None:
+        """
+        Sets the initial value of a species, given its
+        pattern (e.g. "A(b)") or its index
+        """
+        if isinstance(name, int):
+            self.species_init[name] = value
+            return
+        if name not in self.species_index:
+            raise KeyError(f"{name} is not a species of the model")
+        self.species_init[self.species_index[name]] = value
+
+    def simulate(self, t_start=0, t_end=10, n_steps=10, named=True, out=None):
+        # parameters and initial species values are already
+        # in the buffers the wrapper uses, run the simulation
+        timepoints, obs_all, spcs_all = self.simulator.simulate(
+            t_start, t_end, n_steps, named=named, out=out
+        )
         # return our results
         return (timepoints, obs_all, spcs_all)
+
+    def simulate_batch(
+        self,
+        param_matrix=None,
+        species_init_matrix=None,
+        t_start=0,
+        t_end=10,
+        n_steps=10,
+        workers=1,
+    ):
+        """
+        Runs the model once for each row of param_matrix and/or
+        species_init_matrix, in parallel threads if workers is more
+        than 1, see CSimWrapper.simulate_batch. Values that aren't given
+        are the current ones, the columns are in the order of
+        param_names and species_names.
+        """
+        timepoints = self.simulator.make_timepoints(t_start, t_end, n_steps)
+        return self.simulator.simulate_batch(
+            param_matrix, species_init_matrix, timepoints, workers=workers
+        )
+
+    def close(self) -> None:
+        """
+        Removes the temporary library folder of the simulator, if the
+        library cache is turned off. Call it once the simulator isn't
+        needed anymore.
+        """
+        if self._lib_tmp is not None:
+            self._lib_tmp.cleanup()
+            self._lib_tmp = None
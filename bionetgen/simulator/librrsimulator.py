@@ -1,5 +1,54 @@
+import itertools, os
+import numpy as np
+
 from .bngsimulator import BNGSimulator
 
+# RoadRunner instance of each sweep worker process,
+# loaded once by _sweep_init and reused for every run
+_sweep_rr = None
+
+
+def expand_grid(param_grid) -> list:
+    """
+    Turns a parameter grid into the list of parameter sets a sweep
+    runs. A dictionary of value lists gives every combination of the
+    values, with the last parameter changing fastest. A list of
+    dictionaries is returned as is.
+
+    Usage: expand_grid({"kf": [0.1, 1], "kr": [1, 2, 3]})
+    """
+    if isinstance(param_grid, dict):
+        names = list(param_grid.keys())
+        return [
+            dict(zip(names, values))
+            for values in itertools.product(*[param_grid[n] for n in names])
+        ]
+    return [dict(param_set) for param_set in param_grid]
+
+
+def _sweep_init(sbml, selections) -> None:
+    global _sweep_rr
+    import roadrunner as rr
+
+    _sweep_rr = rr.RoadRunner(sbml)
+    _sweep_rr.timeCourseSelections = selections
+
+
+def _sweep_run(rr, param_set, t_start, t_end, n_points):
+    # back to the values of the model first, so every run only
+    # differs from it by its own parameter set
+    rr.resetAll()
+    for name, value in param_set.items():
+        rr.setValue(name, value)
+    # reset() keeps global parameters but recomputes the initial
+    # state, so init(...) values set above also take effect
+    rr.reset()
+    return np.array(rr.simulate(t_start, t_end, n_points))
+
+
+def _sweep_worker(args):
+    return _sweep_run(_sweep_rr, *args)
+
 
 class libRRSimulator(BNGSimulator):
     """
@@ -24,6 +73,13 @@ class libRRSimulator(BNGSimulator):
     -------
     simulate(args)
         Uses the arguments provided to call the underlying simulator
+    sweep(param_grid, t_end, n_points, t_start=0, workers=None, selections=None)
+        Simulates every parameter set of the grid (see expand_grid) and
+        returns the time courses of the selections as one
+        (n_runs, n_points, n_selections) array. With workers > 1 the runs
+        are split over worker processes that load the SBML once each,
+        otherwise the runs use this simulator, which is reset to the
+        values of the model afterwards
     """
 
     @property
@@ -38,6 +94,12 @@ class libRRSimulator(BNGSimulator):
 
     @simulator.setter
     def simulator(self, model):
+        # keep the original SBML, workers load their own copy from it
+        if os.path.isfile(model):
+            with open(model, "r", encoding="UTF-8") as f:
+                self._sbml_source = f.read()
+        else:
+            self._sbml_source = model
         try:
             import roadrunner as rr
 
@@ -66,3 +128,37 @@ class libRRSimulator(BNGSimulator):
         args and kwargs to the underlying simulator object
         """
         return self.simulator.simulate(*args, **kwargs)
+
+    def sweep(
+        self, param_grid, t_end, n_points, t_start=0, workers=None, selections=None
+    ):
+        param_sets = expand_grid(param_grid)
+        if selections is None:
+            selections = list(self.simulator.timeCourseSelections)
+        results = np.empty((len(param_sets), n_points, len(selections)))
+        if workers is None or workers <= 1 or len(param_sets) <= 1:
+            rr = self.simulator
+            old_selections = list(rr.timeCourseSelections)
+            rr.timeCourseSelections = selections
+            try:
+                for irun, param_set in enumerate(param_sets):
+                    results[irun] = _sweep_run(rr, param_set, t_start, t_end, n_points)
+            finally:
+                rr.resetAll()
+                rr.timeCourseSelections = old_selections
+            return results
+        from concurrent.futures import ProcessPoolExecutor
+
+        run_args = [(param_set, t_start, t_end, n_points) for param_set in param_sets]
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_sweep_init,
+            initargs=(self._sbml_source, selections),
+        ) as executor:
+            # a few chunks per worker to balance the load
+            chunksize = max(1, len(run_args) // (4 * workers))
+            for irun, result in enumerate(
+                executor.map(_sweep_worker, run_args, chunksize=chunksize)
+            ):
+                results[irun] = result
+        return results
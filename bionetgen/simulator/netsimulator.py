@@ -0,0 +1,143 @@
+import copy, os, tempfile
+import numpy as np
+
+from .bngsimulator import BNGSimulator
+from .networkmodel import NetworkModel
+
+
+def write_network(model_file, out):
+    """
+    Runs BNG2.pl to generate the network of the given BNGL model in the
+    given folder and returns the path to the .net file
+
+    Usage: write_network("model.bngl", out_folder)
+           write_network(model_object, out_folder)
+    """
+    import bionetgen
+
+    if isinstance(model_file, bionetgen.bngmodel):
+        model = model_file
+    else:
+        model = bionetgen.bngmodel(model_file)
+    curr_actions = copy.deepcopy(model.actions)
+    model.actions.clear_actions()
+    model.actions.add_action("generate_network", {"overwrite": 1})
+    try:
+        bionetgen.run(model, out=out)
+    finally:
+        model.actions = curr_actions
+    return os.path.join(out, f"{model.model_name}.net")
+
+
+def load_network(model_file):
+    """
+    Returns a Network for the given .net file, or for the given BNGL
+    model, in which case BNG2.pl is ran to generate the network
+
+    Usage: load_network("model.net")
+           load_network("model.bngl")
+    """
+    from bionetgen.network.network import Network
+
+    if isinstance(model_file, Network):
+        return model_file
+    if isinstance(model_file, str) and model_file.endswith(".net"):
+        return Network(model_file)
+    with tempfile.TemporaryDirectory() as out:
+        # the network reads the file when it's created
+        return Network(write_network(model_file, out))
+
+
+class NetworkSimulator(BNGSimulator):
+    """
+    Base class of the simulators that work directly on a reaction
+    network (.net file) in python. Sets up a NetworkModel and keeps
+    the parameter and initial species values that are used for
+    each simulation.
+
+    Usage: subclassed by ScipySimulator, SSASimulator
+
+    Arguments
+    ---------
+    model_file : str
+        path to a .net file or a BNGL model, BNG2.pl generates
+        the network of BNGL models. Network objects also work
+
+    Methods
+    -------
+    set_param(name, value) : None
+        sets a parameter for the following simulations
+    set_params(values) : None
+        sets the parameters in the given dictionary
+    reset_params() : None
+        goes back to the parameter values of the network
+    set_init(name, value) : None
+        sets the initial value of a species, given
+        its name in the network or its index
+    """
+
+    @property
+    def simulator(self):
+        """
+        simulator attribute that stores the NetworkModel
+        the simulations are ran with
+        """
+        return self._simulator
+
+    @simulator.setter
+    def simulator(self, model_file):
+        self._simulator = NetworkModel(load_network(model_file))
+        self.species_names = self._simulator.species_names
+        self.species_index = {name: i for i, name in enumerate(self.species_names)}
+        self.species_init = self._simulator.x0.copy()
+        self._init_overrides = {}
+
+    def set_param(self, name, value) -> None:
+        self.simulator.set_param(name, value)
+        self._update_init()
+
+    def set_params(self, values) -> None:
+        for name, value in values.items():
+            self.simulator.set_param(name, value)
+        self._update_init()
+
+    def reset_params(self) -> None:
+        self.simulator.reset_params()
+        self._update_init()
+
+    def set_init(self, name, value) -> None:
+        if not isinstance(name, int):
+            if name not in self.species_index:
+                raise KeyError(f"{name} is not a species of the network")
+            name = self.species_index[name]
+        self._init_overrides[name] = value
+        self.species_init[name] = value
+
+    def _update_init(self) -> None:
+        # initial amounts can depend on parameters,
+        # values given to set_init are kept
+        self.species_init[:] = self.simulator.x0
+        for ind, value in self._init_overrides.items():
+            self.species_init[ind] = value
+
+    @staticmethod
+    def make_timepoints(t_start=0, t_end=10, n_steps=10):
+        return np.linspace(t_start, t_end, n_steps + 1)
+
+    def _results(self, timepoints, species, named=True):
+        """
+        Turns a (n_tpts, n_species) trajectory into the result format
+        of the other simulators, (timepoints, observables, species) where
+        observables and species are record arrays named after the groups
+        and species, or plain (n, n_tpts) arrays if named is False
+        """
+        model = self.simulator
+        spcs_all = np.ascontiguousarray(species.T)
+        obs_all = np.ascontiguousarray(model.observables(species).T)
+        if not named:
+            return (timepoints, obs_all, spcs_all)
+        fmt = ["f8"] * len(model.obs_names)
+        obs_all = np.rec.fromarrays(obs_all, names=model.obs_names, formats=fmt)
+        fmt = ["f8"] * len(model.species_names)
+        spcs_all = np.rec.fromarrays(spcs_all, names=model.species_names, formats=fmt)
+        return (timepoints, obs_all, spcs_all)
@@ -0,0 +1,331 @@
+import math
+import numpy as np
+
+# functions BNG allows in parameter and rate
+# expressions, with their python counterparts
+_math_namespace = {
+    "exp": math.exp,
+    "ln": math.log,
+    "log": math.log,
+    "log10": math.log10,
+    "log2": math.log2,
+    "sqrt": math.sqrt,
+    "abs": abs,
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "asin": math.asin,
+    "acos": math.acos,
+    "atan": math.atan,
+    "sinh": math.sinh,
+    "cosh": math.cosh,
+    "tanh": math.tanh,
+    "asinh": math.asinh,
+    "acosh": math.acosh,
+    "atanh": math.atanh,
+    "floor": math.floor,
+    "ceil": math.ceil,
+    "rint": round,
+    "min": min,
+    "max": max,
+    "_pi": math.pi,
+    "_e": math.e,
+}
+
+
+def eval_expression(expr, values):
+    """
+    Evaluates a BNG math expression (e.g. "2*kp" or "exp(-E/RT)") with
+    the given dictionary of parameter values and returns a float
+
+    Usage: eval_expression("2*kp", {"kp": 0.5})
+    """
+    namespace = dict(_math_namespace)
+    namespace.update(values)
+    try:
+        return float(
+            eval(str(expr).replace("^", "**"), {"__builtins__": {}}, namespace)
+        )
+    except (NameError, SyntaxError, TypeError) as e:
+        raise ValueError(f"Can't evaluate expression {expr}: {e}")
+
+
+class NetworkModel:
+    """
+    Numerical form of a reaction network read from a .net file, shared
+    by the python simulators. Species, reactions and groups are turned
+    into arrays so that rates and derivatives are evaluated with a few
+    vectorized numpy operations instead of loops over reactions. Only
+    mass action reactions are supported, the rate of each reaction is its
+    rate constant times the product of its reactant amounts. Statistical
+    factors are already in the rate constants BNG2.pl writes to .net files.
+    Fixed species (marked with $) don't change.
+
+    Usage: NetworkModel("/path/to/model.net")
+           NetworkModel(network_object)
+
+    Arguments
+    ---------
+    network : str or Network
+        path to a .net file or a bionetgen.network.Network object
+
+    Attributes
+    ----------
+    species_names : list
+        names of the species in .net order
+    obs_names : list
+        names of the groups (observables)
+    param_names : list
+        names of the parameters
+    x0 : numpy.ndarray
+        initial species amounts
+    k : numpy.ndarray
+        rate constant of each reaction
+    reactants : numpy.ndarray
+        (n_reactions, max_order) species indices of the reactants of each
+        reaction, padded with n_species which points to a constant 1
+    stoich : scipy.sparse.csr_matrix
+        (n_species, n_reactions) net change of each species per reaction
+    obs_matrix : scipy.sparse.csr_matrix
+        (n_observables, n_species) weight of each species in each group
+
+    Methods
+    -------
+    set_param(name, value) : None
+        sets a parameter and updates the parameters, initial amounts
+        and rate constants that depend on it
+    reset_params() : None
+        goes back to the parameter values of the network
+    rates(x) : numpy.ndarray
+        reaction rates for species amounts x, x can also be a
+        (n_replicates, n_species) matrix
+    propensities(x, rxns=None) : numpy.ndarray
+        stochastic propensities for integer species amounts x, of all
+        reactions or only of the reaction indices rxns
+    dependency_graph() : (numpy.ndarray, numpy.ndarray)
+        reactions whose propensities change when each reaction fires
+    rhs(t, x) : numpy.ndarray
+        time derivative of the species amounts
+    jacobian(t, x) : scipy.sparse.csr_matrix
+        sparse Jacobian of rhs
+    observables(x) : numpy.ndarray
+        group values for species amounts x, x can be a (n, n_species) matrix
+    """
+
+    def __init__(self, network) -> None:
+        from scipy import sparse
+
+        if isinstance(network, str):
+            from bionetgen.network.network import Network
+
+            network = Network(network)
+        self.network = network
+        # parameters are evaluated in order, later ones can use earlier ones
+        self.param_names = []
+        self._param_exprs = {}
+        for pname in network.parameters:
+            param = network.parameters[pname]
+            if param.name not in self._param_exprs:
+                self.param_names.append(param.name)
+            self._param_exprs[param.name] = param.value
+        self._overrides = {}
+        self._eval_params()
+        # species, .net files refer to them by their line label
+        self.species_names = []
+        species_index = {}
+        self._count_exprs = []
+        for skey in network.species:
+            spc = network.species[skey]
+            species_index[str(spc.line_label).strip()] = len(self.species_names)
+            self.species_names.append(spc.name)
+            self._count_exprs.append(spc.count)
+        self.n_species = len(self.species_names)
+        self._eval_x0()
+        self.fixed = np.array(
+            [name.startswith("$") or "::$" in name for name in self.species_names],
+            dtype=bool,
+        )
+        # reactions, "0" is the null species
+        self._rate_exprs = []
+        reactant_lists = []
+        rows, cols, vals = [], [], []
+        for irxn, rkey in enumerate(network.reactions):
+            rxn = network.reactions[rkey]
+            reactants = [species_index[r] for r in rxn.reactants if r != "0"]
+            products = [species_index[p] for p in rxn.products if p != "0"]
+            reactant_lists.append(reactants)
+            for ind in reactants:
+                rows.append(ind)
+                cols.append(irxn)
+                vals.append(-1.0)
+            for ind in products:
+                rows.append(ind)
+                cols.append(irxn)
+                vals.append(1.0)
+            self._rate_exprs.append(rxn.rate_constant)
+        self.n_reactions = len(reactant_lists)
+        vals = np.array(vals, dtype=np.float64)
+        rows = np.array(rows, dtype=np.int64)
+        # fixed species don't change
+        if len(rows) > 0:
+            vals[self.fixed[rows]] = 0.0
+        self.stoich = sparse.csr_matrix(
+            (vals, (rows, np.array(cols, dtype=np.int64))),
+            shape=(self.n_species, self.n_reactions),
+        )
+        self.stoich.sum_duplicates()
+        self.stoich.eliminate_zeros()
+        max_order = max([len(r) for r in reactant_lists] + [1])
+        self.reactants = np.full(
+            (self.n_reactions, max_order), self.n_species, dtype=np.int64
+        )
+        for irxn, reactants in enumerate(reactant_lists):
+            self.reactants[irxn, : len(reactants)] = reactants
+        self.order = np.array([len(r) for r in reactant_lists], dtype=np.int64)
+        # for stochastic propensities a species that appears n times as a
+        # reactant contributes x*(x-1)*...*(x-n+1), this is the offset of
+        # each reactant slot in that falling product
+        self._falling = np.zeros(self.reactants.shape, dtype=np.float64)
+        for irxn, reactants in enumerate(reactant_lists):
+            for islot, ind in enumerate(reactants):
+                self._falling[irxn, islot] = reactants[:islot].count(ind)
+        self._eval_rates()
+        # the pattern of d(rate)/d(species), one entry per reactant slot
+        slot_rxn, slot = np.nonzero(self.reactants < self.n_species)
+        self._jac_rxn = slot_rxn
+        self._jac_slot = slot
+        self._jac_spc = self.reactants[slot_rxn, slot]
+        # observables
+        self.obs_names = []
+        rows, cols, vals = [], [], []
+        for igrp, gkey in enumerate(network.groups):
+            group = network.groups[gkey]
+            self.obs_names.append(group.name)
+            for member in group.members:
+                if "*" in member:
+                    weight, sid = member.split("*")
+                    weight = float(weight)
+                else:
+                    weight, sid = 1.0, member
+                rows.append(igrp)
+                cols.append(species_index[sid])
+                vals.append(weight)
+        self.obs_matrix = sparse.csr_matrix(
+            (vals, (rows, cols)), shape=(len(self.obs_names), self.n_species)
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"NetworkModel({self.n_species} species, {self.n_reactions} reactions, "
+            f"{len(self.obs_names)} observables)"
+        )
+
+    def _eval_params(self) -> None:
+        self.param_values = {}
+        for pname in self.param_names:
+            if pname in self._overrides:
+                self.param_values[pname] = self._overrides[pname]
+            else:
+                self.param_values[pname] = eval_expression(
+                    self._param_exprs[pname], self.param_values
+                )
+
+    def _eval_x0(self) -> None:
+        self.x0 = np.array(
+            [eval_expression(e, self.param_values) for e in self._count_exprs],
+            dtype=np.float64,
+        )
+
+    def _eval_rates(self) -> None:
+        try:
+            self.k = np.array(
+                [eval_expression(e, self.param_values) for e in self._rate_exprs],
+                dtype=np.float64,
+            )
+        except ValueError as e:
+            raise ValueError(
+                f"Only mass action reactions are supported by the python simulators: {e}"
+            )
+
+    def set_param(self, name, value) -> None:
+        if name not in self._param_exprs:
+            raise KeyError(f"{name} is not a parameter of the network")
+        self._overrides[name] = float(value)
+        self._eval_params()
+        self._eval_x0()
+        self._eval_rates()
+
+    def reset_params(self) -> None:
+        self._overrides = {}
+        self._eval_params()
+        self._eval_x0()
+        self._eval_rates()
+
+    def _extended(self, x):
+        # species amounts with a trailing 1 for the padded reactant slots
+        x = np.asarray(x, dtype=np.float64)
+        ones = np.ones(x.shape[:-1] + (1,), dtype=np.float64)
+        return np.concatenate([x, ones], axis=-1)
+
+    def rates(self, x):
+        xe = self._extended(x)
+        return self.k * np.prod(xe[..., self.reactants], axis=-1)
+
+    def propensities(self, x, rxns=None):
+        xe = self._extended(x)
+        if rxns is None:
+            amounts = xe[..., self.reactants] - self._falling
+            return self.k * np.prod(np.maximum(amounts, 0.0), axis=-1)
+        amounts = xe[..., self.reactants[rxns]] - self._falling[rxns]
+        return self.k[rxns] * np.prod(np.maximum(amounts, 0.0), axis=-1)
+
+    def dependency_graph(self):
+        """
+        Returns (indptr, indices) in CSR layout, the reactions that need
+        their propensity updated after reaction i fires are
+        indices[indptr[i]:indptr[i + 1]]. The fired reaction is always
+        included.
+        """
+        if getattr(self, "_dep_graph", None) is None:
+            from scipy import sparse
+
+            # reaction x species, which species each reaction reads
+            reads = sparse.csr_matrix(
+                (
+                    np.ones(self._jac_rxn.shape[0]),
+                    (self._jac_rxn, self._jac_spc),
+                ),
+                shape=(self.n_reactions, self.n_species),
+            )
+            changes = (self.stoich != 0).T.astype(np.float64)
+            deps = (changes @ reads.T).tolil()
+            deps.setdiag(1.0)
+            deps = deps.tocsr()
+            deps.sort_indices()
+            self._dep_graph = (deps.indptr.copy(), deps.indices.copy())
+        return self._dep_graph
+
+    def rhs(self, t, x):
+        return self.stoich @ self.rates(x)
+
+    def jacobian(self, t, x):
+        from scipy import sparse
+
+        xe = self._extended(x)
+        amounts = xe[self.reactants]
+        # derivative of each rate with respect to each of its reactant
+        # slots is the rate constant times the other reactants
+        vals = np.empty(self._jac_rxn.shape[0], dtype=np.float64)
+        for islot in range(self.reactants.shape[1]):
+            sel = self._jac_slot == islot
+            others = np.delete(amounts[self._jac_rxn[sel]], islot, axis=1)
+            vals[sel] = self.k[self._jac_rxn[sel]] * np.prod(others, axis=1)
+        drate = sparse.csr_matrix(
+            (vals, (self._jac_rxn, self._jac_spc)),
+            shape=(self.n_reactions, self.n_species),
+        )
+        return (self.stoich @ drate).tocsc()
+
+    def observables(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        return (self.obs_matrix @ x.T).T
@@ -0,0 +1,71 @@
+import numpy as np
+
+from .netsimulator import NetworkSimulator
+
+
+class ScipySimulator(NetworkSimulator):
+    """
+    ODE simulator that integrates the reaction network with
+    scipy.integrate.solve_ivp. Doesn't need a compiler, CVODE
+    or libroadrunner. Rates are evaluated with vectorized mass action
+    and the stiff solvers get the analytic sparse Jacobian.
+
+    Usage: ScipySimulator("model.net")
+           ScipySimulator("model.bngl", method="LSODA")
+
+    Arguments
+    ---------
+    model_file : str
+        path to a .net file or a BNGL model
+    method : str
+        (optional) solve_ivp method, "BDF" (default) or "LSODA"
+        are best for stiff networks
+    rtol : float
+        (optional) relative tolerance of the solver
+    atol : float
+        (optional) absolute tolerance of the solver
+
+    Methods
+    -------
+    simulate(t_start=0, t_end=10, n_steps=10, named=True)
+        integrates the network and returns (timepoints, observables, species)
+        in the same format as the other simulators
+    """
+
+    def __init__(self, model_file, method="BDF", rtol=1e-8, atol=1e-8):
+        self.method = method
+        self.rtol = rtol
+        self.atol = atol
+        super().__init__(model_file=model_file)
+
+    def __str__(self):
+        return f"SciPy ODE Simulator ({self.method}), {self.simulator}"
+
+    def __repr__(self):
+        return str(self)
+
+    def simulate(self, t_start=0, t_end=10, n_steps=10, named=True):
+        from scipy.integrate import solve_ivp
+
+        model = self.simulator
+        timepoints = self.make_timepoints(t_start, t_end, n_steps)
+        jac = model.jacobian
+        if self.method == "LSODA":
+            # LSODA only takes dense Jacobians
+            jac = lambda t, x: model.jacobian(t, x).toarray()
+        elif self.method not in ["BDF", "Radau"]:
+            # explicit methods don't use it
+            jac = None
+        sol = solve_ivp(
+            model.rhs,
+            (timepoints[0], timepoints[-1]),
+            self.species_init,
+            method=self.method,
+            t_eval=timepoints,
+            jac=jac,
+            rtol=self.rtol,
+            atol=self.atol,
+        )
+        if not sol.success:
+            raise RuntimeError(f"Integration failed: {sol.message}")
+        return self._results(timepoints, sol.y.T, named=named)
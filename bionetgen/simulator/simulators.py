@@ -1,5 +1,8 @@
 from .librrsimulator import libRRSimulator
 from .csimulator import CSimulator
+from .scipysimulator import ScipySimulator
+from .ssasimulator import SSASimulator
+from .tausimulator import TauLeapSimulator
 
 
 def sim_getter(model_file=None, model_str=None, sim_type="libRR"):
@@ -18,9 +21,11 @@ def sim_getter(model_file=None, model_str=None, sim_type="libRR"):
         Instead of the path to the model you can also supply the model
         string instead.
     sim_type : str, optional
-        The name of the type of simulator object to get. At the moment only
-        libRoadRunner and CPY type simulators are allowed, allowed values are
-        "libRR" and "cpy".
+        The name of the type of simulator object to get. Allowed values are
+        "libRR" for libRoadRunner, "cpy" for the compiled C simulator and
+        "scipy" for the SciPy ODE simulator, "ssa" for the python stochastic
+        simulator and "tau_leap" for the tau-leaping ensemble simulator.
+        These three also take .net files as model_file.
 
     Returns
     -------
@@ -40,6 +45,12 @@ def sim_getter(model_file=None, model_str=None, sim_type="libRR"):
                 return libRRSimulator(model_file=model_file)
             elif sim_type == "cpy":
                 return CSimulator(model_file=model_file, generate_network=True)
+            elif sim_type == "scipy":
+                return ScipySimulator(model_file=model_file)
+            elif sim_type == "ssa":
+                return SSASimulator(model_file=model_file)
+            elif sim_type == "tau_leap":
+                return TauLeapSimulator(model_file=model_file)
             else:
                 print("simulator type {} not supported".format(sim_type))
     if model_file is not None:
@@ -47,5 +58,11 @@ def sim_getter(model_file=None, model_str=None, sim_type="libRR"):
             return libRRSimulator(model_file=model_file)
         elif sim_type == "cpy":
             return CSimulator(model_file=model_file, generate_network=True)
+        elif sim_type == "scipy":
+            return ScipySimulator(model_file=model_file)
+        elif sim_type == "ssa":
+            return SSASimulator(model_file=model_file)
+        elif sim_type == "tau_leap":
+            return TauLeapSimulator(model_file=model_file)
         else:
             print("simulator type {} not supported".format(sim_type))
@@ -0,0 +1,158 @@
+import numpy as np
+
+from .netsimulator import NetworkSimulator
+
+
+class _IndexedPriorityQueue:
+    """
+    Binary min-heap of the next firing times of the reactions that also
+    keeps the heap position of each reaction, so the time of any reaction
+    can be changed in O(log R)
+    """
+
+    def __init__(self, times) -> None:
+        self.times = [float(t) for t in times]
+        self.heap = sorted(range(len(self.times)), key=self.times.__getitem__)
+        self.pos = [0] * len(self.heap)
+        for i, rxn in enumerate(self.heap):
+            self.pos[rxn] = i
+
+    def top(self):
+        rxn = self.heap[0]
+        return rxn, self.times[rxn]
+
+    def _swap(self, i, j) -> None:
+        heap, pos = self.heap, self.pos
+        heap[i], heap[j] = heap[j], heap[i]
+        pos[heap[i]] = i
+        pos[heap[j]] = j
+
+    def update(self, rxn, time) -> None:
+        times, heap = self.times, self.heap
+        old = times[rxn]
+        times[rxn] = time
+        i = self.pos[rxn]
+        if time < old:
+            while i > 0:
+                parent = (i - 1) // 2
+                if times[heap[parent]] <= time:
+                    break
+                self._swap(i, parent)
+                i = parent
+        else:
+            n = len(heap)
+            while True:
+                child = 2 * i + 1
+                if child >= n:
+                    break
+                if child + 1 < n and times[heap[child + 1]] < times[heap[child]]:
+                    child += 1
+                if times[heap[child]] >= time:
+                    break
+                self._swap(i, child)
+                i = child
+
+
+class SSASimulator(NetworkSimulator):
+    """
+    Stochastic simulator that runs Gillespie's algorithm on the reaction
+    network in python, using the Gibson-Bruck next reaction method. After
+    a reaction fires only the propensities of the reactions that depend on
+    the changed species are recomputed and the next reaction is taken from
+    an indexed priority queue, so each event costs O(log R) instead of O(R).
+    Replicates are ran in the same process, without starting BNG2.pl or
+    reading the network again. The reaction network comes from NetworkModel
+    and uses scipy.sparse, scipy is a dependency of bionetgen.
+
+    Usage: SSASimulator("model.net", seed=1)
+           sim_getter(model_file="model.net", sim_type="ssa")
+
+    Arguments
+    ---------
+    model_file : str
+        path to a .net file or a BNGL model
+    seed : int
+        (optional) seed of the random number generator
+
+    Methods
+    -------
+    simulate(t_start=0, t_end=10, n_steps=10, named=True)
+        runs one trajectory, returns (timepoints, observables, species)
+        in the same format as the other simulators
+    simulate_replicates(n_replicates, t_start=0, t_end=10, n_steps=10)
+        runs n_replicates trajectories, returns (timepoints, observables,
+        species) where observables and species are (n_replicates, n, n_tpts)
+        arrays
+    """
+
+    def __init__(self, model_file, seed=None):
+        self.rng = np.random.default_rng(seed)
+        super().__init__(model_file=model_file)
+
+    def __str__(self):
+        return f"SSA Simulator, {self.simulator}"
+
+    def __repr__(self):
+        return str(self)
+
+    def _trajectory(self, timepoints):
+        model = self.simulator
+        rng = self.rng
+        indptr, indices = model.dependency_graph()
+        # species changed by each reaction
+        stoich = model.stoich.tocsc()
+        # amounts are whole molecule counts
+        x = np.rint(self.species_init).astype(np.float64)
+        species = np.empty((timepoints.shape[0], model.n_species))
+        if model.n_reactions == 0:
+            species[:] = x
+            return species
+        t = timepoints[0]
+        props = model.propensities(x)
+        with np.errstate(divide="ignore"):
+            taus = t + rng.exponential(size=props.shape[0]) / props
+        queue = _IndexedPriorityQueue(taus)
+        a = props.tolist()
+        itpt = 0
+        n_tpts = timepoints.shape[0]
+        while itpt < n_tpts:
+            mu, t_next = queue.top()
+            # record the state at every time point before the next event
+            while itpt < n_tpts and timepoints[itpt] < t_next:
+                species[itpt] = x
+                itpt += 1
+            if itpt == n_tpts:
+                break
+            t = t_next
+            start, end = stoich.indptr[mu], stoich.indptr[mu + 1]
+            x[stoich.indices[start:end]] += stoich.data[start:end]
+            deps = indices[indptr[mu] : indptr[mu + 1]]
+            new_props = model.propensities(x, deps).tolist()
+            for rxn, a_new in zip(deps.tolist(), new_props):
+                a_old = a[rxn]
+                a[rxn] = a_new
+                if a_new <= 0:
+                    tau = np.inf
+                elif rxn != mu and a_old > 0:
+                    # Gibson-Bruck reuses the remaining waiting time
+                    tau = t + (a_old / a_new) * (queue.times[rxn] - t)
+                else:
+                    tau = t + rng.exponential() / a_new
+                queue.update(rxn, tau)
+        return species
+
+    def simulate(self, t_start=0, t_end=10, n_steps=10, named=True):
+        timepoints = self.make_timepoints(t_start, t_end, n_steps)
+        species = self._trajectory(timepoints)
+        return self._results(timepoints, species, named=named)
+
+    def simulate_replicates(self, n_replicates, t_start=0, t_end=10, n_steps=10):
+        model = self.simulator
+        timepoints = self.make_timepoints(t_start, t_end, n_steps)
+        obs_all = np.empty((n_replicates, len(model.obs_names), timepoints.shape[0]))
+        spcs_all = np.empty((n_replicates, model.n_species, timepoints.shape[0]))
+        for irep in range(n_replicates):
+            species = self._trajectory(timepoints)
+            spcs_all[irep] = species.T
+            obs_all[irep] = model.observables(species).T
+        return (timepoints, obs_all, spcs_all)
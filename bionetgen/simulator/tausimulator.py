@@ -0,0 +1,210 @@
+import numpy as np
+
+from .netsimulator import NetworkSimulator
+
+
+class TauLeapSimulator(NetworkSimulator):
+    """
+    Stochastic simulator that advances an ensemble of replicates together
+    with tau-leaping. The state of the ensemble is a (n_replicates,
+    n_species) matrix, the number of firings of every reaction in every
+    replicate is drawn in one batched Poisson call per step. The step size
+    of each replicate is picked with the Cao-Gillespie-Petzold bound on the
+    relative change of the propensities. Replicates where the leap would
+    be shorter than a few SSA steps take exact SSA steps instead and leaps
+    that would make a species negative are retried with half the step.
+    The stoichiometry is the scipy.sparse matrix of NetworkModel, scipy is
+    a dependency of bionetgen.
+
+    Usage: TauLeapSimulator("model.net", seed=1)
+           sim_getter(model_file="model.net", sim_type="tau_leap")
+
+    Arguments
+    ---------
+    model_file : str
+        path to a .net file or a BNGL model
+    epsilon : float
+        (optional) error control parameter of the step size selection,
+        0.03 by default
+    seed : int
+        (optional) seed of the random number generator
+
+    Methods
+    -------
+    simulate(t_start=0, t_end=10, n_steps=10, named=True)
+        runs one replicate, returns (timepoints, observables, species)
+        in the same format as the other simulators
+    simulate_ensemble(n_replicates, t_start=0, t_end=10, n_steps=10, summary=False)
+        runs n_replicates replicates at once, returns (timepoints,
+        observables, species) where observables and species are
+        (n_replicates, n, n_tpts) arrays. With summary=True no replicate
+        trajectories are kept and (timepoints, mean, variance) of the
+        observables across replicates, as (n_observables, n_tpts) arrays,
+        is returned instead
+    """
+
+    # leaps shorter than this many expected SSA steps take an SSA step
+    ssa_factor = 10.0
+
+    def __init__(self, model_file, epsilon=0.03, seed=None):
+        self.epsilon = epsilon
+        self.rng = np.random.default_rng(seed)
+        super().__init__(model_file=model_file)
+
+    def __str__(self):
+        return f"Tau-leaping Simulator, {self.simulator}"
+
+    def __repr__(self):
+        return str(self)
+
+    @property
+    def simulator(self):
+        return self._simulator
+
+    @simulator.setter
+    def simulator(self, model_file):
+        NetworkSimulator.simulator.fset(self, model_file)
+        model = self._simulator
+        # highest order of reaction (HOR) each species is a reactant of and
+        # how many times it appears in it, for the g_i of Cao et al.
+        self._hor = np.zeros(model.n_species, dtype=np.int64)
+        self._hor_mult = np.zeros(model.n_species, dtype=np.int64)
+        for irxn in range(model.n_reactions):
+            reactants = model.reactants[irxn, : model.order[irxn]].tolist()
+            order = len(reactants)
+            for ind in set(reactants):
+                mult = reactants.count(ind)
+                if (order, mult) > (self._hor[ind], self._hor_mult[ind]):
+                    self._hor[ind] = order
+                    self._hor_mult[ind] = mult
+        # only changing reactant species bound the step size
+        changing = np.asarray(abs(model.stoich).sum(axis=1)).ravel() > 0
+        self._bounded = (self._hor > 0) & changing
+        self._stoich_sq = model.stoich.multiply(model.stoich).tocsr()
+        self._stoich_rows = model.stoich.T.tocsr()
+
+    def _g(self, x):
+        # g_i from Cao, Gillespie and Petzold (2006), x is (n, n_species)
+        hor = self._hor.astype(np.float64)
+        mult = self._hor_mult
+        x1 = np.maximum(x - 1.0, 1.0)
+        x2 = np.maximum(x - 2.0, 1.0)
+        g = np.broadcast_to(hor, x.shape).copy()
+        g = np.where((hor == 2) & (mult == 2), 2.0 + 1.0 / x1, g)
+        g = np.where((hor == 3) & (mult == 2), 1.5 * (2.0 + 1.0 / x1), g)
+        g = np.where((hor == 3) & (mult == 3), 3.0 + 1.0 / x1 + 2.0 / x2, g)
+        return g
+
+    def _select_tau(self, x, a):
+        model = self.simulator
+        mu = (model.stoich @ a.T).T
+        sigma2 = (self._stoich_sq @ a.T).T
+        bound = np.maximum(self.epsilon * x / np.maximum(self._g(x), 1.0), 1.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            tau_mu = np.where(mu != 0, bound / np.abs(mu), np.inf)
+            tau_sigma = np.where(sigma2 > 0, bound**2 / sigma2, np.inf)
+        tau = np.minimum(tau_mu, tau_sigma)[:, self._bounded]
+        if tau.shape[1] == 0:
+            return np.full(x.shape[0], np.inf)
+        return tau.min(axis=1)
+
+    def _changes(self, counts):
+        # (n, n_reactions) firings to (n, n_species) changes
+        return (self.simulator.stoich @ counts.T).T
+
+    def _step(self, x, t, t_next):
+        """
+        Advances the replicates x (n, n_species) at times t (n,) by one
+        leap or SSA step, without going past t_next
+        """
+        rng = self.rng
+        a = self.simulator.propensities(x)
+        a0 = a.sum(axis=1)
+        remaining = t_next - t
+        tau = np.minimum(self._select_tau(x, a), remaining)
+        with np.errstate(divide="ignore"):
+            exact = tau < self.ssa_factor / a0
+        # SSA steps, no reaction fires before t_next if dt is too long
+        ind = np.nonzero(exact)[0]
+        if ind.shape[0] > 0:
+            with np.errstate(divide="ignore"):
+                dt = rng.exponential(size=ind.shape[0]) / a0[ind]
+            fire = dt < remaining[ind]
+            t[ind] = t_next
+            fired = ind[fire]
+            if fired.shape[0] > 0:
+                t[fired] += dt[fire] - remaining[fired]
+                cum = np.cumsum(a[fired], axis=1)
+                u = rng.random(fired.shape[0]) * a0[fired]
+                rxns = np.minimum(
+                    (cum <= u[:, None]).sum(axis=1), self.simulator.n_reactions - 1
+                )
+                x[fired] += self._stoich_rows[rxns].toarray()
+        # leaps, rejected if a species would go negative
+        ind = np.nonzero(~exact)[0]
+        while ind.shape[0] > 0:
+            counts = rng.poisson(a[ind] * tau[ind, None]).astype(np.float64)
+            new_x = x[ind] + self._changes(counts)
+            ok = ~(new_x < 0).any(axis=1)
+            acc = ind[ok]
+            x[acc] = new_x[ok]
+            reached = tau[acc] >= remaining[acc]
+            t[acc] = np.where(reached, t_next, t[acc] + tau[acc])
+            ind = ind[~ok]
+            tau[ind] /= 2.0
+
+    def _run(self, n_replicates, timepoints, record):
+        model = self.simulator
+        x = np.tile(np.rint(self.species_init), (n_replicates, 1))
+        t = np.full(n_replicates, timepoints[0], dtype=np.float64)
+        record(0, x)
+        for itpt in range(1, timepoints.shape[0]):
+            t_next = timepoints[itpt]
+            active = np.nonzero(t < t_next)[0]
+            while active.shape[0] > 0:
+                x_act, t_act = x[active], t[active]
+                if model.n_reactions == 0:
+                    t_act[:] = t_next
+                else:
+                    self._step(x_act, t_act, t_next)
+                x[active], t[active] = x_act, t_act
+                active = active[t_act < t_next]
+            record(itpt, x)
+
+    def simulate(self, t_start=0, t_end=10, n_steps=10, named=True):
+        timepoints = self.make_timepoints(t_start, t_end, n_steps)
+        species = np.empty((timepoints.shape[0], self.simulator.n_species))
+
+        def record(itpt, x):
+            species[itpt] = x[0]
+
+        self._run(1, timepoints, record)
+        return self._results(timepoints, species, named=named)
+
+    def simulate_ensemble(
+        self, n_replicates, t_start=0, t_end=10, n_steps=10, summary=False
+    ):
+        model = self.simulator
+        timepoints = self.make_timepoints(t_start, t_end, n_steps)
+        n_tpts = timepoints.shape[0]
+        n_obs = len(model.obs_names)
+        if summary:
+            mean = np.empty((n_obs, n_tpts))
+            var = np.empty((n_obs, n_tpts))
+
+            def record(itpt, x):
+                obs = model.observables(x)
+                mean[:, itpt] = obs.mean(axis=0)
+                var[:, itpt] = obs.var(axis=0, ddof=1 if n_replicates > 1 else 0)
+
+            self._run(n_replicates, timepoints, record)
+            return (timepoints, mean, var)
+        obs_all = np.empty((n_replicates, n_obs, n_tpts))
+        spcs_all = np.empty((n_replicates, model.n_species, n_tpts))
+
+        def record(itpt, x):
+            spcs_all[:, :, itpt] = x
+            obs_all[:, :, itpt] = model.observables(x)
+
+        self._run(n_replicates, timepoints, record)
+        return (timepoints, obs_all, spcs_all)
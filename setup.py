@@ -188,6 +188,7 @@ setup(
         "cement",
         "nbopen",
         "numpy",
+        "scipy",
         "pyyaml",
         "colorlog",
         "xmltodict",
@@ -200,4 +201,8 @@ setup(
         "pylru",
         "pyparsing",
     ],
+    extras_require={
+        # BNGResultStore
+        "hdf5": ["h5py"],
+    },
 )
@@ -0,0 +1,86 @@
+/*
+ * Small stand-in for the <model>_cvode_py.c file BNG2.pl writes with
+ * writeCPYfile, used to test the ctypes wrapper without CVODE. It has
+ * the same simulate/free_result interface and RESULT struct. Species
+ * decay exponentially, S_i(t) = S_i(0) * exp(-k * t) with k the first
+ * parameter, observable Total is the sum of the species and observable
+ * Scaled is the second parameter times the first species.
+ * live_results returns the number of results that weren't freed yet.
+ */
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <math.h>
+
+typedef struct {
+    int status;
+    int n_observables;
+    int n_species;
+    int n_tpts;
+    int obs_name_len;
+    int spcs_name_len;
+    double *observables;
+    double *species;
+    char *obs_names;
+    char *spcs_names;
+} RESULT;
+
+static int n_live = 0;
+
+int live_results(void)
+{
+    return n_live;
+}
+
+static char *copy_str(const char *s, int *len)
+{
+    char *out;
+    *len = (int)strlen(s) + 1;
+    out = (char *)malloc(*len);
+    memcpy(out, s, *len);
+    return out;
+}
+
+RESULT *simulate(int n_tpts, double *tpts, int n_species, double *species_init,
+                 int n_params, double *params)
+{
+    int i, j;
+    char name[32];
+    char *spcs_names;
+    RESULT *res = (RESULT *)malloc(sizeof(RESULT));
+    __sync_fetch_and_add(&n_live, 1);
+    res->status = 0;
+    res->n_observables = 2;
+    res->n_species = n_species;
+    res->n_tpts = n_tpts;
+    res->observables = (double *)calloc(2 * n_tpts, sizeof(double));
+    res->species = (double *)malloc(n_species * n_tpts * sizeof(double));
+    for (i = 0; i < n_species; i++) {
+        for (j = 0; j < n_tpts; j++) {
+            double v = species_init[i] * exp(-params[0] * tpts[j]);
+            res->species[i * n_tpts + j] = v;
+            res->observables[j] += v;
+            if (i == 0)
+                res->observables[n_tpts + j] = params[1] * v;
+        }
+    }
+    res->obs_names = copy_str("Total/Scaled/", &res->obs_name_len);
+    spcs_names = (char *)calloc(n_species * 32 + 1, 1);
+    for (i = 0; i < n_species; i++) {
+        sprintf(name, "S%d()/", i);
+        strcat(spcs_names, name);
+    }
+    res->spcs_names = copy_str(spcs_names, &res->spcs_name_len);
+    free(spcs_names);
+    return res;
+}
+
+void free_result(RESULT *res)
+{
+    free(res->observables);
+    free(res->species);
+    free(res->obs_names);
+    free(res->spcs_names);
+    free(res);
+    __sync_fetch_and_sub(&n_live, 1);
+}
@@ -51,3 +51,208 @@ def test_bionetgen_info():
     with BioNetGenTest(argv=argv) as app:
         app.run()
         assert app.exit_code == 0
+
+
+def test_bionetgen_cache(tmp):
+    from bionetgen.core.utils.cache import BNGCache
+
+    # each entry is ~1KB, limit to 2.5KB
+    cache = BNGCache(os.path.join(tmp.dir, "xml"), max_size=2.5 / 1024)
+    keys = [cache.make_key("model", i) for i in range(3)]
+    assert len(set(keys)) == 3
+    assert cache.make_key("ab", "c") != cache.make_key("a", "bc")
+    assert cache.get(keys[0]) is None
+    for key in keys[:2]:
+        cache.put(key, "x" * 1024)
+    assert cache.get(keys[0]) == "x" * 1024
+    # make sure the first entry is the most recently used one
+    os.utime(cache._entry_path(keys[1]), (0, 0))
+    cache.put(keys[2], "y" * 1024)
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.stats()["entries"] == 2
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+
+
+def test_bionetgen_cache_cmd():
+    # tests cache subcommand
+    argv = ["cache", "stats"]
+    with BioNetGenTest(argv=argv) as app:
+        app.run()
+        assert app.exit_code == 0
+
+
+def test_bionetgen_bngexec_check(tmp, monkeypatch):
+    from bionetgen.core import config
+    from bionetgen.core.utils import utils
+
+    bngexec = os.path.join(tmp.dir, "BNG2.pl")
+    stamp_file = os.path.join(tmp.dir, "stamps.json")
+    with open(bngexec, "w") as f:
+        f.write("exit 0;\n")
+    assert utils.check_bngexec(bngexec, stamp_file=stamp_file)
+    assert os.path.isfile(stamp_file)
+    # a broken script with the same size and modification time
+    # should still pass, BNG2.pl shouldn't be ran again
+    st = os.stat(bngexec)
+    with open(bngexec, "w") as f:
+        f.write("exit 1;\n")
+    os.utime(bngexec, ns=(st.st_atime_ns, st.st_mtime_ns))
+    utils._bngexec_checks.clear()
+    assert utils.check_bngexec(bngexec, stamp_file=stamp_file)
+    # once it changes it gets tested again
+    os.utime(bngexec, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert not utils.check_bngexec(bngexec, stamp_file=stamp_file)
+    # failures aren't remembered, the next call runs it again
+    with open(bngexec, "w") as f:
+        f.write("exit 0;\n")
+    os.utime(bngexec, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert utils.check_bngexec(bngexec, stamp_file=stamp_file)
+    assert not utils.check_bngexec(os.path.join(tmp.dir, "missing.pl"))
+    # the default stamp file is in the configured cache folder
+    cache_dir = os.path.join(tmp.dir, "cache")
+    monkeypatch.setattr(config, "get_conf", lambda: {"cache_dir": cache_dir})
+    with open(bngexec, "w") as f:
+        f.write("exit 0; # changed\n")
+    assert utils.check_bngexec(bngexec)
+    assert os.path.isfile(os.path.join(cache_dir, "bngexec.json"))
+
+
+def test_bionetgen_lazy_imports():
+    # importing the library shouldn't pull in heavy dependencies,
+    # they should only be loaded once they are used. This runs in
+    # a new interpreter since this one already has everything loaded
+    import subprocess, sys, json
+
+    heavy = ["numpy", "pyparsing", "xmltodict", "cement", "distutils"]
+    code = (
+        "import sys, json, time\n"
+        "start = time.perf_counter()\n"
+        "import bionetgen\n"
+        "lazy = time.perf_counter() - start\n"
+        f"loaded = [m for m in {heavy} if m in sys.modules]\n"
+        "start = time.perf_counter()\n"
+        "import numpy, pyparsing, xmltodict, cement\n"
+        "eager = time.perf_counter() - start\n"
+        "print(json.dumps([loaded, lazy, eager]))\n"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(tfold),
+        capture_output=True,
+        check=True,
+    )
+    loaded, lazy, eager = json.loads(out.stdout.decode().strip().splitlines()[-1])
+    assert loaded == []
+    # loose check, the lazy import should be well under the time
+    # it takes to load the dependencies it defers
+    assert lazy < eager
+    # the library API is still there on first use
+    assert callable(bng.run)
+    assert callable(bng.bngmodel)
+
+
+def test_bionetgen_run_command(tmp):
+    import subprocess
+    from bionetgen.core.utils.utils import run_command
+
+    log_file = os.path.join(tmp.dir, "run.log")
+    command = ["perl", "-e", "print qq{line $_\\n} for 1..100; exit 2"]
+    rc, out = run_command(command, log_file=log_file, max_lines=10)
+    assert rc == 2
+    # only the last lines are kept
+    assert out == [f"line {i}" for i in range(91, 101)]
+    # but all of them are in the log file
+    with open(log_file, "r") as f:
+        assert len(f.readlines()) == 100
+    # streaming output and a timeout together
+    command = ["perl", "-e", "$| = 1; print qq{started\\n}; sleep 30"]
+    with raises(subprocess.TimeoutExpired) as e:
+        run_command(command, suppress=False, timeout=1)
+    assert "started" in e.value.output
+
+
+def test_bionetgen_worker_pool(tmp):
+    import subprocess, threading, time, pytest
+    from bionetgen.core.utils import workers
+    from bionetgen.core.utils.utils import run_command
+
+    if os.name == "nt":
+        pytest.skip("BNG2.pl workers are not supported on Windows")
+    # stand-in for BNG2.pl
+    bngexec = os.path.join(tmp.dir, "BNG2.pl")
+    with open(bngexec, "w") as f:
+        f.write(
+            "$| = 1;\n"
+            "print qq{start $ENV{BNG_TEST}\\n};\n"
+            "sleep($ARGV[0]) if @ARGV;\n"
+            "print qq{done\\n};\n"
+            "exit 3;\n"
+        )
+    env = dict(os.environ, BNG_TEST="from env")
+    log_file = os.path.join(tmp.dir, "run.log")
+    pool = workers.start_workers(workers=1, BNGPATH=tmp.dir)
+    try:
+        # the environment of the command is used
+        rc, out = run_command(["perl", bngexec], env=env, log_file=log_file)
+        assert rc == 3 and out == ["start from env", "done"]
+        worker = pool._idle[0]
+        # the log file is written while the command runs
+        thread = threading.Thread(
+            target=run_command,
+            args=(["perl", bngexec, "2"],),
+            kwargs={"env": env, "log_file": log_file},
+        )
+        thread.start()
+        deadline = time.time() + 1.5
+        while time.time() < deadline:
+            with open(log_file) as f:
+                if f.read() == "start from env\n":
+                    break
+            time.sleep(0.05)
+        assert thread.is_alive()
+        thread.join()
+        with open(log_file) as f:
+            assert f.read() == "start from env\ndone\n"
+        # a timeout only stops the command, not the worker
+        with raises(subprocess.TimeoutExpired) as e:
+            run_command(["perl", bngexec, "30"], env=env, timeout=1)
+        assert e.value.output == "start from env"
+        assert pool._idle == [worker] and worker.alive
+        assert run_command(["perl", bngexec], env=env)[0] == 3
+    finally:
+        workers.stop_workers()
+    assert workers.get_worker_pool(["perl", bngexec]) is None
+
+
+def test_bionetgen_sbml_cache(tmp, monkeypatch):
+    from io import StringIO
+    from bionetgen.core.utils.cache import BNGCache
+    from bionetgen.modelapi import bngfile
+
+    calls = []
+
+    def fake_run_command(command, suppress=True, cwd=None):
+        calls.append(command)
+        with open(os.path.join(cwd, "temp_sbml.xml"), "w") as f:
+            f.write(f"<sbml>{len(calls)}</sbml>")
+        return 0, None
+
+    monkeypatch.setattr(bngfile, "run_command", fake_run_command)
+    bfile = bngfile.BNGFile.__new__(bngfile.BNGFile)
+    bfile.bngexec = "BNG2.pl"
+    bfile.suppress = True
+    bfile.xml_cache = BNGCache(os.path.join(tmp.dir, "xml"))
+    # the second call for the same model string doesn't run BNG2.pl
+    for _ in range(2):
+        sbml = StringIO()
+        assert bfile.write_xml(sbml, xml_type="sbml", bngl_str="begin model")
+        assert sbml.read() == "<sbml>1</sbml>"
+    assert len(calls) == 1
+    sbml = StringIO()
+    assert bfile.write_xml(sbml, xml_type="sbml", bngl_str="begin model\n")
+    assert sbml.read() == "<sbml>2</sbml>"
+    bfile.xml_cache = None
+    assert bfile.write_xml(StringIO(), xml_type="sbml", bngl_str="begin model")
+    assert len(calls) == 3
@@ -1,4 +1,5 @@
 import os, glob
+import pytest
 from pytest import raises
 import bionetgen as bng
 from bionetgen.main import BioNetGenTest
@@ -119,6 +120,77 @@ def test_model_running_lib():
     assert fails == 0
 
 
+def test_model_running_batch(tmp):
+    # test running a list of models with a process pool
+    mpattern = os.path.join(tfold, "models") + os.sep + "*.bngl"
+    models = sorted(glob.glob(mpattern))[:8]
+    done = []
+    results = bng.run_batch(
+        models,
+        tmp.dir,
+        workers=2,
+        progress=lambda n_done, n_total, ind, res: done.append(ind),
+    )
+    assert len(results) == len(models)
+    assert sorted(done) == list(range(len(models)))
+    fails = [m for m, r in zip(models, results) if isinstance(r, Exception)]
+    print("fail: {}".format(fails))
+    assert len(fails) == 0
+
+
+def test_model_running_threads(tmp):
+    # runs and model loading shouldn't touch the working
+    # directory, so they can be driven from threads
+    from concurrent.futures import ThreadPoolExecutor
+
+    fpath = os.path.abspath(os.path.join(tfold, "test.bngl"))
+    cur_dir = os.getcwd()
+    outs = [os.path.join(tmp.dir, f"run_{i}") for i in range(4)]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda out: bng.run(fpath, out=out), outs))
+        models = list(executor.map(lambda _: bng.bngmodel(fpath), range(4)))
+    assert os.getcwd() == cur_dir
+    assert all(["test" in res.gdats for res in results])
+    assert all([len(m.parameters) > 0 for m in models])
+
+
+def test_model_running_workers(tmp):
+    # runs and model loading should give the same
+    # results when BNG2.pl calls go through workers
+    fpath = os.path.abspath(os.path.join(tfold, "test.bngl"))
+    pool = bng.start_workers(workers=2)
+    try:
+        model = bng.bngmodel(fpath)
+        result = bng.run(fpath, out=os.path.join(tmp.dir, "workers"))
+        assert len(pool._idle) > 0
+    finally:
+        bng.stop_workers()
+    assert len(model.parameters) > 0
+    assert "test" in result.gdats
+    assert bng.core.utils.workers.get_worker_pool(["perl", pool.bngexec]) is None
+
+
+def test_model_running_async(tmp):
+    import asyncio, subprocess
+
+    fpath = os.path.abspath(os.path.join(tfold, "test.bngl"))
+
+    async def run_all():
+        result = await bng.arun(fpath, out=os.path.join(tmp.dir, "arun"))
+        lines = [
+            line
+            async for line in bng.astream(fpath, out=os.path.join(tmp.dir, "astream"))
+        ]
+        with raises(subprocess.TimeoutExpired):
+            await bng.arun(fpath, timeout=1e-3)
+        return result, lines
+
+    result, lines = asyncio.run(run_all())
+    assert "test" in result.gdats
+    assert len(lines) > 0
+    assert os.path.isfile(os.path.join(tmp.dir, "astream", "test.gdat"))
+
+
 def test_setup_simulator():
     fpath = os.path.join(tfold, "test.bngl")
     fpath = os.path.abspath(fpath)
@@ -129,3 +201,143 @@ def test_setup_simulator():
     except:
         res = None
     assert res is not None
+
+
+def test_model_scan(tmp):
+    import numpy as np
+    from bionetgen.simulator.scipysimulator import ScipySimulator
+
+    net_file = os.path.join(tfold, "networks", "simple.net")
+    values = np.logspace(-1, 1, 6)
+    scan = bng.scan(net_file, "kf", values, backend="scipy", t_end=5, workers=2)
+    assert scan.dtype.names == ("kf", "Atot", "Btot", "Ctot", "Cdouble")
+    assert np.allclose(scan["kf"], values)
+    sim = ScipySimulator(net_file)
+    for ipoint, value in enumerate(values):
+        sim.set_param("kf", value)
+        _, obs, _ = sim.simulate(0, 5, 10)
+        for name in ["Atot", "Ctot", "Cdouble"]:
+            assert np.isclose(scan[name][ipoint], obs[name][-1], rtol=1e-5)
+    # interrupt the scan after 3 points, it's picked up from the checkpoint
+    checkpoint = os.path.join(tmp.dir, "kf_scan.npz")
+
+    def interrupt(n_done, n_total, ipoint, row):
+        if n_done == 3:
+            raise KeyboardInterrupt
+
+    with raises(KeyboardInterrupt):
+        bng.scan(
+            net_file,
+            "kf",
+            values,
+            backend="scipy",
+            t_end=5,
+            workers=1,
+            checkpoint=checkpoint,
+            progress=interrupt,
+        )
+    done = []
+    resumed = bng.scan(
+        net_file,
+        "kf",
+        values,
+        backend="scipy",
+        t_end=5,
+        workers=1,
+        checkpoint=checkpoint,
+        progress=lambda n_done, n_total, ipoint, row: done.append(ipoint),
+    )
+    assert done == [3, 4, 5]
+    assert np.allclose(resumed["Ctot"], scan["Ctot"], rtol=1e-8)
+    with raises(ValueError):
+        bng.scan(net_file, "kf", values[:3], backend="scipy", checkpoint=checkpoint)
+    # nothing to scan
+    with raises(ValueError, match="No values of kf"):
+        bng.scan(net_file, "kf", [], backend="scipy")
+
+
+def test_model_sensitivity():
+    import numpy as np
+
+    net_file = os.path.join(tfold, "networks", "decay.net")
+    kwargs = {"backend": "scipy", "t_end": 2, "n_steps": 4}
+    sens = bng.sensitivity(net_file, ["kd", "A0", "kdim"], **kwargs)
+    assert sens.shape == (3, 5, 2)
+    # A = A0*exp(-kd*t) and B = B0/(1 + 2*kdim*B0*t)
+    tpts = np.linspace(0, 2, 5)
+    A = 20 * np.exp(-0.5 * tpts)
+    assert np.allclose(sens[0, :, 0], -tpts * A, rtol=1e-4, atol=1e-6)
+    assert np.allclose(sens[1, :, 0], A / 20, rtol=1e-4, atol=1e-6)
+    dB = -2 * 9 * tpts / (1 + 6 * tpts) ** 2
+    assert np.allclose(sens[2, :, 1], dB, rtol=1e-3, atol=1e-6)
+    assert np.allclose(sens[0, :, 1], 0) and np.allclose(sens[2, :, 0], 0)
+    forward = bng.sensitivity(
+        net_file, ["kd"], ["Atot"], method="forward", workers=1, **kwargs
+    )
+    assert forward.shape == (1, 5, 1)
+    assert np.allclose(forward[0, :, 0], sens[0, :, 0], rtol=1e-2, atol=1e-6)
+    rel = bng.sensitivity(
+        net_file, ["kd", "A0"], ["Atot"], normalize=True, workers=1, **kwargs
+    )
+    assert np.allclose(rel[0, :, 0], -0.5 * tpts, atol=1e-4)
+    assert np.allclose(rel[1, :, 0], 1, atol=1e-4)
+    with raises(KeyError):
+        bng.sensitivity(net_file, ["kx"], workers=1, **kwargs)
+    with raises(KeyError):
+        bng.sensitivity(net_file, ["kd"], ["Ctot"], workers=1, **kwargs)
+
+
+def make_dimer_model():
+    # bngmodel of tests/networks/dimer_sbml.xml, the SBML is handed
+    # out by write_xml instead of being written by BNG2.pl
+    from types import SimpleNamespace
+
+    sbml_file = os.path.join(tfold, "networks", "dimer_sbml.xml")
+    with open(sbml_file, "r") as f:
+        sbml = f.read()
+
+    def write_xml(open_file, xml_type="bngxml", bngl_str=None):
+        open_file.write(sbml)
+        open_file.seek(0)
+        return True
+
+    model = bng.bngmodel.__new__(bng.bngmodel)
+    model.active_blocks = []
+    model._block_order = ["observables", "actions"]
+    model.model_name = "dimer"
+    model.model_path = sbml_file
+    for block in model._block_order:
+        model.add_empty_block(block)
+    model.observables.add_observable("Atot", "Molecules")
+    model.observables.add_observable("AB", "Molecules")
+    model.bngparser = SimpleNamespace(bngfile=SimpleNamespace(write_xml=write_xml))
+    return model, sbml
+
+
+def test_model_librr_observables():
+    import numpy as np
+
+    roadrunner = pytest.importorskip("roadrunner")
+    model, sbml = make_dimer_model()
+    # the columns are the observables of the model
+    values = [0.05, 0.1, 0.2]
+    scan = bng.scan(model, "kf", values, backend="libRR", t_end=5, workers=2)
+    assert scan.dtype.names == ("kf", "Atot", "AB")
+    rr = roadrunner.RoadRunner(sbml)
+    rr.timeCourseSelections = ["time", "Atot", "AB"]
+    for ipoint, value in enumerate(values):
+        rr.resetAll()
+        rr.setValue("kf", value)
+        ref = rr.simulate(0, 5, 11)
+        assert np.isclose(scan["Atot"][ipoint], ref[-1, 1])
+        assert np.isclose(scan["AB"][ipoint], ref[-1, 2], rtol=1e-5)
+    # Atot is conserved, AB goes up with kf
+    sens = bng.sensitivity(
+        model, ["kf", "kr"], ["AB", "Atot"], t_end=5, n_steps=5, workers=1
+    )
+    assert sens.shape == (2, 6, 2)
+    assert np.allclose(sens[:, :, 1], 0, atol=1e-5)
+    assert (sens[0, 1:, 0] > 0).all() and (sens[1, 1:, 0] < 0).all()
+    # species aren't columns of the libRR backend
+    with raises(KeyError):
+        bng.sensitivity(model, ["kf"], ["[S3]"], workers=1)
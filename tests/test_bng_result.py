@@ -0,0 +1,367 @@
+import os, time, pickle
+import pytest
+import numpy as np
+from bionetgen.core.tools import BNGResult
+from bionetgen.core.utils import datreader
+
+
+def write_dat(fpath, names, data):
+    # same layout BNG2.pl uses for gdat/cdat files
+    with open(fpath, "w") as f:
+        f.write("#" + "".join([f"{n:>20}" for n in names]) + "\n")
+        for row in data:
+            f.write("".join([f" {v:19.12e}" for v in row]) + "\n")
+
+
+def make_data(nrows, ncols, seed=0):
+    rng = np.random.default_rng(seed)
+    data = rng.normal(scale=1e3, size=(nrows, ncols))
+    data[:, 0] = np.linspace(0, 100, nrows)
+    names = ["time"] + [f"S{i}" for i in range(1, ncols)]
+    return names, data
+
+
+def test_result_dat_reader(tmp):
+    names, data = make_data(50, 6)
+    data[3, 2] = np.nan
+    data[4, 3] = -np.inf
+    data[5, 4] = 1.5e-300
+    fpath = os.path.join(tmp.dir, "model.gdat")
+    write_dat(fpath, names, data)
+    ref = np.loadtxt(fpath, dtype={"names": names, "formats": ["f8"] * len(names)})
+    # plain array and column index
+    arr, columns = datreader.read_dat(fpath)
+    assert arr.shape == (50, 6) and arr.dtype == np.float64
+    assert list(columns.keys()) == names
+    for name in names:
+        assert np.array_equal(arr[:, columns[name]], ref[name], equal_nan=True)
+    # fromstring route used on older numpy versions
+    fast_loadtxt = datreader._c_loadtxt
+    try:
+        datreader._c_loadtxt = False
+        arr2, _ = datreader.read_dat(fpath)
+    finally:
+        datreader._c_loadtxt = fast_loadtxt
+    assert np.array_equal(arr, arr2, equal_nan=True)
+    # the record array is a view of the same data
+    res = BNGResult(direct_path=fpath)
+    rec = res["model"]
+    assert isinstance(rec, np.recarray)
+    assert rec.dtype.names == tuple(names)
+    assert np.array_equal(rec["S1"], ref["S1"])
+    data_arr, _ = res.load_array(fpath)
+    assert np.array_equal(data_arr, arr, equal_nan=True)
+    assert np.shares_memory(datreader.as_recarray(arr, names), arr)
+
+
+def test_result_dat_reader_loadtxt(tmp):
+    # same values as the old structured loadtxt route
+    names, data = make_data(2000, 200)
+    fpath = os.path.join(tmp.dir, "model.cdat")
+    write_dat(fpath, names, data)
+    dtype = {"names": names, "formats": ["f8"] * len(names)}
+    ref = np.rec.array(np.loadtxt(fpath, dtype=dtype))
+    arr, columns = datreader.read_dat(fpath)
+    assert arr.shape == (2000, 200)
+    for name in names:
+        assert np.array_equal(arr[:, columns[name]], ref[name])
+    with open(fpath, "rb") as f:
+        f.readline()
+        body = f.read()
+    assert np.array_equal(datreader.parse_rows(body, len(names)), arr)
+
+
+@pytest.mark.skipif(
+    not os.environ.get("BNG_BENCHMARK"), reason="set BNG_BENCHMARK=1 to run"
+)
+def test_result_dat_reader_benchmark(tmp):
+    # parse rates of the readers, e.g.
+    #     BNG_BENCHMARK=1 pytest -s tests/test_bng_result.py -k benchmark
+    # the text reader is numpy.loadtxt and isn't faster than the old
+    # structured loadtxt, only the binary sidecar avoids parsing
+    names, data = make_data(20000, 200)
+    fpath = os.path.join(tmp.dir, "model.cdat")
+    write_dat(fpath, names, data)
+    dtype = {"names": names, "formats": ["f8"] * len(names)}
+    datreader.read_dat(fpath, sidecar=True)
+
+    def best(func, repeat=3):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    readers = {
+        "structured loadtxt": lambda: np.loadtxt(fpath, dtype=dtype),
+        "read_dat": lambda: datreader.read_dat(fpath),
+        "read_dat sidecar": lambda: datreader.read_dat(fpath, sidecar=True),
+    }
+    for name, func in readers.items():
+        took = best(func)
+        print(f"{name:>20}: {data.size / took / 1e6:8.2f} M values/s")
+    arr, _ = datreader.read_dat(fpath)
+    assert np.array_equal(arr, datreader.read_dat(fpath, sidecar=True)[0])
+
+
+def test_result_sidecar(tmp):
+    names, data = make_data(20, 4)
+    fpath = os.path.join(tmp.dir, "model.cdat")
+    write_dat(fpath, names, data)
+    ref, _ = datreader.read_dat(fpath)
+    npy_path, json_path = datreader.sidecar_paths(fpath)
+    res = BNGResult(direct_path=fpath, sidecar=True)
+    res["model"]
+    assert os.path.isfile(npy_path) and os.path.isfile(json_path)
+    # second load maps the sidecar instead of parsing
+    arr, columns = res.load_array(fpath)
+    assert isinstance(arr, np.memmap)
+    assert np.array_equal(arr, ref)
+    assert np.array_equal(res.load(fpath)["S2"], ref[:, 2])
+    # a changed text file makes the sidecar outdated, the mtime is
+    # moved so the change shows on coarse filesystem timestamps
+    write_dat(fpath, names, data * 2)
+    st = os.stat(fpath)
+    os.utime(fpath, ns=(st.st_atime_ns, st.st_mtime_ns - 10**9))
+    arr, columns = res.load_array(fpath)
+    assert not isinstance(arr, np.memmap)
+    assert np.allclose(arr[:, 1], data[:, 1] * 2)
+    arr, columns = res.load_array(fpath)
+    assert isinstance(arr, np.memmap)
+
+
+def test_result_lazy_loading(tmp):
+    names, data = make_data(10, 3)
+    for fname in ["a.gdat", "b.gdat", "a.cdat", "a.scan"]:
+        write_dat(os.path.join(tmp.dir, fname), names, data)
+    calls = []
+
+    class CountingResult(BNGResult):
+        def load(self, fpath):
+            calls.append(os.path.basename(fpath))
+            return super().load(fpath)
+
+    # nothing is parsed until it's accessed
+    res = CountingResult(path=tmp.dir, max_loaded=1)
+    assert calls == []
+    assert sorted(res.gdats.keys()) == ["a", "b"]
+    assert "a" in res.cdats and "a" in res.scans
+    assert not res.gdats.is_loaded("a")
+    assert np.array_equal(res["a"]["S1"], res.gdats["a"]["S1"])
+    assert calls == ["a.gdat"]
+    # only one parsed file is kept
+    res["b"]
+    res["a"]
+    assert calls == ["a.gdat", "b.gdat", "a.gdat"]
+    assert not res.gdats.is_loaded("b")
+    # loading everything keeps all of them
+    res.load_results()
+    assert all([res.gdats.is_loaded(n) for n in res.gdats])
+    assert res.cdats.is_loaded("a") and res.scans.is_loaded("a")
+    n_calls = len(calls)
+    res["b"], res.cdats["a"]
+    assert len(calls) == n_calls
+    # results survive pickling, e.g. from run_batch workers
+    res2 = pickle.loads(pickle.dumps(BNGResult(path=tmp.dir)))
+    assert np.array_equal(res2["b"]["time"], res["b"]["time"])
+
+
+def test_result_selection(tmp):
+    names, data = make_data(101, 8)
+    fpath = os.path.join(tmp.dir, "model.cdat")
+    write_dat(fpath, names, data)
+    full, columns = datreader.read_dat(fpath)
+    res = BNGResult(sidecar=False)
+    # columns come back in the order they are asked for
+    rec = res.load(fpath, columns=["S5", "time"])
+    assert rec.dtype.names == ("S5", "time")
+    assert np.array_equal(rec["S5"], full[:, 5])
+    # time window and stride, across chunk boundaries
+    times = full[:, 0]
+    rows = np.nonzero((times >= 10) & (times <= 60))[0][::3]
+    for chunk_rows in [7, 10000]:
+        arr, cols = datreader.read_dat_selection(
+            fpath,
+            columns=["S2", "S7"],
+            t_range=(10, 60),
+            stride=3,
+            chunk_rows=chunk_rows,
+        )
+        assert list(cols.keys()) == ["S2", "S7"]
+        assert np.array_equal(arr, full[np.ix_(rows, [2, 7])])
+    rec = res.load(fpath, t_range=(None, 5))
+    assert rec.dtype.names == tuple(names)
+    assert np.array_equal(rec["S1"], full[times <= 5, 1])
+    assert res.load(fpath, t_range=(1000, None)).shape == (0,)
+    # the same selection from the binary sidecar
+    datreader.read_dat(fpath, sidecar=True)
+    arr, _ = datreader.read_dat_selection(
+        fpath, columns=["S2", "S7"], t_range=(10, 60), stride=3, sidecar=True
+    )
+    assert not isinstance(arr, np.memmap)
+    assert np.array_equal(arr, full[np.ix_(rows, [2, 7])])
+    try:
+        res.load(fpath, columns=["nope"])
+        assert False, "unknown column should raise"
+    except ValueError:
+        pass
+
+
+def test_result_iter_chunks(tmp):
+    names, data = make_data(95, 5)
+    res = BNGResult(sidecar=False)
+    for ext in ["gdat", "scan"]:
+        fpath = os.path.join(tmp.dir, f"model.{ext}")
+        write_dat(fpath, names, data)
+        full, _ = datreader.read_dat(fpath)
+        chunks = list(res.iter_chunks(fpath, rows=10))
+        assert len(chunks) == 10
+        assert all([times.shape[0] <= 10 for times, _ in chunks])
+        times = np.concatenate([t for t, _ in chunks])
+        block = np.concatenate([b for _, b in chunks])
+        assert np.array_equal(times, full[:, 0])
+        assert np.array_equal(block, full[:, 1:])
+    # running statistics over selected columns
+    total = np.zeros(2)
+    for times, block in res.iter_chunks(fpath, rows=7, columns=["S3", "S1"]):
+        assert block.shape[1] == 2
+        total += block.sum(axis=0)
+    assert np.allclose(total, full[:, [3, 1]].sum(axis=0))
+
+
+def test_result_follow(tmp):
+    names, data = make_data(30, 3)
+    fpath = os.path.join(tmp.dir, "model.gdat")
+    write_dat(fpath + ".full", names, data)
+    with open(fpath + ".full", "rb") as f:
+        text = f.read()
+    full, _ = datreader.read_dat(fpath + ".full")
+    follower = BNGResult(sidecar=False).follow(fpath, interval=0.01)
+    # nothing there yet
+    assert follower.poll().shape[0] == 0
+    lines = text.splitlines(keepends=True)
+    with open(fpath, "wb") as f:
+        # header and one and a half rows
+        f.write(lines[0][:5])
+        f.flush()
+        assert follower.poll().shape[0] == 0
+        f.write(lines[0][5:] + lines[1] + lines[2][:10])
+        f.flush()
+        new = follower.poll()
+        assert follower.names == names
+        assert np.array_equal(new, full[:1])
+        f.write(b"".join([lines[2][10:]] + lines[3:11]))
+        f.flush()
+        assert np.array_equal(follower.poll(), full[1:10])
+        assert follower.poll().shape == (0, 3)
+    # a rewritten file is read from the top
+    write_dat(fpath, names, data[:5])
+    assert np.array_equal(follower.poll(), full[:5])
+    # also when it's rewritten in place and gets longer than before
+    inode = os.stat(fpath).st_ino
+    write_dat(fpath, names, data[1:12])
+    assert os.stat(fpath).st_ino == inode
+    assert np.array_equal(follower.poll(), full[1:12])
+    # same header and first row, the rows after it changed
+    write_dat(fpath, names, np.vstack([data[:1], data[6:16]]))
+    assert np.array_equal(follower.poll(), np.vstack([full[:1], full[6:16]]))
+    write_dat(fpath, names, data[:5])
+    assert np.array_equal(follower.poll(), full[:5])
+    # background polling with a callback that stops early
+    seen = []
+
+    def callback(new_rows, f):
+        seen.append(new_rows)
+        return f.rows_read >= 20
+
+    with open(fpath, "ab") as f:
+        follower.start(callback)
+        for line in lines[6:]:
+            f.write(line)
+            f.flush()
+            time.sleep(0.002)
+    deadline = time.time() + 5
+    while follower.rows_read < 20 and time.time() < deadline:
+        time.sleep(0.01)
+    follower.stop()
+    assert follower.error is None
+    got = np.concatenate(seen)
+    assert got.shape[0] >= 15
+    assert np.array_equal(got, full[5 : 5 + got.shape[0]])
+
+
+def _store_job(writer, folder, scale):
+    # runs in a worker process
+    writer.submit(BNGResult(path=folder), params={"scale": scale})
+
+
+def test_result_store(tmp):
+    pytest.importorskip("h5py")
+    from bionetgen.core.tools import BNGResultStore, BNGResultStoreWriter
+
+    names, data = make_data(20, 3)
+    folders = []
+    for irun, scale in enumerate([1.0, 2.0, 3.0]):
+        folder = os.path.join(tmp.dir, f"run_{irun}")
+        os.mkdir(folder)
+        scaled = data.copy()
+        scaled[:, 1:] *= scale
+        # later runs have more time points
+        write_dat(os.path.join(folder, "model.gdat"), names, scaled[: 10 + 5 * irun])
+        write_dat(os.path.join(folder, "model.cdat"), names, scaled)
+        folders.append(folder)
+    ref = [BNGResult(path=f) for f in folders]
+    store_path = os.path.join(tmp.dir, "store.h5")
+    with BNGResultStore(store_path) as store:
+        for irun, res in enumerate(ref):
+            assert store.append(res, params={"scale": irun + 1.0}) == irun
+        assert store.n_runs == 3 and store.labels == ["run_0", "run_1", "run_2"]
+        assert store.names() == ["model"] and store.names("cdat") == ["model"]
+        assert store.columns("model") == names
+        s1 = store.get("S1", "model")
+        assert s1.shape == (3, 20)
+        for irun in range(3):
+            n = ref[irun]["model"].shape[0]
+            assert np.array_equal(s1[irun, :n], ref[irun]["model"]["S1"])
+            assert np.isnan(s1[irun, n:]).all()
+        # one observable across runs at a time point
+        t = ref[0]["model"]["time"][4]
+        assert np.array_equal(store.get("S2", t=t), [r["model"]["S2"][4] for r in ref])
+        assert np.array_equal(
+            store.get("S2", kind="cdat", runs=[2, 0]),
+            [
+                ref[2].cdats["model"]["S2"],
+                ref[0].cdats["model"]["S2"],
+            ],
+        )
+        assert list(store.find_runs(scale=2.0)) == [1]
+    # concurrent workers through the writer process
+    from concurrent.futures import ProcessPoolExecutor
+
+    store_path = os.path.join(tmp.dir, "store2.h5")
+    with BNGResultStoreWriter(store_path) as writer:
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            futures = [
+                executor.submit(_store_job, writer, f, i + 1.0)
+                for i, f in enumerate(folders)
+            ]
+            [f.result() for f in futures]
+    with BNGResultStore(store_path, mode="r") as store:
+        assert store.n_runs == 3
+        for scale, irun in zip([1.0, 2.0, 3.0], range(3)):
+            run = store.find_runs(scale=scale)[0]
+            assert np.array_equal(
+                store.get("S1", kind="cdat", runs=[run])[0],
+                ref[irun].cdats["model"]["S1"],
+            )
+
+
+def test_result_store_needs_h5py(tmp, monkeypatch):
+    import sys
+    from bionetgen.core.tools import BNGResultStore
+
+    # h5py can't be imported
+    monkeypatch.setitem(sys.modules, "h5py", None)
+    with pytest.raises(ImportError, match=r"bionetgen\[hdf5\]"):
+        BNGResultStore(os.path.join(tmp.dir, "results.h5"))
@@ -0,0 +1,555 @@
+import os, gc, shutil, subprocess
+import numpy as np
+import pytest
+from types import SimpleNamespace
+from bionetgen.simulator.csimulator import CSimWrapper, CSimulator, build_shared_lib
+
+tfold = os.path.dirname(__file__)
+
+
+@pytest.fixture
+def csim_lib(tmp):
+    # stand-in for a compiled <model>_cvode_py library
+    cc = shutil.which("cc") or shutil.which("gcc")
+    if cc is None:
+        pytest.skip("no C compiler available")
+    lib_path = os.path.join(tmp.dir, "libcsim_fixture.so")
+    subprocess.run(
+        [
+            cc,
+            "-shared",
+            "-fPIC",
+            "-O2",
+            "-o",
+            lib_path,
+            os.path.join(tfold, "csim_fixture.c"),
+            "-lm",
+        ],
+        check=True,
+    )
+    return lib_path
+
+
+def expected(timepoints, params, spcs):
+    species = np.array(spcs)[None, :] * np.exp(-params[0] * timepoints)[:, None]
+    obs = np.stack([species.sum(axis=1), params[1] * species[:, 0]], axis=1)
+    return obs, species
+
+
+def test_csim_batch(csim_lib):
+    wrapper = CSimWrapper(csim_lib, num_params=2, num_spec_init=3)
+    wrapper.set_parameters([0.1, 2.0])
+    wrapper.set_species_init([1.0, 2.0, 3.0])
+    timepoints = np.linspace(0, 10, 21)
+    rng = np.random.default_rng(0)
+    params = rng.uniform(0.01, 1.0, size=(40, 2))
+    spcs = rng.uniform(1, 100, size=(40, 3))
+    for workers in [1, 4]:
+        tpts, obs, species = wrapper.simulate_batch(
+            params, spcs, timepoints, workers=workers
+        )
+        assert obs.shape == (40, 21, 2) and species.shape == (40, 21, 3)
+        assert wrapper.obs_names == ["Total", "Scaled"]
+        assert wrapper.spcs_names == ["S0()", "S1()", "S2()"]
+        for i in range(40):
+            obs_ref, spcs_ref = expected(timepoints, params[i], spcs[i])
+            assert np.allclose(obs[i], obs_ref)
+            assert np.allclose(species[i], spcs_ref)
+    # rows that aren't given come from the set values
+    _, obs, _ = wrapper.simulate_batch(params[:5], None, timepoints)
+    obs_ref, _ = expected(timepoints, params[3], [1.0, 2.0, 3.0])
+    assert obs.shape[0] == 5 and np.allclose(obs[3], obs_ref)
+    # same results as one simulate call
+    wrapper.set_parameters(params[7])
+    wrapper.set_species_init(spcs[7])
+    tpts, obs_rec, _ = wrapper.simulate(0, 10, 10)
+    _, obs, _ = wrapper.simulate_batch(params[7:8], spcs[7:8], tpts)
+    assert np.allclose(obs[0][:, 0], obs_rec["Total"])
+
+
+def test_csim_lib_cache(tmp):
+    ccompiler = pytest.importorskip("distutils.ccompiler")
+    if shutil.which("cc") is None:
+        pytest.skip("no C compiler available")
+    compiler = ccompiler.new_compiler()
+    compiled = []
+    compile_objects = compiler.compile
+
+    def counting_compile(*args, **kwargs):
+        compiled.append(args[0])
+        return compile_objects(*args, **kwargs)
+
+    compiler.compile = counting_compile
+    with open(os.path.join(tfold, "csim_fixture.c"), "r") as f:
+        c_source = f.read()
+    cache_dir = os.path.join(tmp.dir, "cpy")
+    lib_file = build_shared_lib(
+        c_source, "fixture_cvode_py", compiler, libraries=["m"], cache_dir=cache_dir
+    )
+    assert lib_file.startswith(cache_dir) and os.path.isfile(lib_file)
+    # nothing is left in the current folder or the build folder
+    assert not os.path.exists("fixture_cvode_py.o")
+    assert sorted(os.listdir(os.path.dirname(lib_file))) == [
+        "fixture_cvode_py.c",
+        os.path.basename(lib_file),
+    ]
+    # same source and compiler, no compilation
+    assert (
+        build_shared_lib(
+            c_source,
+            "fixture_cvode_py",
+            compiler,
+            libraries=["m"],
+            cache_dir=cache_dir,
+        )
+        == lib_file
+    )
+    assert len(compiled) == 1
+    # a changed source or compiler setup is a new library
+    lib2 = build_shared_lib(
+        c_source + "\n",
+        "fixture_cvode_py",
+        compiler,
+        libraries=["m"],
+        cache_dir=cache_dir,
+    )
+    compiler.add_include_dir(tmp.dir)
+    lib3 = build_shared_lib(
+        c_source, "fixture_cvode_py", compiler, libraries=["m"], cache_dir=cache_dir
+    )
+    assert len(set([lib_file, lib2, lib3])) == 3 and len(compiled) == 3
+    wrapper = CSimWrapper(lib3, num_params=2, num_spec_init=1)
+    wrapper.set_parameters([0.5, 1.0])
+    wrapper.set_species_init([2.0])
+    _, obs, _ = wrapper.simulate(0, 10, 10)
+    assert np.allclose(obs["Total"], 2.0 * np.exp(-0.5 * np.arange(11)))
+    # the cache is bounded, least recently used libraries go first
+    lib_dir = os.path.dirname(lib_file)
+    lib_size = sum(
+        [os.path.getsize(os.path.join(lib_dir, f)) for f in os.listdir(lib_dir)]
+    )
+    os.utime(os.path.dirname(lib2), (0, 0))
+    lib4 = build_shared_lib(
+        c_source + "\n\n",
+        "fixture_cvode_py",
+        compiler,
+        cache_dir,
+        libraries=["m"],
+        max_size=3.5 * lib_size / (1024 * 1024),
+    )
+    assert sorted(os.listdir(cache_dir)) == sorted(
+        [os.path.basename(os.path.dirname(lib)) for lib in [lib_file, lib3, lib4]]
+    )
+    # the new library is kept even if it doesn't fit
+    lib5 = build_shared_lib(
+        c_source, "fixture_cvode_py", compiler, cache_dir, max_size=1e-6
+    )
+    assert os.listdir(cache_dir) == [os.path.basename(os.path.dirname(lib5))]
+
+
+def test_csim_lib_tmp(tmp, monkeypatch):
+    ccompiler = pytest.importorskip("distutils.ccompiler")
+    if shutil.which("cc") is None:
+        pytest.skip("no C compiler available")
+    from bionetgen.simulator import csimulator
+
+    with open(os.path.join(tfold, "csim_fixture.c"), "r") as f:
+        c_source = f.read()
+    conf = {"cpy_cache": False, "cache_dir": os.path.join(tmp.dir, "cache")}
+    monkeypatch.setattr(csimulator, "get_conf", lambda: conf)
+    build = csimulator.build_shared_lib
+    # the fixture doesn't need CVODE
+    monkeypatch.setattr(
+        csimulator,
+        "build_shared_lib",
+        lambda *args, **kwargs: build(*args, **dict(kwargs, libraries=["m"])),
+    )
+
+    def make_sim():
+        sim = CSimulator.__new__(CSimulator)
+        sim.model = SimpleNamespace(model_name="fixture")
+        sim.compiler = ccompiler.new_compiler()
+        sim.get_c_source = lambda cache_dir=None: c_source
+        sim.compile_shared_lib()
+        assert os.path.isfile(sim.lib_file)
+        return sim, os.path.dirname(os.path.dirname(sim.lib_file))
+
+    # without the cache the library is in a folder of the simulator
+    sim, lib_dir = make_sim()
+    assert not os.path.exists(conf["cache_dir"])
+    sim.close()
+    assert not os.path.exists(lib_dir)
+    sim, lib_dir = make_sim()
+    del sim
+    gc.collect()
+    assert not os.path.exists(lib_dir)
+
+
+def test_csim_zero_copy(csim_lib):
+    wrapper = CSimWrapper(csim_lib, num_params=2, num_spec_init=3)
+    wrapper.set_parameters([0.2, 3.0])
+    wrapper.set_species_init([1.0, 2.0, 3.0])
+    live = wrapper.lib.live_results
+    tpts, obs_rec, spcs_rec = wrapper.simulate(0, 10, 10)
+    assert live() == 0
+    # plain arrays that use the C memory
+    tpts, obs, spcs = wrapper.simulate(0, 10, 10, named=False)
+    assert obs.shape == (2, 11) and spcs.shape == (3, 11)
+    assert obs.dtype == np.float64 and obs.flags["C_CONTIGUOUS"]
+    assert not obs.flags["OWNDATA"]
+    assert np.array_equal(obs[0], obs_rec["Total"])
+    assert np.array_equal(spcs[2], spcs_rec["S2()"])
+    assert live() == 1
+    # freed once both arrays are gone, views keep it alive
+    first_row = obs[0]
+    del obs, spcs
+    gc.collect()
+    assert live() == 1
+    assert np.array_equal(first_row, obs_rec["Total"])
+    del first_row
+    gc.collect()
+    assert live() == 0
+    # preallocated output buffers
+    obs_out = np.empty((2, 11))
+    spcs_out = np.empty((3, 11))
+    for k in [0.1, 0.5]:
+        wrapper.set_parameters([k, 3.0])
+        tpts2, obs, spcs = wrapper.simulate(0, 10, 10, out=(obs_out, spcs_out))
+        assert obs is obs_out and spcs is spcs_out and tpts2 is tpts
+        obs_ref, spcs_ref = expected(tpts, [k, 3.0], [1.0, 2.0, 3.0])
+        assert np.allclose(obs_out, obs_ref.T) and np.allclose(spcs_out, spcs_ref.T)
+    assert live() == 0
+
+
+def test_csim_setters(csim_lib):
+    # model with the parts CSimulator reads, a parameter that's an
+    # expression and a species initialized with a parameter
+    param = lambda expr, value: SimpleNamespace(expr=expr, value=value)
+    spc = lambda pattern, count: SimpleNamespace(pattern=pattern, count=count)
+    model = SimpleNamespace(
+        parameters={
+            "k": param("0.2", 0.2),
+            "_hidden": param("1", 1),
+            "k2": param("2*k", 0.4),
+            "scale": param("3", 3),
+            "A0": param("5", 5),
+        },
+        species={0: spc("A()", "A0"), 1: spc("B()", "2")},
+    )
+    sim = CSimulator.__new__(CSimulator)
+    sim.model = model
+    sim.simulator = csim_lib
+    assert sim.param_names == ["k", "scale", "A0"]
+    assert sim.species_names == ["A()", "B()"]
+    assert np.array_equal(sim.species_init, [5.0, 2.0])
+    tpts, obs, _ = sim.simulate(0, 10, 10)
+    obs_ref, _ = expected(tpts, [0.2, 3.0], [5.0, 2.0])
+    assert np.allclose(obs["Total"], obs_ref[:, 0])
+    # setters only touch the buffers the wrapper uses
+    sim.set_params({"k": 0.5, "scale": 2.0})
+    sim.set_init("B()", 4.0)
+    sim.set_init(0, 1.0)
+    assert sim.simulator.parameters is sim.param_values
+    _, obs, spcs = sim.simulate(0, 10, 10, named=False)
+    obs_ref, spcs_ref = expected(tpts, [0.5, 2.0], [1.0, 4.0])
+    assert np.allclose(obs, obs_ref.T) and np.allclose(spcs, spcs_ref.T)
+    with pytest.raises(KeyError):
+        sim.set_param("k2", 1.0)
+    with pytest.raises(KeyError):
+        sim.set_init("C()", 1.0)
+    # batches use the current values for what isn't given
+    _, obs, _ = sim.simulate_batch(species_init_matrix=[[1.0, 4.0], [2.0, 0.0]])
+    assert np.allclose(obs[0], obs_ref) and obs.shape == (2, 11, 2)
+
+
+def make_csim(csim_lib):
+    # CSimulator of a minimal model on the fixture library
+    param = lambda expr, value: SimpleNamespace(expr=expr, value=value)
+    spc = lambda pattern, count: SimpleNamespace(pattern=pattern, count=count)
+    model = SimpleNamespace(
+        parameters={"k": param("0.2", 0.2), "scale": param("3", 3)},
+        species={0: spc("A()", "5"), 1: spc("B()", "2")},
+    )
+    sim = CSimulator.__new__(CSimulator)
+    sim.model = model
+    sim.simulator = csim_lib
+    return sim
+
+
+def make_csim_runner(csim_lib):
+    # the cpy branch of BackendRunner without compiling a model
+    from bionetgen.simulator.backends import BackendRunner
+
+    runner = BackendRunner.__new__(BackendRunner)
+    runner.backend, runner.source, runner.extra = "cpy", None, None
+    runner.obs_names = None
+    runner._folder = None
+    runner.sim = make_csim(csim_lib)
+    runner._base_params = runner.sim.param_values.copy()
+    return runner
+
+
+def test_csim_backend_timepoints(csim_lib):
+    assert np.allclose(CSimWrapper.make_timepoints(0, 5, 10), np.linspace(0, 5, 11))
+    runner = make_csim_runner(csim_lib)
+    tpts, obs = runner.run({"k": 0.5}, 0, 5, 10)
+    # same time points as the other backends, the last one is t_end
+    assert tpts.shape == (11,) and tpts[-1] == 5.0
+    assert obs.shape == (11, 2) and runner.obs_names == ["Total", "Scaled"]
+    obs_ref, _ = expected(tpts, [0.5, 3.0], [5.0, 2.0])
+    assert np.allclose(obs, obs_ref)
+    # parameters that aren't given go back to the model values
+    _, obs = runner.run({}, 0, 5, 10)
+    assert np.allclose(obs, expected(tpts, [0.2, 3.0], [5.0, 2.0])[0])
+
+
+def simple_rhs(t, x, kf=1.0, kr=0.5, ksyn=2.0, kdeg=0.1):
+    # tests/networks/simple.net written out by hand
+    A, B, AB, src, C = x
+    bind = kf * A * B - kr * AB
+    dC = ksyn * src - kdeg * C - 2 * (0.5 * 2 * kf) * C * C
+    return [-bind, -bind, bind, 0.0, dC]
+
+
+def test_scipy_simulator():
+    from scipy.integrate import solve_ivp
+    from bionetgen.simulator import sim_getter
+    from bionetgen.simulator.networkmodel import NetworkModel
+
+    net_file = os.path.join(tfold, "networks", "simple.net")
+    model = NetworkModel(net_file)
+    assert model.species_names[3] == "$Src()" and model.fixed[3]
+    assert model.obs_names == ["Atot", "Btot", "Ctot", "Cdouble"]
+    # analytic Jacobian against finite differences
+    x = np.array([3.0, 2.0, 1.5, 1.0, 0.7])
+    jac = model.jacobian(0, x).toarray()
+    eps = 1e-6
+    for i in range(5):
+        dx = np.zeros(5)
+        dx[i] = eps
+        fd = (model.rhs(0, x + dx) - model.rhs(0, x - dx)) / (2 * eps)
+        assert np.allclose(jac[:, i], fd, atol=1e-6)
+    assert np.allclose(model.rhs(0, x), simple_rhs(0, x))
+    # rates work on a stack of states too
+    assert np.allclose(model.rates(np.stack([x, 2 * x]))[1], model.rates(2 * x))
+    timepoints = np.linspace(0, 10, 21)
+    ref = solve_ivp(
+        simple_rhs,
+        (0, 10),
+        model.x0,
+        t_eval=timepoints,
+        method="LSODA",
+        rtol=1e-10,
+        atol=1e-10,
+    ).y
+    for method in ["BDF", "LSODA"]:
+        sim = sim_getter(model_file=net_file, sim_type="scipy")
+        sim.method = method
+        tpts, obs, spcs = sim.simulate(0, 10, 20)
+        assert np.allclose(tpts, timepoints)
+        assert obs.dtype.names == ("Atot", "Btot", "Ctot", "Cdouble")
+        assert np.allclose(spcs["A(b)"], ref[0], rtol=1e-5, atol=1e-6)
+        assert np.allclose(obs["Btot"], ref[1] + ref[2], rtol=1e-5, atol=1e-6)
+        assert np.allclose(obs["Cdouble"], 2 * ref[4], rtol=1e-5, atol=1e-6)
+        assert np.allclose(spcs["$Src()"], 1.0)
+    # parameters and initial values
+    sim.set_params({"kf": 2.0})
+    sim.set_init("B(a)", 8.0)
+    _, obs, spcs = sim.simulate(0, 10, 20, named=False)
+    x0 = model.x0.copy()
+    x0[1] = 8.0
+    ref = solve_ivp(
+        lambda t, x: simple_rhs(t, x, kf=2.0),
+        (0, 10),
+        x0,
+        t_eval=timepoints,
+        method="LSODA",
+        rtol=1e-10,
+        atol=1e-10,
+    ).y
+    assert obs.shape == (4, 21) and spcs.shape == (5, 21)
+    assert np.allclose(spcs, ref, rtol=1e-5, atol=1e-6)
+
+
+def test_ssa_priority_queue():
+    from bionetgen.simulator.ssasimulator import _IndexedPriorityQueue
+
+    rng = np.random.default_rng(0)
+    times = rng.random(50)
+    queue = _IndexedPriorityQueue(times)
+    for _ in range(500):
+        rxn = int(rng.integers(50))
+        times[rxn] = np.inf if rng.random() < 0.1 else rng.random()
+        queue.update(rxn, times[rxn])
+        top, time = queue.top()
+        assert time == times.min() and times[top] == time
+        assert all(queue.heap[queue.pos[i]] == i for i in range(50))
+
+
+def test_ssa_simulator():
+    from bionetgen.simulator import sim_getter
+    from bionetgen.simulator.ssasimulator import SSASimulator
+
+    net_file = os.path.join(tfold, "networks", "simple.net")
+    sim = sim_getter(model_file=net_file, sim_type="ssa")
+    assert isinstance(sim, SSASimulator)
+    # binding changes A, B and AB which every reaction but synthesis reads
+    indptr, indices = sim.simulator.dependency_graph()
+    assert list(indices[indptr[0] : indptr[1]]) == [0, 1]
+    assert list(indices[indptr[2] : indptr[3]]) == [2, 3, 4]
+    # repeated reactants use x*(x-1)
+    x = np.array([3.0, 2.0, 0.0, 1.0, 4.0])
+    props = sim.simulator.propensities(x)
+    assert np.allclose(props, [6.0, 0.0, 2.0, 0.4, 12.0])
+    assert np.allclose(sim.simulator.propensities(x, np.array([4, 0])), [12.0, 6.0])
+    tpts, obs, spcs = sim.simulate(0, 5, 10)
+    assert obs.dtype.names == ("Atot", "Btot", "Ctot", "Cdouble")
+    assert np.allclose(obs["Atot"], 10) and np.allclose(obs["Btot"], 5)
+    assert np.allclose(obs["Cdouble"], 2 * spcs["C()"])
+    assert np.all(spcs["C()"] == np.rint(spcs["C()"]))
+    # exact distributions: A decays with probability 1-exp(-kd*t) and the
+    # 3 B molecules turn into 1 at rate kdim*3*2
+    sim = SSASimulator(os.path.join(tfold, "networks", "decay.net"), seed=1)
+    tpts, obs, spcs = sim.simulate_replicates(1000, 0, 1, 4)
+    assert obs.shape == (1000, 2, 5) and spcs.shape == (1000, 2, 5)
+    p = np.exp(-0.5 * tpts)
+    assert np.allclose(
+        obs[:, 0].mean(0), 20 * p, atol=4 * np.sqrt(20 * p * (1 - p) / 1000)
+    )
+    assert np.allclose(obs[:, 0].var(0), 20 * p * (1 - p), rtol=0.15, atol=1e-8)
+    assert set(np.unique(obs[:, 1])) <= {1.0, 3.0}
+    p3 = (obs[:, 1] == 3).mean(0)
+    assert np.allclose(p3, np.exp(-6 * tpts), atol=0.04)
+    # same seed gives the same trajectories
+    sim = SSASimulator(os.path.join(tfold, "networks", "decay.net"), seed=1)
+    assert np.array_equal(sim.simulate_replicates(50, 0, 1, 4)[1], obs[:50])
+
+
+def test_tau_leap_simulator():
+    from bionetgen.simulator import sim_getter
+    from bionetgen.simulator.tausimulator import TauLeapSimulator
+
+    net_file = os.path.join(tfold, "networks", "decay.net")
+    sim = sim_getter(model_file=net_file, sim_type="tau_leap")
+    assert isinstance(sim, TauLeapSimulator)
+    tpts, obs, spcs = sim.simulate(0, 1, 4)
+    assert obs.dtype.names == ("Atot", "Btot") and spcs.shape == (5,)
+    assert np.all(np.diff(obs["Atot"]) <= 0) and obs["Atot"][0] == 20
+    # small counts take exact SSA steps, same distributions as test_ssa_simulator
+    sim = TauLeapSimulator(net_file, seed=1)
+    tpts, obs, spcs = sim.simulate_ensemble(4000, 0, 1, 4)
+    assert obs.shape == (4000, 2, 5) and spcs.shape == (4000, 2, 5)
+    assert np.all(spcs >= 0)
+    p = np.exp(-0.5 * tpts)
+    assert np.allclose(
+        obs[:, 0].mean(0), 20 * p, atol=4 * np.sqrt(20 * p * (1 - p) / 4000)
+    )
+    assert np.allclose(obs[:, 0].var(0), 20 * p * (1 - p), rtol=0.1, atol=1e-8)
+    assert set(np.unique(obs[:, 1])) <= {1.0, 3.0}
+    assert np.allclose((obs[:, 1] == 3).mean(0), np.exp(-6 * tpts), atol=0.03)
+    # the summary of the same replicates
+    sim = TauLeapSimulator(net_file, seed=1)
+    _, mean, var = sim.simulate_ensemble(4000, 0, 1, 4, summary=True)
+    assert mean.shape == (2, 5) and var.shape == (2, 5)
+    assert np.allclose(mean, obs.mean(0)) and np.allclose(var, obs.var(0, ddof=1))
+    # large counts leap, the leaps are accurate to about epsilon
+    sim.set_init("A()", 1e5)
+    _, mean, var = sim.simulate_ensemble(500, 0, 1, 4, summary=True)
+    assert np.allclose(mean[0], 1e5 * p, rtol=0.02)
+    assert np.allclose(var[0], 1e5 * p * (1 - p), rtol=0.2, atol=1e-8)
+
+
+def test_librr_sweep():
+    pytest.importorskip("roadrunner")
+    from bionetgen.simulator import sim_getter
+    from bionetgen.simulator.librrsimulator import expand_grid
+
+    grid = {"kd": [0.1, 1.0], "A0": [5.0, 10.0]}
+    assert expand_grid(grid) == [
+        {"kd": 0.1, "A0": 5.0},
+        {"kd": 0.1, "A0": 10.0},
+        {"kd": 1.0, "A0": 5.0},
+        {"kd": 1.0, "A0": 10.0},
+    ]
+    sim = sim_getter(model_file=os.path.join(tfold, "networks", "decay_sbml.xml"))
+    res = sim.sweep(grid, 2, 5)
+    assert res.shape == (4, 5, 2)
+    tpts = np.linspace(0, 2, 5)
+    for irun, params in enumerate(expand_grid(grid)):
+        assert np.allclose(res[irun, :, 0], tpts)
+        # A0 sets the initial amount through an initial assignment
+        expected = params["A0"] * np.exp(-params["kd"] * tpts)
+        assert np.allclose(res[irun, :, 1], expected, rtol=1e-4)
+    # worker processes load the SBML themselves
+    res_par = sim.sweep(expand_grid(grid), 2, 5, workers=2)
+    assert np.allclose(res, res_par)
+    res_sel = sim.sweep([{"kd": 1.0}], 2, 5, selections=["[S1]"])
+    assert res_sel.shape == (1, 5, 1)
+    assert sim.simulator.timeCourseSelections == ["time", "[S1]"]
+    # parameters of one run don't carry over to the next one
+    default = 10.0 * np.exp(-0.5 * tpts)
+    for workers in [None, 2]:
+        res = sim.sweep([{"kd": 1.0}, {}], 2, 5, workers=workers)
+        assert np.allclose(res[1, :, 1], default, rtol=1e-4)
+    # and the simulator is back at the values of the model
+    assert sim.simulator.getValue("kd") == 0.5
+
+
+def test_sensitivity_backends(csim_lib, monkeypatch):
+    import bionetgen
+    from bionetgen.simulator import backends
+
+    pytest.importorskip("roadrunner")
+    net_file = os.path.join(tfold, "networks", "decay.net")
+    with open(os.path.join(tfold, "networks", "decay_sbml.xml")) as f:
+        sbml = f.read()
+    specs = {
+        "libRR": ("libRR", sbml, ["time", "[S1]"]),
+        "cpy": ("cpy", None, None),
+    }
+    prepare = backends.prepare_backend
+    monkeypatch.setattr(
+        backends,
+        "prepare_backend",
+        lambda model, backend, **kwargs: specs.get(backend)
+        or prepare(model, backend, **kwargs),
+    )
+    runner_cls = backends.BackendRunner
+    cpy_runner = make_csim_runner(csim_lib)
+    monkeypatch.setattr(
+        backends,
+        "BackendRunner",
+        lambda spec: cpy_runner if spec[0] == "cpy" else runner_cls(spec),
+    )
+    params = {"libRR": ["kd"], "cpy": ["k"]}
+    # the time axis is linspace(t_start, t_end, n_steps + 1) for every backend
+    for backend in ["scipy", "ssa", "tau_leap", "libRR", "cpy"]:
+        bparams = params.get(backend, ["kd", "kdim"])
+        sens = bionetgen.sensitivity(
+            net_file, bparams, backend=backend, t_end=2, n_steps=7, workers=1
+        )
+        n_obs = 1 if backend == "libRR" else 2
+        assert sens.shape == (len(bparams), 8, n_obs), backend
+    # central differences of the exact solution of the fixture model
+    tpts, h = np.linspace(0, 2, 8), 0.2e-3
+    obs_hi, _ = expected(tpts, [0.2 + h, 3.0], [5.0, 2.0])
+    obs_lo, _ = expected(tpts, [0.2 - h, 3.0], [5.0, 2.0])
+    assert np.allclose(sens[0], (obs_hi - obs_lo) / (2 * h), rtol=1e-4)
+
+
+def test_bng_backend_error(tmp, monkeypatch):
+    from bionetgen.core.exc import BNGRunError
+    from bionetgen.core.utils import utils
+    from bionetgen.simulator.backends import BackendRunner
+
+    runner = BackendRunner.__new__(BackendRunner)
+    runner.backend, runner.extra = "bng", "ode"
+    runner.source = os.path.join(tfold, "networks", "decay.net")
+    runner.bngexec = "BNG2.pl"
+    runner._folder = tmp.dir
+    monkeypatch.setattr(
+        utils, "run_command", lambda *args, **kwargs: (1, ["ERROR:", "bad model"])
+    )
+    with pytest.raises(BNGRunError) as err:
+        runner.run({"kd": 1.0})
+    assert err.value.stdout == "ERROR:\nbad model"